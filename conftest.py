@@ -0,0 +1,10 @@
+import pytest
+
+from core.runner import TEST_SETTINGS
+
+
+@pytest.fixture(autouse=True)
+def test_settings(settings):
+    """Те же настройки на время тестов, что и в manage.py test."""
+    for name, value in TEST_SETTINGS.items():
+        setattr(settings, name, value)
@@ -0,0 +1,83 @@
+import base64
+import binascii
+import json
+
+from django.conf import settings
+from django.db.models import Q
+from django.utils.dateparse import parse_datetime
+
+from .serializers import ApiError
+
+
+def encode_cursor(values):
+    """Непрозрачный курсор из значений ключа последней строки."""
+    raw = json.dumps([
+        value.isoformat() if hasattr(value, 'isoformat') else value
+        for value in values
+    ], separators=(',', ':'))
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip('=')
+
+
+def decode_cursor(cursor, keys):
+    """
+    Значения ключа из курсора: (дата, id) или (id,).
+    Битый курсор - ошибка 400, а не первая страница: клиент API
+    должен узнать, что листает не то.
+    """
+    try:
+        values = json.loads(base64.urlsafe_b64decode(
+            cursor + '=' * (-len(cursor) % 4)
+        ))
+    except (binascii.Error, UnicodeDecodeError, ValueError):
+        values = None
+    if (
+        not isinstance(values, list) or len(values) != len(keys)
+        or not isinstance(values[-1], int)
+    ):
+        raise ApiError('Неверный курсор.')
+    if len(keys) == 2:
+        values[0] = parse_datetime(values[0]) if isinstance(
+            values[0], str) else None
+        if values[0] is None:
+            raise ApiError('Неверный курсор.')
+    return values
+
+
+def page_size(request):
+    limit = request.GET.get('limit')
+    if limit is None:
+        return settings.API_PAGE_SIZE
+    if not limit.isdigit() or int(limit) == 0:
+        raise ApiError('limit - целое число больше нуля.')
+    return min(int(limit), settings.API_MAX_PAGE_SIZE)
+
+
+def paginate(request, queryset, serializer, keys=('pk',)):
+    """
+    Keyset-пагинация списка по убыванию keys - (дата, id) или (id,):
+    одна выборка limit + 1 строк нужных колонок, без COUNT и OFFSET.
+    """
+    limit = page_size(request)
+    queryset = queryset.order_by(*(f'-{key}' for key in keys))
+    cursor = request.GET.get('cursor')
+    if cursor:
+        values = decode_cursor(cursor, keys)
+        if len(keys) == 2:
+            (date_key, pk_key), (date, pk) = keys, values
+            queryset = queryset.filter(
+                Q(**{f'{date_key}__lt': date})
+                | Q(**{date_key: date, f'{pk_key}__lt': pk})
+            )
+        else:
+            queryset = queryset.filter(**{f'{keys[0]}__lt': values[0]})
+    rows = list(
+        queryset.values_list(*serializer.lookups(), *keys)[:limit + 1]
+    )
+    width = len(serializer.names)
+    return {
+        'results': [serializer.row(row[:width]) for row in rows[:limit]],
+        'next_cursor': (
+            encode_cursor(rows[limit - 1][width:])
+            if len(rows) > limit else None
+        ),
+    }
@@ -0,0 +1,95 @@
+from django.core.files.storage import default_storage
+
+
+class ApiError(Exception):
+    """Ошибка запроса к API: код ответа и сообщение для клиента."""
+
+    def __init__(self, detail, status=400, errors=None):
+        super().__init__(detail)
+        self.detail = detail
+        self.status = status
+        self.errors = errors
+
+
+def iso(value):
+    return value.isoformat()
+
+
+def media_url(name):
+    return default_storage.url(name) if name else None
+
+
+class Serializer:
+    """
+    Сериализация без создания моделей: нужные колонки читаются
+    values_list и собираются в словари.
+    fields - поле API -> (lookup ORM, преобразование значения).
+    ?fields= выбирает часть полей - остальные колонки не читаются.
+    """
+    fields = {}
+
+    def __init__(self, requested=None):
+        if not requested:
+            self.names = list(self.fields)
+            return
+        self.names = [name.strip() for name in requested.split(',')]
+        unknown = [name for name in self.names if name not in self.fields]
+        if unknown:
+            raise ApiError(f'Неизвестные поля: {", ".join(unknown)}.')
+
+    def lookups(self):
+        return [self.fields[name][0] for name in self.names]
+
+    def row(self, values):
+        result = {}
+        for name, value in zip(self.names, values):
+            convert = self.fields[name][1]
+            result[name] = (
+                convert(value) if convert and value is not None else value
+            )
+        return result
+
+    def one(self, queryset):
+        """Один объект queryset или None."""
+        rows = queryset.values_list(*self.lookups())[:1]
+        return self.row(rows[0]) if rows else None
+
+
+class PostSerializer(Serializer):
+    fields = {
+        'id': ('pk', None),
+        'text': ('text', None),
+        'pub_date': ('pub_date', iso),
+        'author': ('author__username', None),
+        'group': ('group__slug', None),
+        'image': ('image', media_url),
+        'thumbnail': ('thumbnail', None),
+        'comments_count': ('comments_count', None),
+    }
+
+
+class GroupSerializer(Serializer):
+    fields = {
+        'id': ('pk', None),
+        'title': ('title', None),
+        'slug': ('slug', None),
+        'description': ('description', None),
+    }
+
+
+class CommentSerializer(Serializer):
+    fields = {
+        'id': ('pk', None),
+        'post': ('post_id', None),
+        'author': ('author__username', None),
+        'text': ('text', None),
+        'created': ('created', iso),
+    }
+
+
+class FollowSerializer(Serializer):
+    fields = {
+        'id': ('pk', None),
+        'user': ('user__username', None),
+        'author': ('author__username', None),
+    }
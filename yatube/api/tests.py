@@ -0,0 +1,237 @@
+import gzip
+import json
+
+from django.core.cache import cache
+from django.test import Client, TestCase
+from django.urls import reverse
+
+from posts.models import Comment, Follow, Group, Post, User
+from posts.tests.fixtures import FixturesData as FD
+
+
+class ApiTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username=FD.AUTHOR_USERNAME_1)
+        cls.user = User.objects.create_user(username=FD.USER_USERNAME)
+        cls.group = Group.objects.create(
+            title=FD.TEST_GROUP_TITLE_1,
+            slug=FD.TEST_GROUP_SLUG_1,
+            description=FD.TEST_GROUP_DESCRIPTION_1
+        )
+        cls.posts = [
+            Post.objects.create(
+                author=cls.author,
+                group=cls.group if number % 2 else None,
+                text=f'{FD.POST_TEXT} {number}'
+            )
+            for number in range(5)
+        ]
+        cls.comment = Comment.objects.create(
+            post=cls.posts[0], author=cls.user, text=FD.TEST_POST_TEXT_1)
+
+    def setUp(self):
+        cache.clear()
+        self.guest_client = Client()
+        self.authorized_client = Client()
+        self.authorized_client.force_login(self.user)
+        self.author_client = Client()
+        self.author_client.force_login(self.author)
+
+    def send(self, client, method, url, data=None):
+        return getattr(client, method)(
+            url, json.dumps(data), content_type='application/json')
+
+    def test_post_list(self):
+        """
+        Список постов: одна выборка нужных колонок, курсор,
+        ?fields= и фильтры.
+        """
+        url = reverse('api:post_list')
+        with self.assertNumQueries(1):
+            response = self.guest_client.get(
+                url, {'limit': 3, 'fields': 'id,author,group'})
+        data = response.json()
+        self.assertEqual(data['results'][0], {
+            'id': self.posts[4].pk,
+            'author': self.author.username,
+            'group': None,
+        })
+        self.assertEqual(len(data['results']), 3)
+        data = self.guest_client.get(
+            url, {'limit': 3, 'cursor': data['next_cursor']}).json()
+        self.assertEqual(
+            [post['id'] for post in data['results']],
+            [self.posts[1].pk, self.posts[0].pk]
+        )
+        self.assertIsNone(data['next_cursor'])
+        self.assertEqual(data['results'][1]['comments_count'], 1)
+
+        data = self.guest_client.get(url, {'group': self.group.slug}).json()
+        self.assertEqual(len(data['results']), 2)
+        for params in ({'fields': 'id,password'}, {'cursor': 'broken'},
+                       {'limit': '0'}):
+            with self.subTest(params=params):
+                self.assertEqual(
+                    self.guest_client.get(url, params).status_code, 400)
+
+    def test_compression(self):
+        """Клиенты с Accept-Encoding: gzip получают сжатый JSON."""
+        response = self.guest_client.get(
+            reverse('api:post_list'), HTTP_ACCEPT_ENCODING='gzip')
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        data = json.loads(gzip.decompress(response.content))
+        self.assertEqual(len(data['results']), len(self.posts))
+
+    def test_post_write(self):
+        """Создание, правка и удаление поста - только автором."""
+        url = reverse('api:post_list')
+        self.assertEqual(
+            self.send(self.guest_client, 'post', url,
+                      {'text': FD.POST_TEXT}).status_code,
+            401
+        )
+        response = self.send(self.author_client, 'post', url, {
+            'text': FD.TEST_POST_TEXT_2, 'group': self.group.slug})
+        self.assertEqual(response.status_code, 201)
+        post = response.json()
+        self.assertEqual(post['author'], self.author.username)
+        self.assertEqual(post['group'], self.group.slug)
+        self.assertEqual(
+            self.send(self.author_client, 'post', url,
+                      {'group': 'missing'}).json()['errors'].keys(),
+            {'group'}
+        )
+
+        detail = reverse('api:post_detail', args=(post['id'],))
+        self.assertEqual(
+            self.send(self.authorized_client, 'patch', detail,
+                      {'text': FD.TEST_POST_EDIT}).status_code,
+            403
+        )
+        response = self.send(
+            self.author_client, 'patch', detail, {'text': FD.TEST_POST_EDIT})
+        self.assertEqual(response.json()['text'], FD.TEST_POST_EDIT)
+        self.assertEqual(response.json()['group'], self.group.slug)
+        self.assertEqual(
+            self.author_client.delete(detail).status_code, 204)
+        self.assertEqual(self.guest_client.get(detail).status_code, 404)
+
+    def test_groups(self):
+        response = self.guest_client.get(reverse('api:group_list'))
+        self.assertEqual(response.json()['results'][0]['slug'],
+                         self.group.slug)
+        response = self.guest_client.get(
+            reverse('api:group_detail', args=(self.group.slug,)),
+            {'fields': 'title'}
+        )
+        self.assertEqual(response.json(), {'title': self.group.title})
+
+    def test_comments(self):
+        """Комментарии поста: список, добавление, правка автором."""
+        url = reverse('api:comment_list', args=(self.posts[0].pk,))
+        response = self.send(
+            self.author_client, 'post', url, {'text': FD.TEST_POST_TEXT_2})
+        self.assertEqual(response.status_code, 201)
+        data = self.guest_client.get(url).json()
+        self.assertEqual(
+            [comment['text'] for comment in data['results']],
+            [FD.TEST_POST_TEXT_2, FD.TEST_POST_TEXT_1]
+        )
+        detail = reverse(
+            'api:comment_detail', args=(self.posts[0].pk, self.comment.pk))
+        self.assertEqual(
+            self.send(self.author_client, 'patch', detail,
+                      {'text': FD.TEST_POST_EDIT}).status_code,
+            403
+        )
+        self.assertEqual(
+            self.send(self.authorized_client, 'patch', detail,
+                      {'text': FD.TEST_POST_EDIT}).json()['text'],
+            FD.TEST_POST_EDIT
+        )
+        self.assertEqual(
+            self.guest_client.get(
+                reverse('api:comment_list', args=(0,))).status_code,
+            404
+        )
+
+    def test_follow_and_feed(self):
+        """Подписка, лента подписок и отписка."""
+        url = reverse('api:follow_list')
+        self.assertEqual(self.guest_client.get(url).status_code, 401)
+        for author in (self.user.username, ['x'], {}, '', None, 1):
+            with self.subTest(author=author):
+                self.assertEqual(
+                    self.send(self.authorized_client, 'post', url,
+                              {'author': author}).status_code,
+                    400
+                )
+        response = self.send(
+            self.authorized_client, 'post', url,
+            {'author': self.author.username})
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(
+            self.send(self.authorized_client, 'post', url,
+                      {'author': self.author.username}).status_code,
+            200
+        )
+        self.assertEqual(
+            self.authorized_client.get(url).json()['results'],
+            [response.json()]
+        )
+
+        data = self.authorized_client.get(
+            reverse('api:feed'), {'limit': 2, 'fields': 'id'}).json()
+        self.assertEqual(data['results'], [
+            {'id': self.posts[4].pk}, {'id': self.posts[3].pk}])
+        data = self.authorized_client.get(reverse('api:feed'), {
+            'limit': 2, 'fields': 'id', 'cursor': data['next_cursor']
+        }).json()
+        self.assertEqual(data['results'], [
+            {'id': self.posts[2].pk}, {'id': self.posts[1].pk}])
+
+        for _ in range(2):
+            self.assertEqual(
+                self.authorized_client.delete(reverse(
+                    'api:follow_detail', args=(self.author.username,)
+                )).status_code,
+                204
+            )
+        self.assertFalse(Follow.objects.filter(user=self.user).exists())
+
+    def test_follow_bulk(self):
+        """Массовая подписка и отписка одной транзакцией, идемпотентно."""
+        url = reverse('api:follow_bulk')
+        other = User.objects.create_user(username=FD.USER_USERNAME_1)
+        data = {'follow': [
+            self.author.username, other.username, self.user.username,
+            'missing'
+        ]}
+        response = self.send(self.authorized_client, 'post', url, data)
+        self.assertEqual(response.json(), {'followed': 2, 'unfollowed': 0})
+        response = self.send(self.authorized_client, 'post', url, data)
+        self.assertEqual(response.json(), {'followed': 0, 'unfollowed': 0})
+        self.user.profile.refresh_from_db()
+        self.assertEqual(self.user.profile.following_count, 2)
+
+        response = self.send(self.authorized_client, 'post', url, {
+            'follow': [], 'unfollow': [self.author.username, other.username]
+        })
+        self.assertEqual(response.json(), {'followed': 0, 'unfollowed': 2})
+        self.assertFalse(Follow.objects.filter(user=self.user).exists())
+        self.author.profile.refresh_from_db()
+        self.assertEqual(self.author.profile.followers_count, 0)
+
+        for data in (
+            {'follow': self.author.username},
+            {'follow': [self.author.username],
+             'unfollow': [self.author.username]},
+        ):
+            with self.subTest(data=data):
+                self.assertEqual(self.send(
+                    self.authorized_client, 'post', url, data
+                ).status_code, 400)
+        self.assertEqual(
+            self.send(self.guest_client, 'post', url, {}).status_code, 401)
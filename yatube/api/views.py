@@ -0,0 +1,274 @@
+import json
+from functools import wraps
+
+from django.conf import settings
+from django.core.exceptions import PermissionDenied
+from django.db import router, transaction
+from django.http import Http404, HttpResponse, JsonResponse
+from django.shortcuts import get_object_or_404
+from django.views.decorators.gzip import gzip_page
+
+from posts.feeds import follow_feed, followed_celebrities
+from posts.follows import follow, unfollow
+from posts.forms import CommentForm, PostForm
+from posts.models import Comment, Follow, Group, Post, User
+
+from .pagination import paginate
+from .serializers import (
+    ApiError, CommentSerializer, FollowSerializer, GroupSerializer,
+    PostSerializer
+)
+
+JSON_PARAMS = {'ensure_ascii': False, 'separators': (',', ':')}
+POST_KEYS = ('pub_date', 'pk')
+COMMENT_KEYS = ('created', 'pk')
+
+
+def error(detail, status, errors=None):
+    data = {'detail': detail}
+    if errors:
+        data['errors'] = errors
+    return JsonResponse(data, status=status, json_dumps_params=JSON_PARAMS)
+
+
+def api_view(*methods):
+    """
+    Обёртка view API: разрешённые методы, вход для записи, ошибки
+    в JSON и сжатие ответа gzip для клиентов, которые его принимают.
+    """
+    def decorator(view):
+        @gzip_page
+        @wraps(view)
+        def wrapper(request, *args, **kwargs):
+            if request.method not in methods:
+                return error('Метод не разрешён.', 405)
+            if request.method != 'GET' and not request.user.is_authenticated:
+                return error('Нужно войти.', 401)
+            try:
+                data = view(request, *args, **kwargs)
+            except ApiError as exc:
+                return error(exc.detail, exc.status, exc.errors)
+            except Http404:
+                return error('Не найдено.', 404)
+            except PermissionDenied:
+                return error('Нет прав.', 403)
+            if data is None:
+                return HttpResponse(status=204)
+            data, status = data if isinstance(data, tuple) else (data, 200)
+            return JsonResponse(
+                data, status=status, json_dumps_params=JSON_PARAMS)
+        return wrapper
+    return decorator
+
+
+def require_login(request):
+    if not request.user.is_authenticated:
+        raise ApiError('Нужно войти.', 401)
+
+
+def body(request):
+    """JSON-объект из тела запроса."""
+    try:
+        data = json.loads(request.body or b'{}')
+    except ValueError:
+        data = None
+    if not isinstance(data, dict):
+        raise ApiError('Тело запроса - JSON-объект.')
+    return data
+
+
+def save_form(form):
+    if not form.is_valid():
+        raise ApiError(
+            'Ошибка данных.', errors={
+                field: [item['message'] for item in items]
+                for field, items in form.errors.get_json_data().items()
+            }
+        )
+    return form.save(commit=False)
+
+
+def post_form(data, post=None):
+    """
+    PostForm по JSON: группа передаётся slug'ом, пропущенные поля
+    при изменении берутся из поста.
+    """
+    fields = {
+        'text': data.get('text', post.text if post else None),
+        'group': post.group_id if post else None,
+    }
+    if 'group' in data:
+        fields['group'] = None
+        if data['group'] is not None:
+            fields['group'] = Group.objects.filter(
+                slug=data['group']).values_list('pk', flat=True).first()
+            if fields['group'] is None:
+                raise ApiError(
+                    'Ошибка данных.', errors={'group': ['Нет такой группы.']})
+    return PostForm(fields, instance=post)
+
+
+@api_view('GET', 'POST')
+def post_list(request):
+    """Посты, новые первыми; фильтры ?group=<slug>, ?author=<username>."""
+    serializer = PostSerializer(request.GET.get('fields'))
+    if request.method == 'POST':
+        post = save_form(post_form(body(request)))
+        post.author = request.user
+        post.save()
+        return serializer.one(Post.objects.filter(pk=post.pk)), 201
+    posts = Post.objects.all()
+    if 'group' in request.GET:
+        posts = posts.filter(group__slug=request.GET['group'])
+    if 'author' in request.GET:
+        posts = posts.filter(author__username=request.GET['author'])
+    return paginate(request, posts, serializer, POST_KEYS)
+
+
+@api_view('GET', 'PATCH', 'DELETE')
+def post_detail(request, post_id):
+    serializer = PostSerializer(request.GET.get('fields'))
+    if request.method == 'GET':
+        data = serializer.one(Post.objects.filter(pk=post_id))
+        if data is None:
+            raise Http404
+        return data
+    post = get_object_or_404(Post, pk=post_id)
+    if post.author_id != request.user.pk:
+        raise PermissionDenied
+    if request.method == 'DELETE':
+        post.delete()
+        return None
+    save_form(post_form(body(request), post)).save()
+    return serializer.one(Post.objects.filter(pk=post_id))
+
+
+@api_view('GET')
+def group_list(request):
+    return paginate(
+        request, Group.objects.all(),
+        GroupSerializer(request.GET.get('fields'))
+    )
+
+
+@api_view('GET')
+def group_detail(request, slug):
+    data = GroupSerializer(request.GET.get('fields')).one(
+        Group.objects.filter(slug=slug))
+    if data is None:
+        raise Http404
+    return data
+
+
+@api_view('GET', 'POST')
+def comment_list(request, post_id):
+    """Комментарии поста, новые первыми."""
+    serializer = CommentSerializer(request.GET.get('fields'))
+    if not Post.objects.filter(pk=post_id).exists():
+        raise Http404
+    if request.method == 'POST':
+        comment = save_form(CommentForm(body(request)))
+        comment.author = request.user
+        comment.post_id = post_id
+        comment.save()
+        return serializer.one(Comment.objects.filter(pk=comment.pk)), 201
+    return paginate(
+        request, Comment.objects.filter(post_id=post_id), serializer,
+        COMMENT_KEYS
+    )
+
+
+@api_view('GET', 'PATCH', 'DELETE')
+def comment_detail(request, post_id, comment_id):
+    serializer = CommentSerializer(request.GET.get('fields'))
+    comments = Comment.objects.filter(post_id=post_id, pk=comment_id)
+    if request.method == 'GET':
+        data = serializer.one(comments)
+        if data is None:
+            raise Http404
+        return data
+    comment = get_object_or_404(comments)
+    if comment.author_id != request.user.pk:
+        raise PermissionDenied
+    if request.method == 'DELETE':
+        comment.delete()
+        return None
+    data = body(request)
+    save_form(CommentForm(
+        {'text': data.get('text', comment.text)}, instance=comment
+    )).save()
+    return serializer.one(comments)
+
+
+@api_view('GET', 'POST')
+def follow_list(request):
+    """
+    Подписки текущего пользователя. POST {"author": "<username>"}
+    подписывает; повторная подписка возвращает существующую.
+    """
+    require_login(request)
+    serializer = FollowSerializer(request.GET.get('fields'))
+    follows = Follow.objects.filter(user=request.user)
+    if request.method == 'GET':
+        return paginate(request, follows, serializer)
+    username = body(request).get('author')
+    if not isinstance(username, str) or not username:
+        raise ApiError(
+            'Ошибка данных.', errors={'author': ['Нужно имя автора.']})
+    if username == request.user.username:
+        raise ApiError(
+            'Ошибка данных.',
+            errors={'author': ['Нельзя подписаться на себя.']}
+        )
+    created = follow(request.user.pk, [username])
+    data = serializer.one(follows.filter(author__username=username))
+    if data is None:
+        raise Http404
+    return data, 201 if created else 200
+
+
+@api_view('DELETE')
+def follow_detail(request, username):
+    """Отписка; повторная тоже успешна, если автор существует."""
+    if not unfollow(request.user.pk, [username]):
+        get_object_or_404(User, username=username)
+
+
+def usernames(data, field):
+    value = data.get(field, [])
+    if not isinstance(value, list) or not all(
+            isinstance(item, str) for item in value):
+        raise ApiError(
+            'Ошибка данных.', errors={field: ['Нужен список имён.']})
+    return value
+
+
+@api_view('POST')
+def follow_bulk(request):
+    """
+    Массовая подписка и отписка одной транзакцией:
+    {"follow": ["<username>", ...], "unfollow": [...]}. В ответе -
+    сколько подписок действительно появилось и исчезло.
+    """
+    data = body(request)
+    to_follow = usernames(data, 'follow')
+    to_unfollow = usernames(data, 'unfollow')
+    if len(to_follow) + len(to_unfollow) > settings.API_FOLLOW_BULK_LIMIT:
+        raise ApiError(
+            f'Не больше {settings.API_FOLLOW_BULK_LIMIT} авторов за раз.')
+    if set(to_follow) & set(to_unfollow):
+        raise ApiError('Автор и в follow, и в unfollow.')
+    with transaction.atomic(using=router.db_for_write(Follow)):
+        followed = follow(request.user.pk, to_follow)
+        unfollowed = unfollow(request.user.pk, to_unfollow)
+    return {'followed': len(followed), 'unfollowed': len(unfollowed)}
+
+
+@api_view('GET')
+def feed(request):
+    """Лента подписок текущего пользователя, как на странице /follow/."""
+    require_login(request)
+    posts, keys = follow_feed(
+        request.user, followed_celebrities(request.user))
+    return paginate(
+        request, posts, PostSerializer(request.GET.get('fields')), keys)
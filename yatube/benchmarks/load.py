@@ -0,0 +1,70 @@
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from itertools import cycle
+from urllib.error import HTTPError, URLError
+from urllib.parse import urlencode
+from urllib.request import urlopen
+
+from .runner import bench_urls, percentile
+
+TIMEOUT = 30
+
+
+def load_paths():
+    """Адреса анонимных страниц из bench_urls с параметрами."""
+    return [
+        path + ('?' + urlencode(params) if params else '')
+        for path, params, user in bench_urls().values()
+        if user is None
+    ]
+
+
+def fetch(url):
+    started = time.perf_counter()
+    try:
+        with urlopen(url, timeout=TIMEOUT) as response:
+            response.read()
+            ok = response.status == 200
+    except (HTTPError, URLError, OSError):
+        ok = False
+    return (time.perf_counter() - started) * 1000, ok
+
+
+def worker(urls, deadline, timings, errors, lock):
+    for url in cycle(urls):
+        if time.monotonic() >= deadline:
+            return
+        elapsed, ok = fetch(url)
+        with lock:
+            timings.append(elapsed)
+            if not ok:
+                errors.append(url)
+
+
+def run_load(base_url, paths, concurrency=16, duration=10):
+    """
+    Нагрузка на запущенный сервер: concurrency потоков по кругу
+    запрашивают paths в течение duration секунд. Каждый поток
+    начинает со своего адреса, чтобы страницы шли вперемешку.
+    """
+    urls = [base_url.rstrip('/') + path for path in paths]
+    timings, errors, lock = [], [], threading.Lock()
+    started = time.monotonic()
+    deadline = started + duration
+    with ThreadPoolExecutor(concurrency) as pool:
+        for number in range(concurrency):
+            shift = number % len(urls)
+            pool.submit(
+                worker, urls[shift:] + urls[:shift], deadline,
+                timings, errors, lock
+            )
+    elapsed = time.monotonic() - started
+    return {
+        'concurrency': concurrency,
+        'requests': len(timings),
+        'errors': len(errors),
+        'rps': round(len(timings) / elapsed, 1),
+        'p50_ms': round(percentile(timings, 50), 3) if timings else None,
+        'p99_ms': round(percentile(timings, 99), 3) if timings else None,
+    }
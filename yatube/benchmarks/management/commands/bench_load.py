@@ -0,0 +1,41 @@
+import json
+
+from django.core.management.base import BaseCommand, CommandError
+
+from benchmarks.load import load_paths, run_load
+
+
+class Command(BaseCommand):
+    help = (
+        'Нагрузочный прогон запущенного сервера (gunicorn, runserver): '
+        'пропускная способность и задержки p50/p99 при заданном числе '
+        'одновременных клиентов, печатает JSON.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'base_url', help='Адрес сервера, например http://127.0.0.1:8000'
+        )
+        parser.add_argument('--concurrency', type=int, default=16)
+        parser.add_argument('--duration', type=float, default=10)
+        parser.add_argument(
+            '--paths',
+            help='Через запятую, например /,/popular/. По умолчанию - '
+                 'анонимные страницы bench_views.'
+        )
+
+    def handle(self, *args, **options):
+        if options['paths']:
+            paths = options['paths'].split(',')
+        else:
+            paths = load_paths()
+        if not paths:
+            raise CommandError('Нет данных: запустите seed_bench.')
+        report = run_load(
+            options['base_url'], paths,
+            concurrency=options['concurrency'],
+            duration=options['duration'],
+        )
+        self.stdout.write(json.dumps(report, indent=2))
+        if report['errors']:
+            raise CommandError(f'Ошибок: {report["errors"]}.')
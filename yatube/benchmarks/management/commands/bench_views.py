@@ -0,0 +1,52 @@
+import json
+
+from django.core.management.base import BaseCommand, CommandError
+
+from benchmarks.runner import TOLERANCE, compare, load, run
+
+
+class Command(BaseCommand):
+    help = (
+        'Измеряет страницы постов: число запросов, задержки p50/p99 '
+        'и пик памяти, печатает JSON. С --baseline сравнивает с '
+        'сохранённым прогоном и завершается ошибкой при регрессиях.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--repeat', type=int, default=20)
+        parser.add_argument(
+            '--cached', action='store_true',
+            help='Мерить с настроенным кэшем, а не DummyCache.'
+        )
+        parser.add_argument(
+            '--views', help='Через запятую, например index,post_detail.'
+        )
+        parser.add_argument('--save', help='Куда записать JSON прогона.')
+        parser.add_argument('--baseline', help='JSON прогона для сравнения.')
+        parser.add_argument('--tolerance', type=float, default=TOLERANCE)
+
+    def handle(self, *args, **options):
+        views = options['views'].split(',') if options['views'] else None
+        report = run(
+            repeat=options['repeat'],
+            cached=options['cached'],
+            views=views,
+        )
+        if not report['views']:
+            raise CommandError('Нет данных: запустите seed_bench.')
+        output = json.dumps(report, indent=2)
+        if options['save']:
+            with open(options['save'], 'w') as file:
+                file.write(output)
+        self.stdout.write(output)
+
+        if not options['baseline']:
+            return
+        regressions = compare(
+            report, load(options['baseline']), options['tolerance']
+        )
+        if regressions:
+            raise CommandError(
+                'Регрессии:\n' + '\n'.join(regressions)
+            )
+        self.stdout.write(self.style.SUCCESS('Регрессий не найдено.'))
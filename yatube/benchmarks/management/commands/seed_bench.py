@@ -0,0 +1,41 @@
+from django.core.management.base import BaseCommand
+
+from benchmarks.seed import seed
+
+
+class Command(BaseCommand):
+    help = (
+        'Заполняет базу данными для бенчмарков: пользователи, группы, '
+        'посты, комментарии и подписки пачками bulk_create, затем '
+        'счётчики и ленты подписок.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=1000)
+        parser.add_argument('--groups', type=int, default=20)
+        parser.add_argument('--posts', type=int, default=100000)
+        parser.add_argument('--comments', type=int, default=100000)
+        parser.add_argument('--follows', type=int, default=20000)
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument(
+            '--skew', type=float, default=1.1,
+            help='Параметр распределения Ципфа для авторов и постов.'
+        )
+
+    def handle(self, *args, **options):
+        verbose = options['verbosity'] > 1
+        counts = seed(
+            users=options['users'],
+            groups=options['groups'],
+            posts=options['posts'],
+            comments=options['comments'],
+            follows=options['follows'],
+            seed=options['seed'],
+            skew=options['skew'],
+            progress=self.stdout.write if verbose else None,
+        )
+        self.stdout.write(self.style.SUCCESS(
+            'В базе: ' + ', '.join(
+                f'{name} {count}' for name, count in counts.items()
+            )
+        ))
@@ -0,0 +1,37 @@
+import json
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+
+from benchmarks.stress import MODES, run
+
+
+class Command(BaseCommand):
+    help = (
+        'Конкурентная запись в копию базы SQLite несколькими процессами: '
+        'стандартный бэкенд (plain) против core.db.sqlite3 с WAL и '
+        'постоянными соединениями (tuned). Печатает JSON с числом '
+        'записей в секунду и ошибок «database is locked».'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--processes', type=int, default=8)
+        parser.add_argument('--seconds', type=float, default=10)
+        parser.add_argument(
+            '--modes', default=','.join(MODES),
+            help='Через запятую: ' + ', '.join(MODES)
+        )
+
+    def handle(self, *args, **options):
+        if connection.vendor != 'sqlite':
+            raise CommandError('Только для SQLite.')
+        modes = options['modes'].split(',')
+        unknown = set(modes) - set(MODES)
+        if unknown:
+            raise CommandError(f'Неизвестные режимы: {", ".join(unknown)}.')
+        report = run(
+            processes=options['processes'],
+            seconds=options['seconds'],
+            modes=modes,
+        )
+        self.stdout.write(json.dumps(report, indent=2))
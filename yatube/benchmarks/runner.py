@@ -0,0 +1,157 @@
+import json
+import time
+import tracemalloc
+
+from django.db import connection
+from django.test import Client
+from django.test.utils import override_settings
+from django.urls import reverse
+
+from core.cache import DUMMY_CACHES
+from posts.models import Post, User
+from posts.paginators import FORWARD, CursorPaginator
+
+# Адрес не из INTERNAL_IPS: debug_toolbar не встраивается в ответы.
+REMOTE_ADDR = '192.0.2.1'
+# Допустимый рост задержки и памяти относительно базы в compare.
+TOLERANCE = 0.2
+# Метрика, множитель допуска и абсолютный запас: хвост p99 на
+# малом числе повторов шумнее медианы, разница меньше миллисекунды -
+# шум таймера.
+METRICS = (
+    ('p50_ms', 1, 1),
+    ('p99_ms', 2, 1),
+    ('peak_kib', 1, 0),
+)
+
+
+def percentile(values, percent):
+    """Перцентиль ближайшего ранга."""
+    values = sorted(values)
+    rank = max(0, -(-len(values) * percent // 100) - 1)
+    return values[int(rank)]
+
+
+def count_queries(queries):
+    """
+    Обёртка execute: CaptureQueriesContext не годится, журнал
+    запросов очищается сигналом request_started.
+    """
+    def wrapper(execute, sql, params, many, context):
+        queries.append(sql)
+        return execute(sql, params, many, context)
+    return wrapper
+
+
+def bench_urls():
+    """
+    Измеряемые страницы: первая и глубокая страница лент самого
+    плодовитого автора и самого подписанного читателя, самый
+    обсуждаемый пост - выбираются по денормализованным счётчикам.
+    """
+    post = Post.objects.filter(group__isnull=False).order_by(
+        '-comments_count').select_related('group').first()
+    if post is None:
+        return {}
+    middle = Post.objects.all()[Post.objects.count() // 2]
+    cursor = {'cursor': CursorPaginator.encode_cursor(FORWARD, middle)}
+    author = User.objects.order_by('-profile__posts_count').first()
+    urls = {
+        'index': (reverse('posts:home_page'), {}, None),
+        'index_deep': (reverse('posts:home_page'), cursor, None),
+        'group_posts': (
+            reverse('posts:group_list', args=(post.group.slug,)), {}, None),
+        'profile': (
+            reverse('posts:profile', args=(author.username,)), {}, None),
+        'profile_deep': (
+            reverse('posts:profile', args=(author.username,)), cursor, None),
+        'post_detail': (
+            reverse('posts:post_detail', args=(post.pk,)), {}, None),
+        'popular': (reverse('posts:popular'), {}, None),
+        'popular_deep': (reverse('posts:popular'), {'page': 50}, None),
+    }
+    reader = User.objects.filter(
+        profile__following_count__gt=0
+    ).order_by('-profile__following_count').first()
+    if reader is not None:
+        urls['follow_index'] = (reverse('posts:follow_index'), {}, reader)
+        urls['follow_index_deep'] = (
+            reverse('posts:follow_index'), cursor, reader)
+    return urls
+
+
+def measure(url, params, user, repeat, cached=False):
+    """Задержки, число запросов и пик памяти Python для одного адреса."""
+    client = Client(REMOTE_ADDR=REMOTE_ADDR)
+    if user is not None:
+        client.force_login(user)
+    caches = {} if cached else {'CACHES': DUMMY_CACHES}
+    with override_settings(**caches):
+        # Прогрев: импорт шаблонов, первая компиляция, кэш при cached.
+        client.get(url, params)
+        timings = []
+        for _ in range(repeat):
+            queries = []
+            with connection.execute_wrapper(count_queries(queries)):
+                started = time.perf_counter()
+                response = client.get(url, params)
+                timings.append((time.perf_counter() - started) * 1000)
+        tracemalloc.start()
+        client.get(url, params)
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+    return {
+        'status': response.status_code,
+        'queries': len(queries),
+        'p50_ms': round(percentile(timings, 50), 3),
+        'p99_ms': round(percentile(timings, 99), 3),
+        'mean_ms': round(sum(timings) / len(timings), 3),
+        'peak_kib': round(peak / 1024, 1),
+    }
+
+
+def run(repeat=20, cached=False, views=None):
+    urls = bench_urls()
+    return {
+        'meta': {
+            'repeat': repeat,
+            'cached': cached,
+            'vendor': connection.vendor,
+            'posts': Post.objects.count(),
+        },
+        'views': {
+            name: measure(*args, repeat=repeat, cached=cached)
+            for name, args in urls.items()
+            if views is None or name in views
+        },
+    }
+
+
+def compare(report, baseline, tolerance=TOLERANCE):
+    """
+    Регрессии относительно сохранённого прогона: любое лишнее
+    обращение к БД, рост задержек или пика памяти сверх допуска.
+    """
+    regressions = []
+    for name, current in report['views'].items():
+        base = baseline['views'].get(name)
+        if base is None:
+            continue
+        if current['queries'] > base['queries']:
+            regressions.append(
+                f'{name}: запросов {base["queries"]} -> {current["queries"]}'
+            )
+        for metric, factor, slack in METRICS:
+            limit = max(
+                base[metric] * (1 + tolerance * factor), base[metric] + slack
+            )
+            if current[metric] > limit:
+                regressions.append(
+                    f'{name}: {metric} {base[metric]} -> {current[metric]}'
+                )
+    return regressions
+
+
+def load(path):
+    with open(path) as file:
+        return json.load(file)
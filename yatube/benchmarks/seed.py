@@ -0,0 +1,175 @@
+import random
+from datetime import timedelta
+from itertools import accumulate
+
+from django.conf import settings
+from django.contrib.auth.hashers import make_password
+from django.db import transaction
+from django.utils import timezone
+
+from posts.batching import batches
+from posts.caching import NAMESPACES, bump_versions
+from posts.counters import recount
+from posts.feeds import backfill_feed
+from posts.importing import fixed_dates
+from posts.models import Comment, Follow, Group, Post, Profile, User
+from posts.search import get_backend
+from posts.trending import rank_posts
+from posts.tests.fixtures import FixturesData as FD
+
+# Пачка на одну транзакцию bulk_create; размер INSERT под лимиты
+# переменных СУБД Django подбирает сам.
+BATCH_SIZE = 5000
+USERNAME = 'bench-{number}'
+GROUP_SLUG = 'bench-{number}'
+# Посты за последний год, от новых к старым.
+PERIOD = timedelta(days=365)
+
+
+def zipf_weights(count, skew):
+    """Накопленные веса: немногие авторы пишут и читаются больше всех."""
+    return list(accumulate(
+        1 / (rank + 1) ** skew for rank in range(count)
+    ))
+
+
+class Seeder:
+    """
+    Генератор данных для бенчмарков: пользователи, группы, посты,
+    комментарии и подписки вставляются пачками bulk_create в обход
+    сигналов, производные данные (счётчики, ленты) строятся после.
+    """
+
+    def __init__(self, seed=0, skew=1.1, progress=None):
+        self.random = random.Random(seed)
+        self.skew = skew
+        self.progress = progress or (lambda message: None)
+        self.now = timezone.now()
+
+    def bulk_insert(self, model, objects, total):
+        done = 0
+        for batch in batches(objects, BATCH_SIZE):
+            model.objects.bulk_create(batch)
+            done += len(batch)
+            self.progress(f'{model._meta.model_name}: {done}/{total}')
+
+    def pick(self, ids, weights, count):
+        return self.random.choices(ids, cum_weights=weights, k=count)
+
+    def seed(self, users, groups, posts, comments, follows):
+        start_user = User.objects.order_by('-pk').values_list(
+            'pk', flat=True).first() or 0
+        start_group = Group.objects.count()
+        start_follow = Follow.objects.order_by('-pk').values_list(
+            'pk', flat=True).first() or 0
+        # Пароль один на всех: хэширование - самая медленная часть.
+        password = make_password(FD.USER_USERNAME)
+        with transaction.atomic(), fixed_dates():
+            self.bulk_insert(User, (
+                User(username=USERNAME.format(number=start_user + number),
+                     password=password)
+                for number in range(users)
+            ), users)
+            user_ids = list(User.objects.filter(
+                pk__gt=start_user).values_list('pk', flat=True))
+            self.bulk_insert(Profile, (
+                Profile(user_id=user_id) for user_id in user_ids
+            ), users)
+            self.bulk_insert(Group, (
+                Group(
+                    title=f'{FD.TEST_GROUP_TITLE_1}-{start_group + number}',
+                    slug=GROUP_SLUG.format(number=start_group + number),
+                    description=FD.TEST_GROUP_DESCRIPTION_1
+                )
+                for number in range(groups)
+            ), groups)
+            slugs = dict(Group.objects.values_list('pk', 'slug'))
+            group_ids = list(slugs)
+            self.seed_posts(posts, user_ids, group_ids)
+            post_ids = list(Post.objects.values_list('pk', flat=True))
+            self.seed_comments(comments, user_ids, post_ids)
+            self.seed_follows(follows, user_ids)
+
+        self.progress('Счётчики...')
+        recount()
+        self.progress('Поисковый индекс...')
+        get_backend().rebuild()
+        self.progress('Рейтинг...')
+        rank_posts()
+        self.progress('Ленты подписок...')
+        new_follows = Follow.objects.filter(
+            pk__gt=start_follow).values_list('user_id', 'author_id')
+        for number, (user_id, author_id) in enumerate(
+                new_follows.iterator(), 1):
+            backfill_feed(user_id, author_id)
+            if number % BATCH_SIZE == 0:
+                self.progress(f'feeditem: {number}/{follows}')
+        # Новые авторы и подписчики в кэше ещё не бывали; сбрасываются
+        # страницы, куда попали новые посты: главная, каталог и группы.
+        bump_versions(
+            NAMESPACES['index'],
+            NAMESPACES['groups'],
+            *(NAMESPACES['group'].format(slug=slug)
+              for slug in slugs.values()),
+        )
+
+    def seed_posts(self, count, user_ids, group_ids):
+        authors = self.pick(
+            user_ids, zipf_weights(len(user_ids), self.skew), count)
+
+        def build():
+            for number, author_id in enumerate(authors):
+                pub_date = self.now - PERIOD * (1 - number / count)
+                yield Post(
+                    author_id=author_id,
+                    group_id=(self.random.choice(group_ids)
+                              if group_ids and self.random.random() < 0.7
+                              else None),
+                    text=f'{FD.POST_TEXT} {number}',
+                    pub_date=pub_date,
+                    updated=pub_date,
+                )
+        self.bulk_insert(Post, build(), count)
+
+    def seed_comments(self, count, user_ids, post_ids):
+        if not post_ids:
+            return
+        # post_ids - от новых к старым: свежие посты обсуждают чаще.
+        posts = self.pick(
+            post_ids, zipf_weights(len(post_ids), self.skew), count)
+        self.bulk_insert(Comment, (
+            Comment(
+                post_id=post_id,
+                author_id=self.random.choice(user_ids),
+                text=f'{FD.TEST_POST_TEXT_1} {number}',
+                created=self.now - timedelta(seconds=number),
+            )
+            for number, post_id in enumerate(posts)
+        ), count)
+
+    def seed_follows(self, count, user_ids):
+        """Уникальные пары подписчик-автор, авторы - по Ципфу."""
+        count = min(count, len(user_ids) * (len(user_ids) - 1))
+        weights = zipf_weights(len(user_ids), self.skew)
+        pairs = set()
+        while len(pairs) < count:
+            user_id = self.random.choice(user_ids)
+            author_id = self.pick(user_ids, weights, 1)[0]
+            if user_id != author_id:
+                pairs.add((user_id, author_id))
+        self.bulk_insert(Follow, (
+            Follow(user_id=user_id, author_id=author_id)
+            for user_id, author_id in pairs
+        ), count)
+
+
+def seed(users=100, groups=10, posts=1000, comments=1000, follows=1000,
+         **kwargs):
+    Seeder(**kwargs).seed(users, groups, posts, comments, follows)
+    return {
+        'users': User.objects.count(),
+        'posts': Post.objects.count(),
+        'comments': Comment.objects.count(),
+        'follows': Follow.objects.count(),
+        'fanout_limit': settings.FEED_FANOUT_LIMIT,
+    }
@@ -0,0 +1,111 @@
+import multiprocessing
+import os
+import random
+import sqlite3
+import tempfile
+import time
+from contextlib import closing
+
+from django.conf import settings
+from django.db import OperationalError, close_old_connections, connections
+from django.db.utils import load_backend
+
+from core.db.sqlite3.base import copy_database
+from posts.models import Comment, Post, User
+
+# Стандартный бэкенд без PRAGMA и без постоянных соединений - как
+# было до core.db.sqlite3.
+PLAIN = {
+    'ENGINE': 'django.db.backends.sqlite3',
+    'OPTIONS': {},
+    'CONN_MAX_AGE': 0,
+}
+MODES = ('plain', 'tuned')
+# Чтений ленты на одну запись - как у страницы, после которой
+# оставляют комментарий.
+READS = 3
+
+
+def use_database(path, plain):
+    """Основная база процесса - копия path, при plain - без настроек."""
+    settings_dict = connections.databases['default']
+    settings_dict['NAME'] = path
+    if plain:
+        settings_dict.update(PLAIN)
+    connections['default'] = load_backend(
+        settings_dict['ENGINE']
+    ).DatabaseWrapper(settings_dict, 'default')
+
+
+def run_worker(path, plain, seconds, seed):
+    """
+    Один процесс-воркер: в цикле «запросы» из READS чтений ленты и
+    комментария (с сигналами счётчиков и кэша). Соединения закрываются
+    на границах запросов, как request_started/request_finished.
+    """
+    use_database(path, plain)
+    rng = random.Random(seed)
+    post_ids = list(Post.objects.values_list('pk', flat=True)[:1000])
+    user_ids = list(User.objects.values_list('pk', flat=True)[:1000])
+    writes = locked = 0
+    deadline = time.monotonic() + seconds
+    while time.monotonic() < deadline:
+        close_old_connections()
+        try:
+            for _ in range(READS):
+                list(Post.objects.select_related('author', 'group')[:10])
+            Comment.objects.create(
+                post_id=rng.choice(post_ids),
+                author_id=rng.choice(user_ids),
+                text='stress',
+            )
+            writes += 1
+        except OperationalError as exc:
+            if 'locked' not in str(exc):
+                raise
+            locked += 1
+        finally:
+            close_old_connections()
+    connections.close_all()
+    return {'writes': writes, 'locked': locked}
+
+
+def run_mode(source, mode, processes, seconds):
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, 'stress.sqlite3')
+        copy_database(source, path)
+        if mode == 'plain':
+            # Режим журнала хранится в файле: копия WAL-базы осталась бы
+            # в WAL.
+            with closing(sqlite3.connect(path)) as conn:
+                conn.execute('PRAGMA journal_mode = delete')
+        connections.close_all()
+        context = multiprocessing.get_context('fork')
+        started = time.monotonic()
+        with context.Pool(processes) as pool:
+            results = pool.starmap(run_worker, (
+                (path, mode == 'plain', seconds, seed)
+                for seed in range(processes)
+            ))
+        elapsed = time.monotonic() - started
+    writes = sum(result['writes'] for result in results)
+    return {
+        'writes': writes,
+        'locked': sum(result['locked'] for result in results),
+        'writes_per_second': round(writes / elapsed, 1),
+    }
+
+
+def run(processes=4, seconds=10, modes=MODES):
+    """
+    Нагрузка записью на копию основной базы: processes процессов
+    seconds секунд в каждом режиме. Сама база не меняется.
+    """
+    source = settings.DATABASES['default']['NAME']
+    return {
+        'meta': {'processes': processes, 'seconds': seconds},
+        'modes': {
+            mode: run_mode(source, mode, processes, seconds)
+            for mode in modes
+        },
+    }
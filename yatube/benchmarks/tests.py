@@ -0,0 +1,70 @@
+import copy
+
+from django.db.models import Max, Min, Sum
+from django.test import LiveServerTestCase, TestCase
+from django.urls import reverse
+
+from posts.models import Comment, FeedItem, Follow, Post, Profile
+
+from .load import run_load
+from .runner import compare, run
+from .seed import PERIOD, seed
+
+
+class BenchmarksTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.counts = seed(
+            users=6, groups=2, posts=40, comments=30, follows=8
+        )
+
+    def test_seed(self):
+        """Данные вставлены с историей дат, счётчики и ленты построены."""
+        self.assertEqual(Post.objects.count(), 40)
+        self.assertEqual(Comment.objects.count(), 30)
+        self.assertEqual(Follow.objects.count(), 8)
+        self.assertEqual(
+            Profile.objects.aggregate(total=Sum('posts_count'))['total'], 40
+        )
+        self.assertEqual(
+            Post.objects.aggregate(
+                total=Sum('comments_count'))['total'], 30
+        )
+        self.assertTrue(FeedItem.objects.exists())
+        # Даты заданы явно, а не auto_now_add.
+        dates = Post.objects.aggregate(
+            first=Min('pub_date'), last=Max('pub_date'))
+        self.assertGreater(dates['last'] - dates['first'], PERIOD / 2)
+
+    def test_run_and_compare(self):
+        """Прогон меряет все страницы, compare ловит лишний запрос."""
+        report = run(repeat=2)
+        self.assertEqual(set(report['views']), {
+            'index', 'index_deep', 'group_posts', 'profile',
+            'profile_deep', 'post_detail', 'popular', 'popular_deep',
+            'follow_index', 'follow_index_deep',
+        })
+        for row in report['views'].values():
+            self.assertEqual(row['status'], 200)
+            self.assertGreater(row['queries'], 0)
+            self.assertLessEqual(row['p50_ms'], row['p99_ms'])
+
+        self.assertEqual(compare(report, report), [])
+        baseline = copy.deepcopy(report)
+        baseline['views']['index']['queries'] -= 1
+        self.assertEqual(len(compare(report, baseline)), 1)
+
+
+class LoadTests(LiveServerTestCase):
+    def test_run_load(self):
+        """Нагрузочный прогон считает ответы и ошибки живого сервера."""
+        report = run_load(
+            self.live_server_url,
+            [reverse('about:author'), '/missing-page/'],
+            concurrency=2, duration=0.5
+        )
+        self.assertGreater(report['requests'], 0)
+        self.assertGreater(report['errors'], 0)
+        self.assertLess(report['errors'], report['requests'])
+        self.assertLessEqual(report['p50_ms'], report['p99_ms'])
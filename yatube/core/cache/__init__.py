@@ -0,0 +1,6 @@
+# CACHES без кэша: бенчмарки и разбор планов видят все запросы view.
+DUMMY_CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.dummy.DummyCache',
+    }
+}
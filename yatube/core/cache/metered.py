@@ -0,0 +1,70 @@
+from django.core.cache import caches
+from django.core.cache.backends.base import DEFAULT_TIMEOUT, BaseCache
+
+from core import metrics
+
+MISSING = object()
+
+
+class MeteredCache(BaseCache):
+    """
+    Прослойка перед кэшем-алиасом LOCATION: считает попадания
+    и промахи текущего запроса для метрик. Ключи, версии и таймауты
+    передаются как есть - KEY_PREFIX и VERSION у алиаса.
+    """
+
+    def __init__(self, location, params):
+        super().__init__(params)
+        self._alias = location
+
+    @property
+    def backend(self):
+        return caches[self._alias]
+
+    @staticmethod
+    def _record(hits, misses):
+        stats = metrics.current()
+        if stats is not None:
+            stats.cache_hits += hits
+            stats.cache_misses += misses
+
+    def get(self, key, default=None, version=None):
+        value = self.backend.get(key, MISSING, version=version)
+        self._record(value is not MISSING, value is MISSING)
+        return default if value is MISSING else value
+
+    def get_many(self, keys, version=None):
+        keys = list(keys)
+        found = self.backend.get_many(keys, version=version)
+        self._record(len(found), len(keys) - len(found))
+        return found
+
+    def add(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        return self.backend.add(key, value, timeout, version)
+
+    def set(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        self.backend.set(key, value, timeout, version)
+
+    def set_many(self, data, timeout=DEFAULT_TIMEOUT, version=None):
+        return self.backend.set_many(data, timeout, version)
+
+    def touch(self, key, timeout=DEFAULT_TIMEOUT, version=None):
+        return self.backend.touch(key, timeout, version)
+
+    def delete(self, key, version=None):
+        self.backend.delete(key, version=version)
+
+    def delete_many(self, keys, version=None):
+        self.backend.delete_many(keys, version=version)
+
+    def has_key(self, key, version=None):
+        return self.backend.has_key(key, version=version)
+
+    def incr(self, key, delta=1, version=None):
+        return self.backend.incr(key, delta, version=version)
+
+    def clear(self):
+        self.backend.clear()
+
+    def close(self, **kwargs):
+        self.backend.close(**kwargs)
@@ -0,0 +1,164 @@
+import os
+import pickle
+import threading
+import time
+
+from django.core.cache.backends.base import DEFAULT_TIMEOUT, BaseCache
+
+from .resp import RespConnection
+
+DEFAULT_PORT = 6379
+
+
+class RedisCache(BaseCache):
+    """
+    Кэш в Redis-совместимом сервере по протоколу RESP, без сторонних
+    библиотек. Значения хранятся в pickle, срок жизни - через PX.
+    LOCATION: 'host:port'. Соединение своё у каждого потока
+    и переоткрывается после fork воркера.
+    """
+
+    def __init__(self, server, params):
+        super().__init__(params)
+        host, _, port = (server or '127.0.0.1').partition(':')
+        self._address = (host, int(port or DEFAULT_PORT))
+        self._socket_timeout = params.get('OPTIONS', {}).get(
+            'SOCKET_TIMEOUT', 5
+        )
+        self._local = threading.local()
+
+    @property
+    def _client(self):
+        client = getattr(self._local, 'client', None)
+        if client is None or self._local.pid != os.getpid():
+            client = RespConnection(*self._address, self._socket_timeout)
+            self._local.client = client
+            self._local.pid = os.getpid()
+        return client
+
+    def _execute(self, *args):
+        return self._pipeline((args,))[0]
+
+    def _pipeline(self, commands):
+        """
+        Любая ошибка посреди обмена закрывает соединение: непрочитанный
+        остаток ответа иначе достался бы следующей команде.
+        """
+        try:
+            return self._client.pipeline(commands)
+        except BaseException:
+            self.disconnect()
+            raise
+
+    def _key(self, key, version):
+        key = self.make_key(key, version=version)
+        self.validate_key(key)
+        return key
+
+    def _expire_args(self, timeout):
+        """Аргументы PX для SET; None - ключ уже истёк."""
+        expire_at = self.get_backend_timeout(timeout)
+        if expire_at is None:
+            return ()
+        milliseconds = int((expire_at - time.time()) * 1000)
+        if milliseconds <= 0:
+            return None
+        return ('PX', milliseconds)
+
+    @staticmethod
+    def _load(value):
+        return None if value is None else pickle.loads(value)
+
+    @staticmethod
+    def _dump(value):
+        return pickle.dumps(value, pickle.HIGHEST_PROTOCOL)
+
+    def add(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        key = self._key(key, version)
+        expire = self._expire_args(timeout)
+        if expire is None:
+            return False
+        return self._execute(
+            'SET', key, self._dump(value), *expire, 'NX'
+        ) is not None
+
+    def get(self, key, default=None, version=None):
+        value = self._execute('GET', self._key(key, version))
+        return default if value is None else self._load(value)
+
+    def set(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        key = self._key(key, version)
+        expire = self._expire_args(timeout)
+        if expire is None:
+            self._execute('DEL', key)
+            return
+        self._execute('SET', key, self._dump(value), *expire)
+
+    def touch(self, key, timeout=DEFAULT_TIMEOUT, version=None):
+        key = self._key(key, version)
+        expire = self._expire_args(timeout)
+        if expire is None:
+            return bool(self._execute('DEL', key))
+        if not expire:
+            return bool(self._execute('PERSIST', key))
+        return bool(self._execute('PEXPIRE', key, expire[1]))
+
+    def delete(self, key, version=None):
+        self._execute('DEL', self._key(key, version))
+
+    def get_many(self, keys, version=None):
+        keys = list(keys)
+        if not keys:
+            return {}
+        values = self._execute(
+            'MGET', *(self._key(key, version) for key in keys)
+        )
+        return {
+            key: self._load(value)
+            for key, value in zip(keys, values) if value is not None
+        }
+
+    def set_many(self, data, timeout=DEFAULT_TIMEOUT, version=None):
+        """Все SET одной пачкой (pipeline)."""
+        expire = self._expire_args(timeout)
+        if expire is None:
+            self.delete_many(data, version=version)
+            return []
+        if data:
+            self._pipeline([
+                ('SET', self._key(key, version), self._dump(value), *expire)
+                for key, value in data.items()
+            ])
+        return []
+
+    def delete_many(self, keys, version=None):
+        keys = [self._key(key, version) for key in keys]
+        if keys:
+            self._execute('DEL', *keys)
+
+    def has_key(self, key, version=None):
+        return bool(self._execute('EXISTS', self._key(key, version)))
+
+    def clear(self):
+        self._execute('FLUSHDB')
+
+    def info(self):
+        """Раздел stats команды INFO: попадания и промахи сервера."""
+        stats = {}
+        for line in self._execute('INFO', 'stats').decode().split():
+            name, _, value = line.partition(':')
+            if value.isdigit():
+                stats[name] = int(value)
+        return stats
+
+    def close(self, **kwargs):
+        """
+        Django закрывает кэши после каждого запроса; соединение
+        при этом сохраняется, чтобы не переподключаться.
+        """
+
+    def disconnect(self):
+        client = getattr(self._local, 'client', None)
+        if client is not None:
+            self._local.client = None
+            client.close()
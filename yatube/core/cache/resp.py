@@ -0,0 +1,69 @@
+import socket
+
+CRLF = b'\r\n'
+
+
+class RespError(Exception):
+    """Ошибка, которую вернул сервер (ответ вида -ERR ...)."""
+
+
+def encode_command(*args):
+    """Команда в формате RESP: массив bulk-строк."""
+    parts = [b'*%d\r\n' % len(args)]
+    for arg in args:
+        if isinstance(arg, str):
+            arg = arg.encode()
+        elif isinstance(arg, int):
+            arg = str(arg).encode()
+        parts.append(b'$%d\r\n%s\r\n' % (len(arg), arg))
+    return b''.join(parts)
+
+
+def read_reply(stream):
+    """Один ответ сервера из файлового объекта сокета."""
+    line = stream.readline()
+    if not line:
+        raise ConnectionError('Соединение закрыто сервером.')
+    kind, payload = line[:1], line[1:-2]
+    if kind == b'+':
+        return payload.decode()
+    if kind == b'-':
+        raise RespError(payload.decode())
+    if kind == b':':
+        return int(payload)
+    if kind == b'$':
+        length = int(payload)
+        if length == -1:
+            return None
+        data = stream.read(length + 2)
+        return data[:-2]
+    if kind == b'*':
+        length = int(payload)
+        if length == -1:
+            return None
+        return [read_reply(stream) for _ in range(length)]
+    raise RespError(f'Неизвестный тип ответа: {line!r}')
+
+
+class RespConnection:
+    """
+    Соединение с Redis-совместимым сервером.
+    pipeline() отправляет несколько команд одним пакетом
+    и читает ответы подряд - один сетевой обмен на пачку.
+    """
+
+    def __init__(self, host, port, timeout=None):
+        self.sock = socket.create_connection((host, port), timeout)
+        self.sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        self.stream = self.sock.makefile('rb')
+
+    def execute(self, *args):
+        return self.pipeline((args,))[0]
+
+    def pipeline(self, commands):
+        self.sock.sendall(b''.join(encode_command(*args) for args in commands))
+        return [read_reply(self.stream) for _ in commands]
+
+    def close(self):
+        self.stream.close()
+        self.sock.close()
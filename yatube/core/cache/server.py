@@ -0,0 +1,139 @@
+import socketserver
+import threading
+import time
+
+from .resp import CRLF, RespError, read_reply
+
+
+def encode_reply(value):
+    """Ответ сервера в формате RESP."""
+    if value is None:
+        return b'$-1\r\n'
+    if isinstance(value, RespError):
+        return b'-ERR %s\r\n' % str(value).encode()
+    if isinstance(value, bool):
+        return b':%d\r\n' % value
+    if isinstance(value, int):
+        return b':%d\r\n' % value
+    if isinstance(value, str):
+        return b'+%s\r\n' % value.encode()
+    if isinstance(value, list):
+        return b'*%d\r\n' % len(value) + b''.join(
+            encode_reply(item) for item in value
+        )
+    return b'$%d\r\n%s\r\n' % (len(value), value)
+
+
+class Storage:
+    """
+    Словарь с истечением ключей и счётчиками попаданий -
+    минимальная замена Redis для разработки, тестов и бенчмарков.
+    """
+
+    def __init__(self):
+        self.data = {}
+        self.expires = {}
+        self.hits = 0
+        self.misses = 0
+        self.lock = threading.Lock()
+
+    def _alive(self, key):
+        expire_at = self.expires.get(key)
+        if expire_at is not None and expire_at <= time.time():
+            self.data.pop(key, None)
+            self.expires.pop(key, None)
+        return key in self.data
+
+    def _get(self, key):
+        if self._alive(key):
+            self.hits += 1
+            return self.data[key]
+        self.misses += 1
+        return None
+
+    def command(self, name, *args):
+        handler = getattr(self, f'cmd_{name.decode().lower()}', None)
+        if handler is None:
+            return RespError(f'unknown command {name.decode()}')
+        with self.lock:
+            return handler(*args)
+
+    def cmd_ping(self, *args):
+        return 'PONG'
+
+    def cmd_get(self, key):
+        return self._get(key)
+
+    def cmd_mget(self, *keys):
+        return [self._get(key) for key in keys]
+
+    def cmd_set(self, key, value, *options):
+        options = [option.upper() for option in options]
+        if b'NX' in options and self._alive(key):
+            return None
+        self.data[key] = value
+        self.expires.pop(key, None)
+        if b'PX' in options:
+            milliseconds = int(options[options.index(b'PX') + 1])
+            self.expires[key] = time.time() + milliseconds / 1000
+        return 'OK'
+
+    def cmd_del(self, *keys):
+        deleted = 0
+        for key in keys:
+            deleted += self._alive(key)
+            self.data.pop(key, None)
+            self.expires.pop(key, None)
+        return deleted
+
+    def cmd_exists(self, *keys):
+        return sum(self._alive(key) for key in keys)
+
+    def cmd_pexpire(self, key, milliseconds):
+        if not self._alive(key):
+            return 0
+        self.expires[key] = time.time() + int(milliseconds) / 1000
+        return 1
+
+    def cmd_persist(self, key):
+        return int(self.expires.pop(key, None) is not None)
+
+    def cmd_flushdb(self, *args):
+        self.data.clear()
+        self.expires.clear()
+        return 'OK'
+
+    def cmd_info(self, *args):
+        return (
+            f'# Stats{CRLF.decode()}'
+            f'keyspace_hits:{self.hits}{CRLF.decode()}'
+            f'keyspace_misses:{self.misses}{CRLF.decode()}'
+            f'keys:{len(self.data)}{CRLF.decode()}'
+        ).encode()
+
+
+class RespHandler(socketserver.StreamRequestHandler):
+    def handle(self):
+        while True:
+            try:
+                command = read_reply(self.rfile)
+            except (ConnectionError, RespError, ValueError):
+                return
+            reply = self.server.storage.command(*command)
+            self.wfile.write(encode_reply(reply))
+
+
+class RespServer(socketserver.ThreadingTCPServer):
+    """Redis-совместимый stand-in сервер: поток на соединение."""
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self, address):
+        super().__init__(address, RespHandler)
+        self.storage = Storage()
+
+    def start(self):
+        """Запуск в фоновом потоке; возвращает (host, port)."""
+        thread = threading.Thread(target=self.serve_forever, daemon=True)
+        thread.start()
+        return self.server_address
@@ -0,0 +1,143 @@
+import threading
+import time
+from collections import OrderedDict
+
+from django.core.cache import caches
+from django.core.cache.backends.base import DEFAULT_TIMEOUT, BaseCache
+
+
+class TieredCache(BaseCache):
+    """
+    Двухуровневый кэш: маленький LRU в памяти процесса перед общим
+    кэшем (LOCATION - его алиас в CACHES).
+    Запись идёт в оба уровня. Локальная копия живёт не дольше
+    LOCAL_TIMEOUT секунд, поэтому изменения из других процессов
+    (в том числе смена версий пространств имён) видны с этой
+    задержкой. KEY_PREFIX и VERSION берутся у общего кэша.
+    """
+
+    def __init__(self, location, params):
+        super().__init__(params)
+        options = params.get('OPTIONS', {})
+        self._shared_alias = location
+        self._local_max_entries = options.get('LOCAL_MAX_ENTRIES', 1000)
+        self._local_timeout = options.get('LOCAL_TIMEOUT', 5)
+        self._local = OrderedDict()
+        self._lock = threading.Lock()
+        self.local_hits = self.shared_hits = self.misses = 0
+
+    @property
+    def shared(self):
+        return caches[self._shared_alias]
+
+    def _local_get(self, key):
+        with self._lock:
+            entry = self._local.get(key)
+            if entry is None:
+                return None
+            expire_at, value = entry
+            if expire_at <= time.monotonic():
+                del self._local[key]
+                return None
+            self._local.move_to_end(key)
+            return entry
+
+    def _local_set(self, key, value):
+        with self._lock:
+            self._local[key] = (time.monotonic() + self._local_timeout, value)
+            self._local.move_to_end(key)
+            while len(self._local) > self._local_max_entries:
+                self._local.popitem(last=False)
+
+    def _local_delete(self, *keys):
+        with self._lock:
+            for key in keys:
+                self._local.pop(key, None)
+
+    def _key(self, key, version):
+        return self.shared.make_key(key, version=version)
+
+    def add(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        added = self.shared.add(
+            key, value, self._timeout(timeout), version=version
+        )
+        if added:
+            self._local_set(self._key(key, version), value)
+        return added
+
+    def get(self, key, default=None, version=None):
+        full_key = self._key(key, version)
+        entry = self._local_get(full_key)
+        if entry is not None:
+            self.local_hits += 1
+            return entry[1]
+        value = self.shared.get(key, version=version)
+        if value is None:
+            self.misses += 1
+            return default
+        self.shared_hits += 1
+        self._local_set(full_key, value)
+        return value
+
+    def set(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        self.shared.set(key, value, self._timeout(timeout), version=version)
+        self._local_set(self._key(key, version), value)
+
+    def touch(self, key, timeout=DEFAULT_TIMEOUT, version=None):
+        return self.shared.touch(
+            key, self._timeout(timeout), version=version
+        )
+
+    def delete(self, key, version=None):
+        self.shared.delete(key, version=version)
+        self._local_delete(self._key(key, version))
+
+    def get_many(self, keys, version=None):
+        """Локальные попадания плюс один get_many к общему кэшу."""
+        found = {}
+        missing = []
+        for key in keys:
+            entry = self._local_get(self._key(key, version))
+            if entry is None:
+                missing.append(key)
+            else:
+                found[key] = entry[1]
+        self.local_hits += len(found)
+        if missing:
+            shared = self.shared.get_many(missing, version=version)
+            for key, value in shared.items():
+                self._local_set(self._key(key, version), value)
+                found[key] = value
+            self.shared_hits += len(shared)
+            self.misses += len(missing) - len(shared)
+        return found
+
+    def set_many(self, data, timeout=DEFAULT_TIMEOUT, version=None):
+        failed = self.shared.set_many(
+            data, self._timeout(timeout), version=version
+        )
+        for key, value in data.items():
+            self._local_set(self._key(key, version), value)
+        return failed
+
+    def delete_many(self, keys, version=None):
+        self.shared.delete_many(keys, version=version)
+        self._local_delete(*(self._key(key, version) for key in keys))
+
+    def has_key(self, key, version=None):
+        return (
+            self._local_get(self._key(key, version)) is not None
+            or self.shared.has_key(key, version=version)
+        )
+
+    def clear(self):
+        self.shared.clear()
+        with self._lock:
+            self._local.clear()
+
+    def close(self, **kwargs):
+        self.shared.close(**kwargs)
+
+    def _timeout(self, timeout):
+        """Таймаут по умолчанию - свой, а не общего кэша."""
+        return self.default_timeout if timeout is DEFAULT_TIMEOUT else timeout
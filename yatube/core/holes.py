@@ -0,0 +1,56 @@
+import base64
+import json
+import re
+
+from django.template.loader import render_to_string
+
+# Флаг запроса: страница рендерится для общего кэша, вместо «дыр»
+# выводятся метки.
+PUNCH_HOLES = '_punch_holes'
+MARKER = '<!--hole:{name}:{args}-->'
+MARKER_RE = re.compile(r'<!--hole:(\w+):([\w=-]*)-->')
+
+HOLES = {}
+
+
+def register(name, template_name):
+    """
+    Регистрация «дыры» - куска страницы, зависящего от пользователя.
+    Декорирует функцию (request, **args) -> доп. контекст шаблона.
+    """
+    def decorator(get_context):
+        HOLES[name] = (template_name, get_context)
+        return get_context
+    return decorator
+
+
+def render_hole(request, name, args):
+    template_name, get_context = HOLES[name]
+    return render_to_string(
+        template_name, get_context(request, **args), request=request
+    )
+
+
+def placeholder(name, args):
+    """Метка в духе ESI: имя и аргументы (JSON) вместо содержимого."""
+    encoded = base64.urlsafe_b64encode(
+        json.dumps(args, sort_keys=True).encode()
+    ).decode()
+    return MARKER.format(name=name, args=encoded)
+
+
+def fill_holes(html, request):
+    """Заполнение меток страницы из кэша для текущего пользователя."""
+    return MARKER_RE.sub(
+        lambda match: render_hole(
+            request,
+            match.group(1),
+            json.loads(base64.urlsafe_b64decode(match.group(2)))
+        ),
+        html
+    )
+
+
+@register('header', 'includes/header.html')
+def header(request):
+    return {}
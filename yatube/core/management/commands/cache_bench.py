@@ -0,0 +1,146 @@
+import json
+import multiprocessing
+import random
+import time
+from itertools import accumulate
+
+from django.core.cache import caches
+from django.core.management.base import BaseCommand, CommandError
+from django.test.utils import override_settings
+
+from core.cache.server import RespServer
+from core.cache.tiered import TieredCache
+
+BACKENDS = ('locmem', 'redis', 'tiered')
+
+
+def bench_caches(name, location):
+    """Настройки CACHES для одного прогона."""
+    shared = {
+        'BACKEND': 'core.cache.redis.RedisCache',
+        'LOCATION': location,
+    }
+    if name == 'locmem':
+        return {'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+            'LOCATION': 'cache-bench',
+        }}
+    if name == 'redis':
+        return {'default': shared}
+    return {
+        'default': {
+            'BACKEND': 'core.cache.tiered.TieredCache',
+            'LOCATION': 'shared',
+        },
+        'shared': shared,
+    }
+
+
+def run_worker(seed, requests, cum_weights, payload):
+    """
+    Один процесс: чтения с распределением Ципфа, промах дописывает
+    значение в кэш - как страница ленты после рендера.
+    """
+    cache = caches['default']
+    rng = random.Random(seed)
+    keys = [f'bench-{i}' for i in range(len(cum_weights))]
+    hits = 0
+    started = time.perf_counter()
+    for key in rng.choices(keys, cum_weights=cum_weights, k=requests):
+        if cache.get(key) is None:
+            cache.set(key, payload)
+        else:
+            hits += 1
+    result = {
+        'hits': hits,
+        'requests': requests,
+        'seconds': time.perf_counter() - started,
+    }
+    if isinstance(cache, TieredCache):
+        result['local_hits'] = cache.local_hits
+    return result
+
+
+class Command(BaseCommand):
+    help = (
+        'Сравнивает доли попаданий кэшей при работе нескольких процессов: '
+        'LocMem у каждого процесса свой, Redis-совместимый кэш общий, '
+        'двухуровневый добавляет LRU в памяти процесса. Без --location '
+        'поднимается локальный stand-in сервер.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--processes', type=int, default=4)
+        parser.add_argument('--requests', type=int, default=5000)
+        parser.add_argument('--keys', type=int, default=2000)
+        parser.add_argument(
+            '--skew', type=float, default=1.1,
+            help='Параметр распределения Ципфа для выбора ключей.'
+        )
+        parser.add_argument(
+            '--backends', default=','.join(BACKENDS),
+            help='Через запятую: ' + ', '.join(BACKENDS)
+        )
+        parser.add_argument('--location', help='host:port сервера кэша.')
+        parser.add_argument('--payload-size', type=int, default=2048)
+        parser.add_argument('--json', action='store_true')
+
+    def handle(self, *args, **options):
+        backends = options['backends'].split(',')
+        unknown = set(backends) - set(BACKENDS)
+        if unknown:
+            raise CommandError(f'Неизвестные кэши: {", ".join(unknown)}.')
+
+        server = None
+        location = options['location']
+        if location is None:
+            server = RespServer(('127.0.0.1', 0))
+            location = '%s:%d' % server.start()
+
+        cum_weights = list(accumulate(
+            1 / (rank + 1) ** options['skew']
+            for rank in range(options['keys'])
+        ))
+        payload = b'x' * options['payload_size']
+        context = multiprocessing.get_context('fork')
+        report = {}
+        try:
+            for name in backends:
+                with override_settings(CACHES=bench_caches(name, location)):
+                    caches['default'].clear()
+                    with context.Pool(options['processes']) as pool:
+                        results = pool.starmap(run_worker, (
+                            (seed, options['requests'], cum_weights, payload)
+                            for seed in range(options['processes'])
+                        ))
+                report[name] = self.summarize(results)
+        finally:
+            if server is not None:
+                server.shutdown()
+                server.server_close()
+
+        if options['json']:
+            self.stdout.write(json.dumps(report, indent=2))
+            return
+        for name, row in report.items():
+            self.stdout.write(
+                f'{name:>8}: попаданий {row["hit_rate"]:.1%}, '
+                f'{row["ops_per_second"]:.0f} оп/с на процесс'
+                + (f', из памяти процесса {row["local_hit_rate"]:.1%}'
+                   if 'local_hit_rate' in row else '')
+            )
+
+    @staticmethod
+    def summarize(results):
+        requests = sum(result['requests'] for result in results)
+        row = {
+            'hit_rate': sum(result['hits'] for result in results) / requests,
+            'ops_per_second': sum(
+                result['requests'] / result['seconds'] for result in results
+            ) / len(results),
+        }
+        if 'local_hits' in results[0]:
+            row['local_hit_rate'] = sum(
+                result['local_hits'] for result in results
+            ) / requests
+        return row
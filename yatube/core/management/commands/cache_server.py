@@ -0,0 +1,27 @@
+from django.core.management.base import BaseCommand
+
+from core.cache.server import RespServer
+
+
+class Command(BaseCommand):
+    help = (
+        'Запускает Redis-совместимый stand-in сервер кэша для разработки: '
+        'CACHE_BACKEND=redis CACHE_LOCATION=host:port.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--host', default='127.0.0.1')
+        parser.add_argument('--port', type=int, default=6379)
+
+    def handle(self, *args, **options):
+        server = RespServer((options['host'], options['port']))
+        host, port = server.server_address
+        self.stdout.write(self.style.SUCCESS(
+            f'Сервер кэша слушает {host}:{port}.'
+        ))
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            server.server_close()
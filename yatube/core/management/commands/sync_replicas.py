@@ -0,0 +1,25 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+
+from core.db.sqlite3.base import copy_database
+from core.routers import PRIMARY
+
+
+class Command(BaseCommand):
+    help = (
+        'Копирует основную базу SQLite в файлы реплик (DB_REPLICAS) - '
+        'локальная замена репликации: между запусками реплики отстают.'
+    )
+
+    def handle(self, *args, **options):
+        if connections[PRIMARY].vendor != 'sqlite':
+            raise CommandError(
+                'Только для SQLite: настоящие реплики обновляет СУБД.')
+        if not settings.DATABASE_REPLICAS:
+            raise CommandError('Реплики не заданы: DB_REPLICAS пуст.')
+        source = settings.DATABASES[PRIMARY]['NAME']
+        for alias in settings.DATABASE_REPLICAS:
+            connections[alias].close()
+            copy_database(source, settings.DATABASES[alias]['NAME'])
+            self.stdout.write(f'{alias}: {settings.DATABASES[alias]["NAME"]}')
@@ -0,0 +1,141 @@
+import threading
+import time
+from bisect import bisect_left
+from collections import defaultdict
+
+_local = threading.local()
+
+# Имя, тип и описание каждой метрики для /metrics.
+METRICS = {
+    'yatube_requests_total': (
+        'counter', 'Запросы по view, методу и статусу.'),
+    'yatube_request_duration_seconds': (
+        'histogram', 'Время обработки запроса.'),
+    'yatube_db_queries_total': ('counter', 'SQL-запросы.'),
+    'yatube_db_duration_seconds_total': ('counter', 'Время в SQL.'),
+    'yatube_cache_hits_total': ('counter', 'Попадания в кэш.'),
+    'yatube_cache_misses_total': ('counter', 'Промахи кэша.'),
+    'yatube_render_duration_seconds_total': (
+        'counter', 'Время рендера шаблонов.'),
+    'yatube_query_budget_exceeded_total': (
+        'counter', 'Превышения бюджета SQL-запросов.'),
+}
+DURATION_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5)
+
+
+class RequestStats:
+    """Счётчики одного запроса, собираются в потоке, который его ведёт."""
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.queries = 0
+        self.db_time = 0.0
+        self.cache_hits = 0
+        self.cache_misses = 0
+        self.render_time = 0.0
+        self.render_depth = 0
+
+    @property
+    def duration(self):
+        return time.perf_counter() - self.started
+
+
+def start_request():
+    _local.stats = RequestStats()
+    return _local.stats
+
+
+def finish_request():
+    _local.stats = None
+
+
+def current():
+    """Счётчики текущего запроса или None вне запроса."""
+    return getattr(_local, 'stats', None)
+
+
+class Registry:
+    """
+    Метрики процесса в памяти: счётчики и гистограммы с метками.
+    У каждого воркера gunicorn своя копия - Prometheus собирает
+    их с каждого воркера отдельно.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._counters = defaultdict(float)
+        self._histograms = {}
+
+    def inc(self, name, labels, value=1):
+        with self._lock:
+            self._counters[name, labels] += value
+
+    def observe(self, name, labels, value, buckets=DURATION_BUCKETS):
+        with self._lock:
+            histogram = self._histograms.setdefault(
+                (name, labels), [buckets, [0] * len(buckets), 0.0, 0]
+            )
+            index = bisect_left(buckets, value)
+            if index < len(buckets):
+                histogram[1][index] += 1
+            histogram[2] += value
+            histogram[3] += 1
+
+    def clear(self):
+        with self._lock:
+            self._counters.clear()
+            self._histograms.clear()
+
+    def get(self, name, labels):
+        return self._counters.get((name, labels), 0)
+
+    def render(self):
+        """Текстовый формат экспозиции Prometheus 0.0.4."""
+        with self._lock:
+            counters = sorted(self._counters.items())
+            histograms = sorted(
+                (key, (buckets, list(counts), total, count))
+                for key, (buckets, counts, total, count)
+                in self._histograms.items()
+            )
+        lines = []
+        for name, (kind, help_text) in METRICS.items():
+            lines += [f'# HELP {name} {help_text}', f'# TYPE {name} {kind}']
+            for (metric, labels), value in counters:
+                if metric == name:
+                    lines.append(f'{name}{format_labels(labels)} {value:g}')
+            for (metric, labels), histogram in histograms:
+                if metric == name:
+                    lines += render_histogram(name, labels, *histogram)
+        return '\n'.join(lines) + '\n'
+
+
+def format_labels(labels, **extra):
+    pairs = list(labels) + list(extra.items())
+    if not pairs:
+        return ''
+    return '{' + ','.join(
+        '{}="{}"'.format(key, str(value).replace('\\', '\\\\')
+                         .replace('"', '\\"').replace('\n', '\\n'))
+        for key, value in pairs
+    ) + '}'
+
+
+def render_histogram(name, labels, buckets, counts, total, count):
+    lines = []
+    cumulative = 0
+    for bound, bucket_count in zip(buckets, counts):
+        cumulative += bucket_count
+        lines.append(
+            f'{name}_bucket{format_labels(labels, le=f"{bound:g}")} '
+            f'{cumulative}'
+        )
+    lines += [
+        f'{name}_bucket{format_labels(labels, le="+Inf")} {count}',
+        f'{name}_sum{format_labels(labels)} {total:g}',
+        f'{name}_count{format_labels(labels)} {count}',
+    ]
+    return lines
+
+
+registry = Registry()
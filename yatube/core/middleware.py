@@ -0,0 +1,129 @@
+import json
+import logging
+import time
+from contextlib import ExitStack
+
+from django.conf import settings
+from django.db import connections
+
+from core import metrics, routers
+
+logger = logging.getLogger('core.requests')
+
+SAFE_METHODS = ('GET', 'HEAD', 'OPTIONS')
+
+
+class QueryBudgetExceeded(Exception):
+    """View выполнила больше SQL-запросов, чем разрешает её бюджет."""
+
+
+def timed_execute(stats):
+    def wrapper(execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            stats.queries += 1
+            stats.db_time += time.perf_counter() - started
+    return wrapper
+
+
+class RequestMetricsMiddleware:
+    """
+    Для каждого запроса считает SQL-запросы и время в БД, попадания
+    и промахи кэша, время рендера. Пишет их в реестр метрик (/metrics)
+    и в журнал core.requests строкой JSON. Если view превысила
+    QUERY_BUDGETS, в журнал идёт ошибка, а при QUERY_BUDGET_STRICT
+    (тесты) - исключение QueryBudgetExceeded.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        stats = metrics.start_request()
+        try:
+            with ExitStack() as stack:
+                for connection in connections.all():
+                    stack.enter_context(
+                        connection.execute_wrapper(timed_execute(stats))
+                    )
+                response = self.get_response(request)
+            self.record(request, response, stats)
+        finally:
+            metrics.finish_request()
+        return response
+
+    def record(self, request, response, stats):
+        match = request.resolver_match
+        view = match.view_name if match else 'unresolved'
+        labels = (('view', view),)
+        registry = metrics.registry
+        registry.inc('yatube_requests_total', labels + (
+            ('method', request.method),
+            ('status', response.status_code),
+        ))
+        registry.observe(
+            'yatube_request_duration_seconds', labels, stats.duration
+        )
+        registry.inc('yatube_db_queries_total', labels, stats.queries)
+        registry.inc('yatube_db_duration_seconds_total', labels,
+                     stats.db_time)
+        registry.inc('yatube_cache_hits_total', labels, stats.cache_hits)
+        registry.inc('yatube_cache_misses_total', labels, stats.cache_misses)
+        registry.inc('yatube_render_duration_seconds_total', labels,
+                     stats.render_time)
+
+        record = {
+            'view': view,
+            'method': request.method,
+            'path': request.path,
+            'status': response.status_code,
+            'queries': stats.queries,
+            'db_ms': round(stats.db_time * 1000, 3),
+            'cache_hits': stats.cache_hits,
+            'cache_misses': stats.cache_misses,
+            'render_ms': round(stats.render_time * 1000, 3),
+            'duration_ms': round(stats.duration * 1000, 3),
+        }
+        budget = settings.QUERY_BUDGETS.get(view)
+        if budget is None or stats.queries <= budget:
+            logger.info(json.dumps(record, ensure_ascii=False))
+            return
+        registry.inc('yatube_query_budget_exceeded_total', labels)
+        record['budget'] = budget
+        logger.error(json.dumps(record, ensure_ascii=False))
+        if settings.QUERY_BUDGET_STRICT:
+            raise QueryBudgetExceeded(
+                f'{view}: {stats.queries} SQL-запросов при бюджете {budget}.'
+            )
+
+
+class ReplicaPinMiddleware:
+    """
+    Чтения с реплик (DATABASE_REPLICAS) с закреплением за основной
+    базой после записи: клиент получает cookie REPLICA_PIN_COOKIE и
+    следующие REPLICA_PIN_SECONDS читает с основной базы - реплики
+    отстают, а свои изменения пользователь должен видеть сразу.
+    Изменяющие запросы (POST и т. п.) читают с основной базы целиком.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        routers.start_request(
+            pinned=request.method not in SAFE_METHODS
+            or settings.REPLICA_PIN_COOKIE in request.COOKIES
+        )
+        try:
+            response = self.get_response(request)
+            if routers.wrote() and settings.DATABASE_REPLICAS:
+                response.set_cookie(
+                    settings.REPLICA_PIN_COOKIE, '1',
+                    max_age=settings.REPLICA_PIN_SECONDS,
+                    httponly=True, samesite='Lax'
+                )
+        finally:
+            routers.finish_request()
+        return response
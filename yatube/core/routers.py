@@ -0,0 +1,61 @@
+import random
+import threading
+
+from django.conf import settings
+
+PRIMARY = 'default'
+
+_local = threading.local()
+
+
+def start_request(pinned):
+    """
+    Выбор базы для чтений запроса: случайная реплика на весь запрос
+    или основная база, если клиент закреплён за ней.
+    """
+    replicas = settings.DATABASE_REPLICAS
+    _local.replica = (
+        PRIMARY if pinned or not replicas else random.choice(replicas)
+    )
+    _local.wrote = False
+
+
+def finish_request():
+    _local.replica = None
+
+
+def pin_primary():
+    """Чтения до конца запроса - с основной базы."""
+    if getattr(_local, 'replica', None) is not None:
+        _local.replica = PRIMARY
+
+
+def wrote():
+    """Была ли в текущем запросе запись."""
+    return getattr(_local, 'wrote', False)
+
+
+class ReplicaRouter:
+    """
+    Чтения внутри запроса - с реплики, выбранной start_request,
+    запись - всегда в основную базу. После первой записи запрос
+    читает с основной базы: свои изменения видны сразу. Вне запросов
+    (команды, фоновые потоки) всё идёт в основную базу.
+    Реплики - копии основной базы, поэтому связи между объектами
+    из разных баз разрешены, а миграции идут только в основную.
+    """
+
+    def db_for_read(self, model, **hints):
+        return getattr(_local, 'replica', None) or PRIMARY
+
+    def db_for_write(self, model, **hints):
+        if getattr(_local, 'replica', None) is not None:
+            _local.replica = PRIMARY
+            _local.wrote = True
+        return PRIMARY
+
+    def allow_relation(self, obj1, obj2, **hints):
+        return True
+
+    def allow_migrate(self, db, app_label, **hints):
+        return db == PRIMARY
@@ -0,0 +1,24 @@
+from django.test.runner import DiscoverRunner
+from django.test.utils import override_settings
+
+# Настройки на время тестов: manage.py test и pytest (conftest.py).
+TEST_SETTINGS = {
+    # Миниатюры режутся сразу: потоки пула не видят данных
+    # незакоммиченной транзакции теста.
+    'THUMBNAIL_WORKERS': 0,
+    # Превышение бюджета SQL-запросов роняет тест.
+    'QUERY_BUDGET_STRICT': True,
+}
+
+
+class TestRunner(DiscoverRunner):
+    """Стандартный запуск тестов с TEST_SETTINGS поверх настроек."""
+
+    def setup_test_environment(self, **kwargs):
+        super().setup_test_environment(**kwargs)
+        self.test_settings = override_settings(**TEST_SETTINGS)
+        self.test_settings.enable()
+
+    def teardown_test_environment(self, **kwargs):
+        self.test_settings.disable()
+        super().teardown_test_environment(**kwargs)
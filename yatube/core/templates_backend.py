@@ -0,0 +1,33 @@
+import time
+
+from django.template.backends.django import DjangoTemplates, Template
+
+from core import metrics
+
+
+class TimedTemplate(Template):
+    """Шаблон, время рендера которого идёт в метрики запроса."""
+
+    def render(self, context=None, request=None):
+        stats = metrics.current()
+        if stats is None:
+            return super().render(context, request)
+        # Вложенные render_to_string (фрагменты постов) уже внутри
+        # внешнего рендера - считается только он.
+        stats.render_depth += 1
+        started = time.perf_counter()
+        try:
+            return super().render(context, request)
+        finally:
+            stats.render_depth -= 1
+            if not stats.render_depth:
+                stats.render_time += time.perf_counter() - started
+
+
+class TimedDjangoTemplates(DjangoTemplates):
+    def from_string(self, template_code):
+        return TimedTemplate(self.engine.from_string(template_code), self)
+
+    def get_template(self, template_name):
+        template = super().get_template(template_name)
+        return TimedTemplate(template.template, self)
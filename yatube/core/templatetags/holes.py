@@ -0,0 +1,19 @@
+from django import template
+from django.utils.safestring import mark_safe
+
+from ..holes import PUNCH_HOLES, placeholder, render_hole
+
+register = template.Library()
+
+
+@register.simple_tag(takes_context=True)
+def hole(context, name, **args):
+    """
+    Кусок страницы, зависящий от пользователя. Для общего кэша
+    страниц выводится метка, её заполняет fill_holes; иначе кусок
+    рендерится на месте. Аргументы - только JSON-значения.
+    """
+    request = context['request']
+    if getattr(request, PUNCH_HOLES, False):
+        return mark_safe(placeholder(name, args))
+    return mark_safe(render_hole(request, name, args))
@@ -0,0 +1,293 @@
+import json
+import os
+import socket
+import tempfile
+
+from django.contrib.auth import get_user_model
+from django.core.cache import caches
+from django.db import connection
+from django.http import HttpResponse
+from django.test import (
+    Client, RequestFactory, SimpleTestCase, TestCase, override_settings
+)
+from django.urls import reverse
+
+from .cache.server import RespServer
+from .db.sqlite3.base import DatabaseWrapper
+from .metrics import registry
+from .middleware import QueryBudgetExceeded, ReplicaPinMiddleware
+from .routers import ReplicaRouter, pin_primary
+
+
+class InterruptedStream:
+    """Поток ответов сервера, чтение из которого один раз обрывается."""
+
+    def __init__(self, stream):
+        self.stream = stream
+        self.interrupted = False
+
+    def readline(self):
+        return self.stream.readline()
+
+    def read(self, size):
+        if not self.interrupted:
+            self.interrupted = True
+            raise socket.timeout('timed out')
+        return self.stream.read(size)
+
+    def close(self):
+        self.stream.close()
+
+
+class CacheBackendsTests(SimpleTestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.server = RespServer(('127.0.0.1', 0))
+        host, port = cls.server.start()
+        shared = {
+            'BACKEND': 'core.cache.redis.RedisCache',
+            'LOCATION': f'{host}:{port}',
+        }
+        cls.caches = override_settings(CACHES={
+            'default': {
+                'BACKEND': 'core.cache.tiered.TieredCache',
+                'LOCATION': 'shared',
+                'OPTIONS': {'LOCAL_MAX_ENTRIES': 2},
+            },
+            'shared': shared,
+        })
+        cls.caches.enable()
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.caches.disable()
+        cls.server.shutdown()
+        cls.server.server_close()
+        super().tearDownClass()
+
+    def setUp(self):
+        caches['default'].clear()
+
+    def test_redis_backend(self):
+        """Redis-совместимый кэш: запись, чтение, add, пачки, удаление."""
+        cache = caches['shared']
+        cache.set('key', {'value': 1})
+        self.assertEqual(cache.get('key'), {'value': 1})
+        self.assertFalse(cache.add('key', 2))
+        self.assertTrue(cache.add('other', 2))
+        cache.set_many({'a': 1, 'b': 2}, None)
+        self.assertEqual(
+            cache.get_many(['a', 'b', 'missing']), {'a': 1, 'b': 2})
+        cache.delete_many(['a', 'b'])
+        self.assertFalse(cache.has_key('a'))
+        cache.set('expired', 1, 0)
+        self.assertIsNone(cache.get('expired'))
+        self.assertEqual(cache.get_or_set('new', 3), 3)
+
+    def test_redis_interrupted_reply(self):
+        """
+        Ответ, оборванный на середине, закрывает соединение: следующая
+        команда получает свой ответ, а не остаток чужого.
+        """
+        cache = caches['shared']
+        cache.set('first', 'first')
+        cache.set('second', 'second')
+        client = cache._client
+        client.stream = InterruptedStream(client.stream)
+        with self.assertRaises(socket.timeout):
+            cache.get('first')
+        self.assertEqual(cache.get('second'), 'second')
+        self.assertIsNot(cache._client, client)
+
+    def test_tiered_cache(self):
+        """
+        Двухуровневый кэш читает из памяти процесса, промахи -
+        из общего кэша; LRU вытесняет старые записи.
+        """
+        cache = caches['default']
+        cache.set('key', 1)
+        caches['shared'].set('key', 2)
+        self.assertEqual(cache.get('key'), 1)
+        self.assertEqual(cache.local_hits, 1)
+
+        cache.set('second', 2)
+        cache.set('third', 3)
+        self.assertEqual(cache.get('key'), 2)
+        self.assertEqual(cache.shared_hits, 1)
+        self.assertEqual(
+            cache.get_many(['second', 'third', 'missing']),
+            {'second': 2, 'third': 3}
+        )
+        cache.delete('key')
+        self.assertIsNone(caches['shared'].get('key'))
+        self.assertIsNone(cache.get('key'))
+
+
+class RequestMetricsTests(TestCase):
+    def setUp(self):
+        caches['default'].clear()
+        registry.clear()
+        self.client = Client()
+
+    def test_metrics_endpoint(self):
+        """Запросы видны в /metrics: запросы к БД, кэш, рендер."""
+        self.client.get(reverse('posts:home_page'))
+        self.client.get(reverse('posts:home_page'))
+        response = self.client.get(reverse('metrics'))
+        self.assertEqual(
+            response['Content-Type'],
+            'text/plain; version=0.0.4; charset=utf-8'
+        )
+        text = response.content.decode()
+        for line in (
+            'yatube_requests_total{view="posts:home_page",method="GET",'
+            'status="200"} 2',
+            'yatube_request_duration_seconds_count'
+            '{view="posts:home_page"} 2',
+            'yatube_db_queries_total{view="posts:home_page"} 1',
+            'yatube_cache_hits_total{view="posts:home_page"}',
+            'yatube_cache_misses_total{view="posts:home_page"}',
+            'yatube_render_duration_seconds_total{view="posts:home_page"}',
+        ):
+            self.assertIn(line, text)
+
+    def test_metrics_forbidden(self):
+        """Чужим адресам метрики недоступны."""
+        response = Client(REMOTE_ADDR='192.0.2.1').get(reverse('metrics'))
+        self.assertEqual(response.status_code, 403)
+
+    def test_metrics_behind_proxy(self):
+        """Через прокси REMOTE_ADDR свой, но без токена доступа нет."""
+        response = self.client.get(
+            reverse('metrics'), HTTP_X_FORWARDED_FOR='192.0.2.1')
+        self.assertEqual(response.status_code, 403)
+
+    @override_settings(METRICS_TOKEN='secret')
+    def test_metrics_token(self):
+        """С METRICS_TOKEN доступ по токену, а не по адресу."""
+        url = reverse('metrics')
+        for headers, status in (
+            ({}, 403),
+            ({'HTTP_AUTHORIZATION': 'Bearer wrong'}, 403),
+            ({'HTTP_AUTHORIZATION': 'Bearer secret',
+              'HTTP_X_FORWARDED_FOR': '192.0.2.1'}, 200),
+        ):
+            with self.subTest(headers=headers):
+                response = Client(REMOTE_ADDR='192.0.2.1').get(
+                    url, **headers)
+                self.assertEqual(response.status_code, status)
+
+    def test_structured_log(self):
+        """По запросу в журнал пишется строка JSON."""
+        with self.assertLogs('core.requests', 'INFO') as logs:
+            self.client.get(reverse('posts:home_page'))
+        record = json.loads(logs.records[0].getMessage())
+        self.assertEqual(record['view'], 'posts:home_page')
+        self.assertEqual(record['queries'], 1)
+        self.assertGreater(record['render_ms'], 0)
+
+    def test_query_budget(self):
+        """Превышение бюджета - ошибка в журнале, в строгом режиме - сбой."""
+        budgets = {'posts:home_page': 0}
+        with override_settings(QUERY_BUDGETS=budgets,
+                               QUERY_BUDGET_STRICT=False):
+            with self.assertLogs('core.requests', 'ERROR'):
+                self.client.get(reverse('posts:home_page'))
+        with override_settings(QUERY_BUDGETS=budgets,
+                               QUERY_BUDGET_STRICT=True):
+            caches['default'].clear()
+            with self.assertLogs('core.requests', 'ERROR'), \
+                    self.assertRaises(QueryBudgetExceeded):
+                self.client.get(reverse('posts:home_page'))
+        self.assertIn(
+            'yatube_query_budget_exceeded_total{view="posts:home_page"} 2',
+            registry.render()
+        )
+
+
+@override_settings(DATABASE_REPLICAS=['replica1', 'replica2'])
+class ReplicaRoutingTests(SimpleTestCase):
+    def setUp(self):
+        self.router = ReplicaRouter()
+        self.factory = RequestFactory()
+
+    def route(self, request, action=None):
+        """
+        Базы для чтения до и после действия внутри запроса и ответ
+        ReplicaPinMiddleware.
+        """
+        model = get_user_model()
+        reads = []
+
+        def view(request):
+            reads.append(self.router.db_for_read(model))
+            if action is not None:
+                action()
+            reads.append(self.router.db_for_read(model))
+            return HttpResponse()
+
+        response = ReplicaPinMiddleware(view)(request)
+        return reads, response
+
+    def write(self):
+        self.assertEqual(self.router.db_for_write(get_user_model()), 'default')
+
+    def test_reads_from_replica(self):
+        """Чтения запроса - с одной реплики, без закрепления."""
+        reads, response = self.route(self.factory.get('/'))
+        self.assertIn(reads[0], ('replica1', 'replica2'))
+        self.assertEqual(reads[0], reads[1])
+        self.assertNotIn('pin_primary', response.cookies)
+        self.assertEqual(self.router.db_for_read(get_user_model()), 'default')
+
+    def test_read_your_writes(self):
+        """После записи - чтения с основной базы и cookie закрепления."""
+        reads, response = self.route(self.factory.get('/'), self.write)
+        self.assertEqual(reads[1], 'default')
+        self.assertEqual(response.cookies['pin_primary']['max-age'], 10)
+
+        request = self.factory.get('/')
+        request.COOKIES['pin_primary'] = '1'
+        self.assertEqual(self.route(request)[0], ['default', 'default'])
+        self.assertEqual(
+            self.route(self.factory.post('/'))[0], ['default', 'default'])
+
+    def test_pin_primary(self):
+        """Свежая страница закрепляет чтения запроса за основной базой."""
+        reads, response = self.route(self.factory.get('/'), pin_primary)
+        self.assertEqual(reads[1], 'default')
+        self.assertNotIn('pin_primary', response.cookies)
+
+    @override_settings(DATABASE_REPLICAS=[])
+    def test_without_replicas(self):
+        reads, response = self.route(self.factory.get('/'), self.write)
+        self.assertEqual(reads, ['default', 'default'])
+        self.assertNotIn('pin_primary', response.cookies)
+
+
+class SQLiteBackendTests(SimpleTestCase):
+    def test_pragmas(self):
+        """Новое соединение получает PRAGMA, OPTIONS их переопределяют."""
+        with tempfile.TemporaryDirectory() as directory:
+            wrapper = DatabaseWrapper({
+                **connection.settings_dict,
+                'NAME': os.path.join(directory, 'test.sqlite3'),
+                'OPTIONS': {'pragmas': {'cache_size': -1000}},
+            }, 'pragmas')
+            try:
+                with wrapper.cursor() as cursor:
+                    values = {
+                        name: cursor.execute(
+                            f'PRAGMA {name}').fetchone()[0]
+                        for name in ('journal_mode', 'synchronous',
+                                     'busy_timeout', 'cache_size')
+                    }
+            finally:
+                wrapper.close()
+        self.assertEqual(values, {
+            'journal_mode': 'wal',
+            'synchronous': 1,
+            'busy_timeout': 5000,
+            'cache_size': -1000,
+        })
@@ -1,5 +1,14 @@
 # core/views.py
+from django.conf import settings
+from django.core.exceptions import PermissionDenied
+from django.http import HttpResponse
 from django.shortcuts import render
+from django.utils.crypto import constant_time_compare
+
+from core.metrics import registry
+
+# Заголовки, которые добавляет обратный прокси.
+PROXY_HEADERS = ('HTTP_X_FORWARDED_FOR', 'HTTP_X_REAL_IP', 'HTTP_FORWARDED')
 
 
 def page_not_found(request, exception):
@@ -25,3 +34,29 @@ def server_error(request):
 def permission_denied(request, exception):
     """Ошибка доступа"""
     return render(request, 'core/403.html', status=403)
+
+
+def metrics_allowed(request):
+    """
+    С METRICS_TOKEN нужен заголовок Authorization: Bearer <токен>.
+    Без него - только адреса METRICS_IPS и только напрямую: за прокси
+    REMOTE_ADDR - адрес самого прокси, такие запросы отклоняются.
+    """
+    if settings.METRICS_TOKEN:
+        return constant_time_compare(
+            request.META.get('HTTP_AUTHORIZATION', ''),
+            f'Bearer {settings.METRICS_TOKEN}'
+        )
+    if any(header in request.META for header in PROXY_HEADERS):
+        return False
+    return request.META.get('REMOTE_ADDR') in settings.METRICS_IPS
+
+
+def metrics(request):
+    """Метрики процесса в формате Prometheus."""
+    if not metrics_allowed(request):
+        raise PermissionDenied
+    return HttpResponse(
+        registry.render(),
+        content_type='text/plain; version=0.0.4; charset=utf-8'
+    )
@@ -0,0 +1,21 @@
+"""
+Настройки gunicorn, читаются из рабочей папки (рядом с manage.py).
+Django 2.2 не умеет ASGI и async-вьюхи, поэтому конкурентность
+даёт gthread: у каждого воркера пул потоков, и запрос, ждущий БД
+или кэш, не держит весь процесс - в это время идут другие запросы.
+Переменные окружения GUNICORN_WORKERS и GUNICORN_THREADS
+переопределяют значения по умолчанию.
+"""
+import multiprocessing
+import os
+
+bind = os.getenv('GUNICORN_BIND', '127.0.0.1:8000')
+worker_class = 'gthread'
+workers = int(
+    os.getenv('GUNICORN_WORKERS', multiprocessing.cpu_count() * 2 + 1)
+)
+threads = int(os.getenv('GUNICORN_THREADS', 4))
+# Перезапуск воркеров против медленной утечки памяти; jitter -
+# чтобы они не перезапускались разом.
+max_requests = 5000
+max_requests_jitter = 500
@@ -1,6 +1,33 @@
 from django.contrib import admin
+from django.http import StreamingHttpResponse
 
-from .models import Comment, Follow, Group, Post
+from .exporting import export
+from .models import (
+    Comment, FeedItem, Follow, Group, Post, Profile, TrendingPost
+)
+from .search import get_backend
+
+EXPORT_KINDS = {Post: 'posts', Comment: 'comments', Follow: 'follows'}
+
+
+def export_action(file_format):
+    """Действие админки: выбранные строки потоком в gzip."""
+    def action(modeladmin, request, queryset):
+        kind = EXPORT_KINDS[queryset.model]
+        response = StreamingHttpResponse(
+            export(kind, queryset, file_format),
+            content_type='application/gzip'
+        )
+        response['Content-Disposition'] = (
+            f'attachment; filename="{kind}.{file_format}.gz"'
+        )
+        return response
+    action.__name__ = f'export_{file_format}'
+    action.short_description = f'Выгрузить в {file_format.upper()} (gzip)'
+    return action
+
+
+EXPORT_ACTIONS = (export_action('jsonl'), export_action('csv'))
 
 
 @admin.register(Post)
@@ -17,6 +44,13 @@ class PostAdmin(admin.ModelAdmin):
     list_filter = ('pub_date',)
     empty_value_display = '-пусто-'
     list_editable = ('group',)
+    actions = EXPORT_ACTIONS
+
+    def get_search_results(self, request, queryset, search_term):
+        """Поиск через индекс, а не LIKE по всей таблице."""
+        if not search_term:
+            return queryset, False
+        return get_backend().filter(queryset, search_term), False
 
 
 @admin.register(Group)
@@ -26,9 +60,46 @@ class PostAdmin(admin.ModelAdmin):
 
 @admin.register(Comment)
 class PostAdmin(admin.ModelAdmin):
-    pass
+    actions = EXPORT_ACTIONS
 
 
 @admin.register(Follow)
 class PostAdmin(admin.ModelAdmin):
-    pass
+    actions = EXPORT_ACTIONS
+
+
+@admin.register(FeedItem)
+class FeedItemAdmin(admin.ModelAdmin):
+    list_display = (
+        'pk',
+        'user',
+        'post',
+        'pub_date',
+    )
+    raw_id_fields = ('user', 'post')
+
+
+@admin.register(Profile)
+class ProfileAdmin(admin.ModelAdmin):
+    list_display = (
+        'user',
+        'posts_count',
+        'followers_count',
+        'following_count',
+    )
+    search_fields = ('user__username',)
+    readonly_fields = (
+        'posts_count',
+        'followers_count',
+        'following_count',
+    )
+
+
+@admin.register(TrendingPost)
+class TrendingPostAdmin(admin.ModelAdmin):
+    list_display = (
+        'rank',
+        'post',
+        'score',
+    )
+    raw_id_fields = ('post',)
@@ -0,0 +1,15 @@
+# Размер списков id в одном запросе (__in): у SQLite ограничено
+# число параметров запроса.
+IN_CHUNK = 500
+
+
+def batches(objects, size=IN_CHUNK):
+    """Объекты списками по size штук; итерируемое читается потоком."""
+    batch = []
+    for obj in objects:
+        batch.append(obj)
+        if len(batch) == size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
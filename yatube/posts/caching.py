@@ -0,0 +1,162 @@
+import copy
+import time
+from uuid import uuid4
+
+from django.core.cache import cache
+from django.db import router
+
+from .models import Post
+
+VERSION_KEY = 'version-{namespace}'
+MODIFIED_KEY = 'modified-{namespace}'
+FRAGMENT_KEY = 'post-fragment-{view}-{post_id}-{updated}-{versions}'
+
+NAMESPACES = {
+    'index': 'index',
+    'group': 'group-{slug}',
+    'author': 'author-{author_id}',
+    # Лента подписок пользователя: меняется и с новыми постами авторов.
+    'follow': 'follow-{user_id}',
+    # Только список подписок - новые посты его не трогают.
+    'following': 'following-{user_id}',
+    'post': 'post-{post_id}',
+    'trending': 'trending',
+    'groups': 'groups',
+    # Имя и username пользователя, slug группы - то, что фрагмент поста
+    # выводит, не меняя Post.updated.
+    'user': 'user-{user_id}',
+    'group_info': 'group-info-{group_id}',
+}
+
+
+def new_version():
+    """
+    Версия - случайный токен, а не счётчик: если ключ версии
+    вытеснен из кэша, старые записи не оживут с тем же номером.
+    """
+    return uuid4().hex[:12]
+
+
+def get_version(namespace):
+    return cache.get_or_set(
+        VERSION_KEY.format(namespace=namespace), new_version, None
+    )
+
+
+def get_versions(*namespaces):
+    """
+    Версии и время последнего изменения (timestamp) пространств имён
+    одним get_many. Отсутствующие создаются, как в get_version:
+    новая версия - и изменение «сейчас».
+    """
+    keys = {
+        namespace: (
+            VERSION_KEY.format(namespace=namespace),
+            MODIFIED_KEY.format(namespace=namespace)
+        )
+        for namespace in namespaces
+    }
+    found = cache.get_many([key for pair in keys.values() for key in pair])
+    missing = {}
+    now = time.time()
+    for version_key, modified_key in keys.values():
+        if version_key not in found:
+            missing[version_key] = new_version()
+        if modified_key not in found:
+            missing[modified_key] = now
+    if missing:
+        cache.set_many(missing, None)
+        found.update(missing)
+    return [
+        (found[version_key], found[modified_key])
+        for version_key, modified_key in keys.values()
+    ]
+
+
+def versioned_key(namespace, key, *namespaces):
+    """
+    Ключ кэша внутри пространства имён с текущей версией.
+    Ключ, зависящий от нескольких пространств имён, собирает
+    версии их всех.
+    """
+    versions = '-'.join(
+        get_version(name) for name in (namespace, *namespaces)
+    )
+    return f'{key}-v{versions}'
+
+
+def bump_versions(*namespaces):
+    """
+    Инвалидация: смена версии делает недоступными все ключи
+    пространства имён разом, без перебора самих ключей.
+    Заодно запоминается время изменения - для Last-Modified.
+    """
+    now = time.time()
+    values = {}
+    for namespace in set(namespaces):
+        values[VERSION_KEY.format(namespace=namespace)] = new_version()
+        values[MODIFIED_KEY.format(namespace=namespace)] = now
+    cache.set_many(values, None)
+
+
+def fragment_namespaces(post):
+    namespaces = [NAMESPACES['user'].format(user_id=post.author_id)]
+    if post.group_id is not None:
+        namespaces.append(
+            NAMESPACES['group_info'].format(group_id=post.group_id))
+    return namespaces
+
+
+def fragment_keys(view_name, posts):
+    """
+    Ключи отрендеренных постов, {id поста: ключ}. Время изменения
+    поста в ключе: после редактирования фрагмент просто перестаёт
+    находиться; версии автора и группы - то же после смены имени
+    автора или slug группы. Версии всех постов - одним get_many.
+    """
+    namespaces = {post.pk: fragment_namespaces(post) for post in posts}
+    names = list({name for names in namespaces.values() for name in names})
+    versions = dict(zip(
+        names, (version for version, _ in get_versions(*names))))
+    return {
+        post.pk: FRAGMENT_KEY.format(
+            view=view_name,
+            post_id=post.pk,
+            updated=post.updated.timestamp(),
+            versions='-'.join(versions[name] for name in namespaces[post.pk])
+        )
+        for post in posts
+    }
+
+
+def fragment_key(view_name, post):
+    return fragment_keys(view_name, [post])[post.pk]
+
+
+def pack_page(page):
+    """
+    Страница постов для кэша: вместо постов - поля, по которым ищутся
+    их фрагменты (fragment_keys): id, время изменения, автор и группа.
+    Пагинатор кэшируется без queryset (его __getstate__).
+    """
+    packed = copy.copy(page)
+    packed.object_list = [
+        (post.pk, post.updated, post.author_id, post.group_id)
+        for post in page
+    ]
+    return packed
+
+
+def unpack_page(packed):
+    """
+    Посты страницы из кэша - без запроса: загружены только поля
+    pack_page, остальные отложены. Посты, чьих фрагментов в кэше
+    нет, догружает одним запросом тег post_fragment.
+    """
+    page = copy.copy(packed)
+    db = router.db_for_read(Post)
+    page.object_list = [
+        Post.from_db(db, ('id', 'updated', 'author_id', 'group_id'), row)
+        for row in packed.object_list
+    ]
+    return page
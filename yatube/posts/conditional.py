@@ -0,0 +1,188 @@
+import time
+from datetime import datetime
+from datetime import timezone as dt_timezone
+from functools import wraps
+from hashlib import md5
+
+from django.conf import settings
+from django.core.cache import cache
+from django.http import HttpResponse
+from django.utils import timezone
+from django.views.decorators.http import condition
+
+from core.holes import PUNCH_HOLES, fill_holes
+from core.routers import pin_primary
+
+from .caching import NAMESPACES, get_versions
+from .models import Group, Post, Profile
+
+VALIDATORS = '_page_validators'
+PAGE_KEY = 'page-{path}-{content}'
+
+
+def index_state(request):
+    return [NAMESPACES['index']], ()
+
+
+def group_state(request, slug):
+    """Удалённой группы нет и в кэше: страницу с 404 отрисует вьюха."""
+    if not Group.objects.filter(slug=slug).exists():
+        return None
+    return [NAMESPACES['group'].format(slug=slug)], ()
+
+
+def groups_state(request):
+    """Каталог групп; окно активных авторов сдвигается раз в день."""
+    return [NAMESPACES['groups']], (timezone.localdate(),)
+
+
+def profile_state(request, username):
+    """
+    Посты автора плюс счётчики профиля: подписки меняют их, но не
+    версию автора. Один запрос по индексу username.
+    """
+    rows = Profile.objects.filter(user__username=username).values_list(
+        'user_id', 'posts_count', 'followers_count', 'following_count'
+    )[:1]
+    if not rows:
+        return None
+    author_id, *counters = rows[0]
+    return [NAMESPACES['author'].format(author_id=author_id)], counters
+
+
+def post_state(request, post_id):
+    """
+    Пост с комментариями, счётчики его автора (версия автора) и
+    название группы (версия группы).
+    """
+    rows = Post.objects.filter(pk=post_id).values_list(
+        'author_id', 'group__slug'
+    )[:1]
+    if not rows:
+        return None
+    author_id, slug = rows[0]
+    namespaces = [
+        NAMESPACES['post'].format(post_id=post_id),
+        NAMESPACES['author'].format(author_id=author_id),
+    ]
+    if slug is not None:
+        namespaces.append(NAMESPACES['group'].format(slug=slug))
+    return namespaces, ()
+
+
+def page_validators(request, state, *args, **kwargs):
+    """
+    (ключ содержимого, ETag, Last-Modified) страницы по версиям её
+    пространств имён из кэша - без рендера и почти без запросов к БД.
+    Ключ содержимого не зависит от пользователя - по нему страница
+    лежит в общем кэше. Страница вошедшего пользователя зависит от
+    него самого (шапка, кнопка подписки, CSRF в формах), поэтому в
+    ETag входят его id, версия его ленты и CSRF-cookie, а
+    Last-Modified не отдаётся вовсе: клиенту, пришедшему только с
+    If-Modified-Since, нельзя отдать 304 на страницу, собранную для
+    другого пользователя.
+    Только что изменённые страницы читаются с основной базы.
+    Результат запоминается на запросе: condition() спрашивает ETag и
+    Last-Modified по отдельности.
+    """
+    validators = getattr(request, VALIDATORS, None)
+    if validators is not None:
+        return validators
+    found = state(request, *args, **kwargs)
+    if found is None:
+        validators = (None, None, None)
+    else:
+        namespaces, extra = found
+        content_versions = len(namespaces)
+        user_id = request.user.pk
+        if user_id is not None:
+            namespaces.append(NAMESPACES['follow'].format(user_id=user_id))
+        versions, modified = zip(*get_versions(*namespaces))
+        if time.time() - max(modified) < settings.REPLICA_PIN_SECONDS:
+            # Реплики могут ещё не знать об изменении, а страница,
+            # собранная по старым данным, легла бы в кэш под новой
+            # версией.
+            pin_primary()
+        content_key = md5(repr((
+            versions[:content_versions], tuple(extra)
+        )).encode()).hexdigest()
+        etag = md5(repr((
+            content_key,
+            versions[content_versions:],
+            user_id,
+            request.COOKIES.get(settings.CSRF_COOKIE_NAME),
+        )).encode()).hexdigest()
+        last_modified = None
+        if user_id is None:
+            last_modified = datetime.fromtimestamp(
+                max(modified), dt_timezone.utc
+            )
+        validators = (content_key, etag, last_modified)
+    setattr(request, VALIDATORS, validators)
+    return validators
+
+
+def conditional_page(state):
+    """
+    Условный GET для страниц лент и поста: ETag и Last-Modified,
+    на совпадающие If-None-Match / If-Modified-Since - ответ 304.
+    state(request, *args, **kwargs) - пространства имён страницы
+    и дополнительные значения для ETag; None - страницы нет, её
+    отрисует (с 404) сама вьюха.
+    """
+    def etag(request, *args, **kwargs):
+        return page_validators(request, state, *args, **kwargs)[1]
+
+    def last_modified(request, *args, **kwargs):
+        return page_validators(request, state, *args, **kwargs)[2]
+
+    return condition(etag, last_modified)
+
+
+def cached_page(state):
+    """
+    Общий кэш страниц по ключу содержимого (page_validators): все
+    пользователи получают одну сохранённую страницу. Куски, зависящие
+    от пользователя ({% hole %}), сохраняются метками и заполняются
+    на каждый запрос; для анонимов заполненная копия хранится рядом,
+    и страница отдаётся без рендера. Новые версии пространств имён
+    меняют ключ - устаревшие страницы просто перестают находиться.
+    """
+    def decorator(view):
+        @wraps(view)
+        def wrapper(request, *args, **kwargs):
+            if request.method != 'GET':
+                return view(request, *args, **kwargs)
+            content_key = page_validators(
+                request, state, *args, **kwargs)[0]
+            if content_key is None:
+                return view(request, *args, **kwargs)
+            cache_key = PAGE_KEY.format(
+                path=md5(request.get_full_path().encode()).hexdigest(),
+                content=content_key
+            )
+            cached = cache.get(cache_key)
+            if cached is None:
+                setattr(request, PUNCH_HOLES, True)
+                response = view(request, *args, **kwargs)
+                setattr(request, PUNCH_HOLES, False)
+                if response.status_code != 200 or response.streaming:
+                    return response
+                raw, anonymous_html = (
+                    response.content.decode(response.charset), None)
+            else:
+                raw, anonymous_html = cached
+            if request.user.is_authenticated:
+                html = fill_holes(raw, request)
+            elif anonymous_html is None:
+                html = anonymous_html = fill_holes(raw, request)
+            else:
+                html = anonymous_html
+            if cached != (raw, anonymous_html):
+                cache.set(
+                    cache_key, (raw, anonymous_html),
+                    settings.PAGE_CACHE_TIMEOUT
+                )
+            return HttpResponse(html)
+        return wrapper
+    return decorator
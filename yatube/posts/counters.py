@@ -0,0 +1,116 @@
+from datetime import datetime, time, timedelta
+
+from django.conf import settings
+from django.db.models import Count, F, Max, OuterRef, Q, Subquery
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from .models import Comment, Follow, Group, Post, Profile, User
+
+
+def change_counters(user_id, **deltas):
+    """
+    Атомарное изменение счётчиков профиля: UPDATE ... SET x = x + d.
+    Профиля может не быть (пользователь удаляется) - тогда ничего;
+    счётчик, ушедший бы в минус, не трогается до recount.
+    """
+    change_many_counters((user_id,), **deltas)
+
+
+def change_many_counters(user_ids, **deltas):
+    """То же для нескольких профилей одним UPDATE."""
+    Profile.objects.filter(
+        user_id__in=user_ids,
+        **{
+            f'{field}__gte': -delta
+            for field, delta in deltas.items() if delta < 0
+        }
+    ).update(**{
+        field: F(field) + delta for field, delta in deltas.items()
+    })
+
+
+def change_comments_count(post_id, delta):
+    posts = Post.objects.filter(pk=post_id)
+    if delta < 0:
+        posts = posts.filter(comments_count__gte=-delta)
+    posts.update(
+        comments_count=F('comments_count') + delta
+    )
+
+
+def count_subquery(model, field, outer):
+    """COUNT(*) записей model, где field = outer, как подзапрос."""
+    return Coalesce(
+        Subquery(
+            model.objects.filter(
+                **{field: OuterRef(outer)}
+            ).order_by().values(field).annotate(
+                count=Count('pk')
+            ).values('count')
+        ),
+        0
+    )
+
+
+def recount(users=None):
+    """
+    Пересчёт счётчиков по данным таблиц без загрузки строк в память:
+    недостающие профили создаются, остальное - UPDATE с подзапросами.
+    users ограничивает пересчёт одними профилями, без постов.
+    Возвращает число пересчитанных профилей и постов.
+    """
+    recount_posts = users is None
+    users = User.objects.all() if users is None else users
+    Profile.objects.bulk_create(
+        (
+            Profile(user_id=user_id)
+            for user_id in users.filter(
+                profile__isnull=True
+            ).values_list('pk', flat=True)
+        ),
+        ignore_conflicts=True
+    )
+    profiles = Profile.objects.filter(user__in=users).update(
+        posts_count=count_subquery(Post, 'author', 'user'),
+        followers_count=count_subquery(Follow, 'author', 'user'),
+        following_count=count_subquery(Follow, 'user', 'user'),
+    )
+    posts = 0
+    if recount_posts:
+        posts = Post.objects.update(
+            comments_count=count_subquery(Comment, 'post', 'pk')
+        )
+    return profiles, posts
+
+
+def get_profile(user):
+    """Профиль со счётчиками; отсутствующий создаётся пересчётом."""
+    try:
+        return user.profile
+    except Profile.DoesNotExist:
+        recount(User.objects.filter(pk=user.pk))
+        return Profile.objects.get(user=user)
+
+
+def group_stats(day):
+    """
+    Статистика всех групп одним запросом с агрегатами: число постов,
+    время последнего и активные авторы - писавшие за
+    GROUP_ACTIVE_DAYS дней до начала дня day.
+    """
+    since = timezone.make_aware(
+        datetime.combine(day, time.min)
+    ) - timedelta(days=settings.GROUP_ACTIVE_DAYS)
+    return list(Group.objects.annotate(
+        posts_count=Count('posts'),
+        last_post=Max('posts__pub_date'),
+        active_authors=Count(
+            'posts__author',
+            filter=Q(posts__pub_date__gte=since),
+            distinct=True
+        ),
+    ).order_by('title').values(
+        'slug', 'title', 'description',
+        'posts_count', 'last_post', 'active_authors'
+    ))
@@ -0,0 +1,150 @@
+import csv
+import json
+import zlib
+from datetime import datetime
+
+from django.utils import timezone
+from django.utils.dateparse import parse_date, parse_datetime
+
+from .models import Comment, Follow, Post
+
+FORMATS = ('jsonl', 'csv')
+CHUNK_SIZE = 2000
+# wbits=31 - zlib пишет заголовок и хвост gzip.
+GZIP_WBITS = 31
+
+# Модель, выгружаемые поля (имя в файле -> lookup values_list)
+# и lookup-и фильтров. Поля постов совпадают с форматом import_posts.
+EXPORTS = {
+    'posts': (Post, {
+        'id': 'pk',
+        'author': 'author__username',
+        'group': 'group__slug',
+        'text': 'text',
+        'pub_date': 'pub_date',
+        'image': 'image',
+        'comments_count': 'comments_count',
+    }, {
+        'date': 'pub_date',
+        'group': 'group__slug',
+        'author': 'author__username',
+    }),
+    'comments': (Comment, {
+        'id': 'pk',
+        'post': 'post_id',
+        'author': 'author__username',
+        'text': 'text',
+        'created': 'created',
+    }, {
+        'date': 'created',
+        'group': 'post__group__slug',
+        'author': 'author__username',
+    }),
+    'follows': (Follow, {
+        'id': 'pk',
+        'user': 'user__username',
+        'author': 'author__username',
+    }, {
+        'author': 'author__username',
+    }),
+}
+
+
+class ExportError(ValueError):
+    """Фильтр неприменим к выгружаемым данным."""
+
+
+def filter_queryset(kind, date_from=None, date_to=None, group=None,
+                    author=None):
+    """Набор строк для выгрузки: даты включительно, группа и автор."""
+    model, _, lookups = EXPORTS[kind]
+    filters = {}
+    requested = {
+        'date': date_from or date_to, 'group': group, 'author': author
+    }
+    for name, value in requested.items():
+        if value and name not in lookups:
+            raise ExportError(f'{kind} нельзя фильтровать по {name}.')
+    if date_from:
+        filters[f'{lookups["date"]}__gte'] = parse_bound(date_from)
+    if date_to:
+        filters[f'{lookups["date"]}__lte'] = parse_bound(date_to, end=True)
+    if group:
+        filters[lookups['group']] = group
+    if author:
+        filters[lookups['author']] = author
+    return model.objects.filter(**filters)
+
+
+def parse_bound(value, end=False):
+    """Дата или дата-время ISO 8601; дата без времени - весь день."""
+    moment = parse_datetime(value)
+    if moment is None:
+        day = parse_date(value)
+        if day is None:
+            raise ExportError(f'{value!r} - не дата ISO 8601.')
+        moment = datetime.combine(
+            day, datetime.max.time() if end else datetime.min.time()
+        )
+    if timezone.is_naive(moment):
+        moment = timezone.make_aware(moment)
+    return moment
+
+
+def export_rows(kind, queryset):
+    """
+    Строки выгрузки словарями. values_list с iterator(chunk_size)
+    не заполняет кэш queryset и не создаёт моделей: в памяти
+    одна порция курсора.
+    """
+    _, fields, _ = EXPORTS[kind]
+    rows = queryset.order_by('pk').values_list(*fields.values())
+    for row in rows.iterator(chunk_size=CHUNK_SIZE):
+        yield dict(zip(fields, row))
+
+
+def to_json(value):
+    return value.isoformat() if isinstance(value, datetime) else value
+
+
+def to_csv(value):
+    return '' if value is None else to_json(value)
+
+
+class Echo:
+    """Файлоподобный объект для csv.writer: строка возвращается."""
+
+    def write(self, value):
+        return value
+
+
+def render_lines(kind, rows, file_format):
+    if file_format == 'jsonl':
+        for row in rows:
+            yield json.dumps(
+                {key: to_json(value) for key, value in row.items()},
+                ensure_ascii=False
+            ) + '\n'
+        return
+    writer = csv.writer(Echo())
+    yield writer.writerow(EXPORTS[kind][1])
+    for row in rows:
+        yield writer.writerow(to_csv(value) for value in row.values())
+
+
+def gzipped(chunks):
+    """Потоковое сжатие gzip без буфера на весь файл."""
+    compressor = zlib.compressobj(wbits=GZIP_WBITS)
+    for chunk in chunks:
+        data = compressor.compress(chunk.encode())
+        if data:
+            yield data
+    yield compressor.flush()
+
+
+def export(kind, queryset, file_format='jsonl', compress=True):
+    """Итератор байтов выгрузки для файла или StreamingHttpResponse."""
+    lines = render_lines(kind, export_rows(kind, queryset), file_format)
+    if compress:
+        return gzipped(lines)
+    return (line.encode() for line in lines)
@@ -0,0 +1,170 @@
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import F, Q
+
+from .caching import NAMESPACES, bump_versions, versioned_key
+from .models import FeedItem, Follow, Post, Profile
+from .paginators import CursorPaginator
+
+# Ключи курсора для ленты из одних разосланных постов: сортировка
+# идёт по индексу записей ленты (user, pub_date, post).
+FEED_KEYS = ('feed_date', 'feed_post')
+FOLLOWED_KEY = 'followed-{user_id}'
+
+
+def is_celebrity(author_id):
+    """
+    Подписчиков больше FEED_FANOUT_LIMIT - по счётчику профиля, как
+    в followed_celebrities: рассылка и чтение ленты решают одинаково.
+    """
+    return Profile.objects.filter(
+        user_id=author_id,
+        followers_count__gt=settings.FEED_FANOUT_LIMIT
+    ).exists()
+
+
+def fanout_followers(author_id):
+    """
+    Подписчики, которым пост рассылается при публикации.
+    Для «знаменитостей» возвращается None: их посты лента читает
+    сама (fan-out on read).
+    """
+    if is_celebrity(author_id):
+        return None
+    return list(
+        Follow.objects.filter(
+            author_id=author_id
+        ).values_list('user_id', flat=True)
+    )
+
+
+def push_post(post, follower_ids):
+    """Рассылка нового поста в ленты подписчиков."""
+    FeedItem.objects.bulk_create(
+        (
+            FeedItem(user_id=user_id, post=post, pub_date=post.pub_date)
+            for user_id in follower_ids
+        ),
+        batch_size=settings.FEED_BATCH_SIZE,
+        ignore_conflicts=True
+    )
+
+
+def backfill_feed(user_id, author_id):
+    """Последние посты автора попадают в ленту нового подписчика."""
+    if is_celebrity(author_id):
+        return
+    posts = Post.objects.filter(
+        author_id=author_id
+    ).values_list('pk', 'pub_date')[:settings.FEED_BACKFILL_SIZE]
+    FeedItem.objects.bulk_create(
+        (
+            FeedItem(user_id=user_id, post_id=pk, pub_date=pub_date)
+            for pk, pub_date in posts
+        ),
+        batch_size=settings.FEED_BATCH_SIZE,
+        ignore_conflicts=True
+    )
+
+
+def backfill_followers(author_id, follower_ids):
+    """
+    Последние посты автора - в ленты всех его подписчиков, пачками
+    около FEED_BATCH_SIZE записей.
+    """
+    posts = list(Post.objects.filter(
+        author_id=author_id
+    ).values_list('pk', 'pub_date')[:settings.FEED_BACKFILL_SIZE])
+    if not posts:
+        return
+    step = max(1, settings.FEED_BATCH_SIZE // len(posts))
+    for start in range(0, len(follower_ids), step):
+        FeedItem.objects.bulk_create(
+            (
+                FeedItem(user_id=user_id, post_id=pk, pub_date=pub_date)
+                for user_id in follower_ids[start:start + step]
+                for pk, pub_date in posts
+            ),
+            batch_size=settings.FEED_BATCH_SIZE,
+            ignore_conflicts=True
+        )
+
+
+def crossed_fanout_limit(author_ids, delta):
+    """
+    Подписка (delta > 0) или отписка (delta < 0) перевела авторов через
+    FEED_FANOUT_LIMIT; счётчики уже изменены. Подписчикам сбрасывается
+    лента с закэшированным списком «знаменитостей». Переставшего быть
+    «знаменитостью» автора лента больше не читает напрямую, а его посты
+    никому не рассылались - их дописывает backfill_followers.
+    """
+    limit = settings.FEED_FANOUT_LIMIT
+    crossed = Profile.objects.filter(
+        user_id__in=author_ids,
+        followers_count=limit + 1 if delta > 0 else limit
+    ).values_list('user_id', flat=True)
+    for author_id in crossed:
+        follower_ids = list(Follow.objects.filter(
+            author_id=author_id
+        ).values_list('user_id', flat=True))
+        if delta < 0:
+            backfill_followers(author_id, follower_ids)
+        bump_versions(*(
+            NAMESPACES['follow'].format(user_id=user_id)
+            for user_id in follower_ids
+        ))
+
+
+def trim_feed(user_id, author_ids):
+    """Посты авторов убираются из ленты отписавшегося."""
+    FeedItem.objects.filter(
+        user_id=user_id,
+        post__author_id__in=author_ids
+    ).delete()
+
+
+def followed_celebrities(user):
+    """id «знаменитостей» среди авторов, на которых подписан user."""
+    return list(
+        Follow.objects.filter(
+            user=user,
+            author__profile__followers_count__gt=settings.FEED_FANOUT_LIMIT
+        ).values_list('author_id', flat=True)
+    )
+
+
+def followed_authors(user_id):
+    """
+    id всех авторов, на которых подписан пользователь, - одним
+    запросом. В кэше до смены подписок, при которой множество
+    переносится в новую версию с правкой (follows.update_followed).
+    """
+    cache_key = versioned_key(
+        NAMESPACES['following'].format(user_id=user_id),
+        FOLLOWED_KEY.format(user_id=user_id)
+    )
+    followed = cache.get(cache_key)
+    if followed is None:
+        followed = frozenset(Follow.objects.filter(
+            user_id=user_id
+        ).values_list('author_id', flat=True))
+        cache.set(cache_key, followed)
+    return followed
+
+
+def follow_feed(user, celebrity_ids=()):
+    """
+    Лента подписок и ключи курсора для неё: разосланные посты
+    плюс посты «знаменитостей», которые читаются напрямую.
+    """
+    if not celebrity_ids:
+        posts = Post.objects.filter(feed_items__user=user).annotate(
+            feed_date=F('feed_items__pub_date'),
+            feed_post=F('feed_items__post_id'),
+        )
+        return posts, FEED_KEYS
+    posts = Post.objects.filter(
+        Q(pk__in=FeedItem.objects.filter(user=user).values('post_id'))
+        | Q(author_id__in=celebrity_ids)
+    )
+    return posts, CursorPaginator.keys
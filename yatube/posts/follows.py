@@ -0,0 +1,200 @@
+import time
+
+from django.core.cache import cache
+from django.db import connections, router, transaction
+from django.db.models import F
+
+from .caching import NAMESPACES, bump_versions, versioned_key
+from .counters import change_counters, change_many_counters
+from .feeds import (
+    FOLLOWED_KEY, backfill_feed, crossed_fanout_limit, trim_feed
+)
+from .models import Follow, Profile, User
+
+# Один запрос на всю пачку авторов: вставленные и удалённые строки
+# возвращает RETURNING (SQLite 3.35+, PostgreSQL) - по ним, а не по
+# запрошенным именам, меняются счётчики, лента и кэш.
+FOLLOW_SQL = (
+    'INSERT INTO {follow} (user_id, author_id) '
+    'SELECT %s, id FROM {user} WHERE username IN ({marks}) AND id <> %s '
+    'ON CONFLICT DO NOTHING RETURNING author_id'
+)
+UNFOLLOW_SQL = (
+    'DELETE FROM {follow} WHERE user_id = %s AND author_id IN '
+    '(SELECT id FROM {user} WHERE username IN ({marks})) '
+    'RETURNING author_id'
+)
+DELETE_SQL = (
+    'DELETE FROM {follow} WHERE user_id = %s AND author_id IN ({marks})'
+)
+# Правки кэша подписок одного пользователя идут по очереди под этим
+# ключом: LOCK_TIMEOUT - срок замка, если его держатель умер;
+# LOCK_WAIT - сколько ждать, прежде чем просто сбросить множество.
+FOLLOWED_LOCK = 'followed-lock-{user_id}'
+LOCK_TIMEOUT = 5
+LOCK_WAIT = 1
+
+
+def returning(connection):
+    """Есть ли ON CONFLICT DO NOTHING и RETURNING."""
+    if connection.vendor == 'postgresql':
+        return True
+    return (
+        connection.vendor == 'sqlite'
+        and connection.Database.sqlite_version_info >= (3, 35)
+    )
+
+
+def execute(using, sql, params, marks):
+    sql = sql.format(
+        follow=Follow._meta.db_table,
+        user=User._meta.db_table,
+        marks=', '.join(['%s'] * marks),
+    )
+    with connections[using].cursor() as cursor:
+        cursor.execute(sql, params)
+        if cursor.description is None:
+            return []
+        return [author_id for author_id, in cursor.fetchall()]
+
+
+def lock_follows(using, user_id):
+    """
+    Пустой UPDATE профиля - запись до чтения: SQLite берёт блокировку
+    записи, остальные СУБД - блокировку строки, и подписки того же
+    пользователя до конца транзакции никто не меняет.
+    """
+    Profile.objects.using(using).filter(user_id=user_id).update(
+        following_count=F('following_count'))
+
+
+def insert_follows(using, user_id, usernames):
+    """Без RETURNING: новые подписки - разница с уже существующими."""
+    lock_follows(using, user_id)
+    author_ids = set(User.objects.using(using).filter(
+        username__in=usernames
+    ).exclude(pk=user_id).values_list('pk', flat=True))
+    author_ids -= set(Follow.objects.using(using).filter(
+        user_id=user_id, author_id__in=author_ids
+    ).values_list('author_id', flat=True))
+    Follow.objects.using(using).bulk_create(
+        (Follow(user_id=user_id, author_id=pk) for pk in author_ids),
+        ignore_conflicts=True
+    )
+    return list(author_ids)
+
+
+def delete_follows(using, user_id, usernames):
+    lock_follows(using, user_id)
+    author_ids = list(Follow.objects.using(using).filter(
+        user_id=user_id, author__username__in=usernames
+    ).values_list('author_id', flat=True))
+    if author_ids:
+        # Мимо ORM: delete() со слушателями сигналов перечитал бы строки
+        # и вызвал unfollowed() для каждой.
+        execute(using, DELETE_SQL, (user_id, *author_ids), len(author_ids))
+    return author_ids
+
+
+def follow(user_id, usernames):
+    """
+    Подписка на авторов одним INSERT ... ON CONFLICT DO NOTHING.
+    Повторная подписка, подписка на себя и несуществующее имя ничего
+    не меняют, гонка двух запросов - не ошибка. Возвращает id авторов,
+    подписка на которых действительно появилась.
+    """
+    usernames = list(set(usernames))
+    if not usernames:
+        return []
+    using = router.db_for_write(Follow)
+    with transaction.atomic(using=using):
+        if returning(connections[using]):
+            author_ids = execute(
+                using, FOLLOW_SQL, (user_id, *usernames, user_id),
+                len(usernames)
+            )
+        else:
+            author_ids = insert_follows(using, user_id, usernames)
+        if author_ids:
+            followed(user_id, author_ids)
+    return author_ids
+
+
+def unfollow(user_id, usernames):
+    """Отписка одним DELETE; возвращает id авторов, от которых отписан."""
+    usernames = list(set(usernames))
+    if not usernames:
+        return []
+    using = router.db_for_write(Follow)
+    with transaction.atomic(using=using):
+        if returning(connections[using]):
+            author_ids = execute(
+                using, UNFOLLOW_SQL, (user_id, *usernames), len(usernames))
+        else:
+            author_ids = delete_follows(using, user_id, usernames)
+        if author_ids:
+            unfollowed(user_id, author_ids)
+    return author_ids
+
+
+def followed(user_id, author_ids):
+    """
+    Последствия новых подписок - то, что для одиночного Follow.save()
+    делают сигналы. Счётчики первыми: рассылка читает followers_count.
+    """
+    change_counters(user_id, following_count=len(author_ids))
+    change_many_counters(author_ids, followers_count=1)
+    crossed_fanout_limit(author_ids, 1)
+    for author_id in author_ids:
+        backfill_feed(user_id, author_id)
+    update_followed(user_id, added=author_ids)
+
+
+def unfollowed(user_id, author_ids):
+    change_counters(user_id, following_count=-len(author_ids))
+    change_many_counters(author_ids, followers_count=-1)
+    trim_feed(user_id, author_ids)
+    crossed_fanout_limit(author_ids, -1)
+    update_followed(user_id, removed=author_ids)
+
+
+def update_followed(user_id, added=(), removed=()):
+    """
+    Страницы ленты подписок сбрасываются сразу, как и остальные
+    пространства имён в сигналах; множество подписок в кэше правится
+    после коммита - откат транзакции его не трогает.
+    """
+    bump_versions(NAMESPACES['follow'].format(user_id=user_id))
+    added, removed = set(added), set(removed)
+    transaction.on_commit(
+        lambda: patch_followed(user_id, added, removed),
+        using=router.db_for_write(Follow)
+    )
+
+
+def patch_followed(user_id, added, removed):
+    """
+    Множество авторов из кэша переносится в новую версию с правкой,
+    а не перечитывается из базы. Правки одного пользователя идут под
+    замком: иначе две из них прочли бы одно и то же множество, и одна
+    потерялась бы. Не дождавшись замка, множество просто сбрасывается.
+    """
+    namespace = NAMESPACES['following'].format(user_id=user_id)
+    key = FOLLOWED_KEY.format(user_id=user_id)
+    lock = FOLLOWED_LOCK.format(user_id=user_id)
+    deadline = time.monotonic() + LOCK_WAIT
+    while not cache.add(lock, True, LOCK_TIMEOUT):
+        if time.monotonic() > deadline:
+            bump_versions(namespace)
+            return
+        time.sleep(0.01)
+    try:
+        authors = cache.get(versioned_key(namespace, key))
+        bump_versions(namespace)
+        if authors is not None:
+            cache.set(
+                versioned_key(namespace, key),
+                authors.union(added).difference(removed)
+            )
+    finally:
+        cache.delete(lock)
@@ -0,0 +1,33 @@
+from core.holes import register
+
+from .forms import CommentForm
+
+
+@register('switcher', 'posts/includes/switcher.html')
+def switcher(request):
+    return {}
+
+
+@register('follow_button', 'posts/includes/follow_button.html')
+def follow_button(request, author_id, username, small=False):
+    return {
+        'author_id': author_id,
+        'username': username,
+        'small': small,
+    }
+
+
+@register('post_actions', 'posts/includes/post_actions.html')
+def post_actions(request, post_id, author_id):
+    return {
+        'post_id': post_id,
+        'is_edit_allowed': request.user.pk == author_id,
+    }
+
+
+@register('comment_form', 'posts/includes/comment_form.html')
+def comment_form(request, post_id):
+    return {
+        'post_id': post_id,
+        'form': CommentForm(),
+    }
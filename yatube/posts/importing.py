@@ -0,0 +1,332 @@
+import csv
+import json
+import time
+from contextlib import contextmanager
+
+from django.contrib.auth.hashers import make_password
+from django.db import connection, transaction
+from django.db.models import F
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from .batching import batches
+from .caching import NAMESPACES, bump_versions
+from .counters import recount
+from .feeds import backfill_feed
+from .models import Comment, Follow, Group, Post, Profile, User
+from .search import get_backend
+
+FORMATS = ('jsonl', 'csv')
+BATCH_SIZE = 1000
+# Сколько ошибок в строках хранить для отчёта; считаются все.
+MAX_ERRORS = 100
+
+
+class RecordError(ValueError):
+    """Строка входных данных не годится для импорта."""
+
+
+@contextmanager
+def fixed_dates():
+    """
+    bulk_create проставляет auto_now и auto_now_add текущим временем;
+    для перенесённых данных даты задаются явно.
+    """
+    fields = [
+        Post._meta.get_field('pub_date'),
+        Post._meta.get_field('updated'),
+        Comment._meta.get_field('created'),
+    ]
+    saved = [(field.auto_now, field.auto_now_add) for field in fields]
+    for field in fields:
+        field.auto_now = field.auto_now_add = False
+    try:
+        yield
+    finally:
+        for field, (auto_now, auto_now_add) in zip(fields, saved):
+            field.auto_now, field.auto_now_add = auto_now, auto_now_add
+
+
+def read_jsonl(lines):
+    for number, line in enumerate(lines, 1):
+        if not line.strip():
+            continue
+        try:
+            yield number, json.loads(line)
+        except ValueError as error:
+            yield number, RecordError(f'не JSON: {error}')
+
+
+def read_csv(lines):
+    """CSV с заголовком author,group,text,pub_date; комментариев нет."""
+    reader = csv.DictReader(lines)
+    for record in reader:
+        yield reader.line_num, record
+
+
+READERS = {'jsonl': read_jsonl, 'csv': read_csv}
+
+
+def parse_date(value, default):
+    if not value:
+        return default
+    date = parse_datetime(value)
+    if date is None:
+        raise RecordError(f'дата {value!r} не в формате ISO 8601')
+    if timezone.is_naive(date):
+        date = timezone.make_aware(date)
+    return date
+
+
+def string(record, field):
+    """Строковое поле записи; пустое или отсутствующее - None."""
+    value = record.get(field)
+    if value is None or value == '':
+        return None
+    if not isinstance(value, str):
+        raise RecordError(f'{field} должно быть строкой')
+    return value
+
+
+def clean(record, now):
+    """
+    Проверка и приведение записи поста с комментариями: типы всех
+    полей, вложенных тоже, проверяются здесь - дальше импорт на них
+    полагается.
+    """
+    if isinstance(record, RecordError):
+        raise record
+    if not isinstance(record, dict):
+        raise RecordError('ожидался объект')
+    author, text = string(record, 'author'), string(record, 'text')
+    if not author or not text:
+        raise RecordError('нужны author и text')
+    pub_date = parse_date(string(record, 'pub_date'), now)
+    raw_comments = record.get('comments')
+    if raw_comments is None:
+        raw_comments = []
+    if not isinstance(raw_comments, list):
+        raise RecordError('comments должно быть списком')
+    comments = []
+    for comment in raw_comments:
+        if not isinstance(comment, dict):
+            raise RecordError('комментарий должен быть объектом')
+        comment_author = string(comment, 'author')
+        comment_text = string(comment, 'text')
+        if not comment_author or not comment_text:
+            raise RecordError('у комментария нужны author и text')
+        comments.append({
+            'author': comment_author,
+            'text': comment_text,
+            'created': parse_date(string(comment, 'created'), pub_date),
+        })
+    return {
+        'author': author,
+        'group': string(record, 'group'),
+        'text': text,
+        'pub_date': pub_date,
+        'comments': comments,
+    }
+
+
+def lock_posts():
+    """
+    Пустой UPDATE первым запросом транзакции: BEGIN в SQLite отложенный,
+    и блокировку записи берёт только первая запись. До неё другой
+    писатель успевает вставить посты между чтением last_pk и нашим
+    INSERT - они попали бы в наши id.
+    """
+    Post.objects.filter(pk=0).update(updated=F('updated'))
+
+
+class Importer:
+    """
+    Потоковый импорт постов: строки читаются генератором, пачки
+    по batch_size пишутся bulk_create в своей транзакции. Авторы
+    и группы ищутся через словари username/slug -> id, которые
+    дополняются по мере появления новых имён; отсутствующие
+    создаются (create_missing) или строка пропускается.
+    В памяти - одна пачка и словари, но не весь файл.
+    """
+
+    def __init__(self, batch_size=BATCH_SIZE, create_missing=True,
+                 progress=None):
+        self.batch_size = batch_size
+        self.create_missing = create_missing
+        self.progress = progress or (lambda message: None)
+        self.authors = {}
+        self.groups = {}
+        self.touched_authors = set()
+        self.touched_groups = set()
+        self.posts = self.comments = self.skipped = 0
+        self.errors = []
+        self.now = timezone.now()
+
+    def error(self, number, message):
+        self.skipped += 1
+        if len(self.errors) < MAX_ERRORS:
+            self.errors.append(f'строка {number}: {message}')
+
+    def cleaned(self, rows):
+        for number, record in rows:
+            try:
+                yield number, clean(record, self.now)
+            except RecordError as error:
+                self.error(number, error)
+
+    def run(self, rows):
+        started = time.perf_counter()
+        for batch in batches(self.cleaned(rows), self.batch_size):
+            self.write(batch)
+            elapsed = time.perf_counter() - started
+            self.progress(
+                f'Постов: {self.posts}, комментариев: {self.comments}, '
+                f'{self.posts / elapsed:.0f} постов/с'
+            )
+        self.finish()
+        return time.perf_counter() - started
+
+    def resolve(self, names, lookup, model, field, build):
+        """Дополнение словаря name -> id: из базы, затем созданием."""
+        def fetch(names):
+            found = {}
+            for chunk in batches(names):
+                found.update(model.objects.filter(
+                    **{f'{field}__in': chunk}
+                ).values_list(field, 'pk'))
+            return found
+
+        missing = set(names) - lookup.keys()
+        if not missing:
+            return
+        lookup.update(fetch(missing))
+        missing -= lookup.keys()
+        if not missing or not self.create_missing:
+            return
+        model.objects.bulk_create(
+            (build(name) for name in missing), ignore_conflicts=True
+        )
+        created = fetch(missing)
+        lookup.update(created)
+        if model is User:
+            Profile.objects.bulk_create(
+                (Profile(user_id=pk) for pk in created.values()),
+                ignore_conflicts=True
+            )
+
+    def write(self, batch):
+        with transaction.atomic(), fixed_dates():
+            if not connection.features.can_return_ids_from_bulk_insert:
+                lock_posts()
+            self.resolve(
+                {
+                    name for _, record in batch
+                    for name in (
+                        record['author'],
+                        *(comment['author']
+                          for comment in record['comments'])
+                    )
+                },
+                self.authors, User, 'username',
+                lambda name: User(
+                    username=name, password=make_password(None)
+                )
+            )
+            self.resolve(
+                {record['group'] for _, record in batch} - {None},
+                self.groups, Group, 'slug',
+                lambda slug: Group(title=slug, slug=slug, description='')
+            )
+            posts, records = [], []
+            for number, record in batch:
+                try:
+                    posts.append(self.build_post(record))
+                except RecordError as error:
+                    self.error(number, error)
+                    continue
+                records.append(record)
+            post_ids = self.insert_posts(posts)
+            get_backend().index(post_ids)
+            Comment.objects.bulk_create(
+                (
+                    Comment(
+                        post_id=post_id,
+                        author_id=self.authors[comment['author']],
+                        text=comment['text'],
+                        created=comment['created'],
+                    )
+                    for post_id, record in zip(post_ids, records)
+                    for comment in record['comments']
+                )
+            )
+        self.posts += len(posts)
+        self.comments += sum(post.comments_count for post in posts)
+        self.touched_authors.update(post.author_id for post in posts)
+        self.touched_groups.update(
+            post.group_id for post in posts if post.group_id
+        )
+
+    def build_post(self, record):
+        names = [record['author']] + [
+            comment['author'] for comment in record['comments']
+        ]
+        unknown = [name for name in names if name not in self.authors]
+        if unknown:
+            raise RecordError(f'нет пользователя {unknown[0]!r}')
+        if record['group'] and record['group'] not in self.groups:
+            raise RecordError(f'нет группы {record["group"]!r}')
+        return Post(
+            author_id=self.authors[record['author']],
+            group_id=self.groups.get(record['group']),
+            text=record['text'],
+            pub_date=record['pub_date'],
+            updated=record['pub_date'],
+            comments_count=len(record['comments']),
+        )
+
+    def insert_posts(self, posts):
+        """
+        id вставленных постов для их комментариев. SQLite не возвращает
+        id из bulk_create - они читаются обратно: write() взял блокировку
+        записи до любого чтения (lock_posts), других писателей до конца
+        транзакции нет, и новые строки после last_pk - наши.
+        """
+        last_pk = Post.objects.order_by('-pk').values_list(
+            'pk', flat=True).first() or 0
+        # Размер одного INSERT Django подбирает под лимиты СУБД сам.
+        Post.objects.bulk_create(posts)
+        if connection.features.can_return_ids_from_bulk_insert:
+            return [post.pk for post in posts]
+        return list(Post.objects.filter(pk__gt=last_pk).order_by(
+            'pk').values_list('pk', flat=True))
+
+    def finish(self):
+        """
+        bulk_create не шлёт сигналов: счётчики авторов, ленты
+        подписчиков и версии кэша обновляются один раз в конце.
+        """
+        if not self.posts:
+            return
+        follower_ids = set()
+        slugs = []
+        for author_ids in batches(self.touched_authors):
+            recount(User.objects.filter(pk__in=author_ids))
+            follows = Follow.objects.filter(
+                author_id__in=author_ids
+            ).values_list('user_id', 'author_id')
+            with transaction.atomic():
+                for user_id, author_id in follows.iterator():
+                    backfill_feed(user_id, author_id)
+                    follower_ids.add(user_id)
+        for group_ids in batches(self.touched_groups):
+            slugs += Group.objects.filter(
+                pk__in=group_ids).values_list('slug', flat=True)
+        bump_versions(
+            NAMESPACES['index'],
+            *(NAMESPACES['author'].format(author_id=author_id)
+              for author_id in self.touched_authors),
+            *(NAMESPACES['group'].format(slug=slug) for slug in slugs),
+            *((NAMESPACES['groups'],) if slugs else ()),
+            *(NAMESPACES['follow'].format(user_id=user_id)
+              for user_id in follower_ids),
+        )
@@ -0,0 +1,104 @@
+import re
+
+from django.contrib.auth.models import AnonymousUser
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test import RequestFactory
+from django.test.utils import CaptureQueriesContext, override_settings
+from django.urls import resolve, reverse
+
+from core.cache import DUMMY_CACHES
+from posts.models import Comment, Follow, Post
+from posts.paginators import FORWARD, CursorPaginator
+
+# Полный проход таблицы или сортировка во временном B-дереве.
+BAD_PLAN = re.compile(
+    r'SCAN (TABLE )?posts_\w+(?! USING)( |$)|USE TEMP B-TREE'
+)
+
+
+class Command(BaseCommand):
+    help = (
+        'Выполняет ленточные view без кэша и печатает EXPLAIN QUERY PLAN '
+        'каждого их SELECT: полные сканирования и сортировки во временном '
+        'B-дереве помечаются как регрессии.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--strict',
+            action='store_true',
+            help='Завершиться с ошибкой, если найдены регрессии.'
+        )
+
+    def get_urls(self):
+        """Адреса view с первой и глубокой страницей ленты."""
+        post = Post.objects.filter(group__isnull=False).first()
+        if post is None:
+            raise CommandError('Нужен хотя бы один пост с группой.')
+        cursor = {'cursor': CursorPaginator.encode_cursor(FORWARD, post)}
+        follow = Follow.objects.select_related('user').first()
+        comment = Comment.objects.first()
+        urls = [
+            (reverse('posts:home_page'), {}, None),
+            (reverse('posts:home_page'), cursor, None),
+            (reverse('posts:group_list', args=(post.group.slug,)), {}, None),
+            (reverse('posts:group_list', args=(post.group.slug,)),
+             cursor, None),
+            (reverse('posts:profile', args=(post.author.username,)),
+             {}, None),
+            (reverse('posts:profile', args=(post.author.username,)),
+             cursor, None),
+            (reverse('posts:post_detail', args=(
+                comment.post_id if comment else post.pk,)), {}, None),
+        ]
+        if follow is not None:
+            urls += [
+                (reverse('posts:follow_index'), {}, follow.user),
+                (reverse('posts:follow_index'), cursor, follow.user),
+            ]
+        return urls
+
+    def explain(self, url, params, user):
+        request = RequestFactory().get(url, params)
+        request.user = user or AnonymousUser()
+        request.resolver_match = resolve(url)
+        with override_settings(CACHES=DUMMY_CACHES):
+            with CaptureQueriesContext(connection) as queries:
+                request.resolver_match.func(
+                    request,
+                    *request.resolver_match.args,
+                    **request.resolver_match.kwargs
+                )
+        regressions = 0
+        for query in queries.captured_queries:
+            if not query['sql'].startswith('SELECT'):
+                continue
+            with connection.cursor() as cursor:
+                cursor.execute('EXPLAIN QUERY PLAN ' + query['sql'])
+                plan = [row[-1] for row in cursor.fetchall()]
+            bad = [line for line in plan if BAD_PLAN.search(line)]
+            regressions += bool(bad)
+            self.stdout.write(query['sql'])
+            for line in plan:
+                style = self.style.ERROR if line in bad else str
+                self.stdout.write('    ' + style(line))
+        return regressions
+
+    def handle(self, *args, **options):
+        if connection.vendor != 'sqlite':
+            raise CommandError('EXPLAIN QUERY PLAN есть только в SQLite.')
+        regressions = 0
+        for url, params, user in self.get_urls():
+            self.stdout.write(self.style.MIGRATE_HEADING(
+                f'{url} {params or ""}'
+            ))
+            regressions += self.explain(url, params, user)
+
+        if not regressions:
+            self.stdout.write(self.style.SUCCESS('Регрессий не найдено.'))
+            return
+        message = f'Запросов без индекса: {regressions}.'
+        if options['strict']:
+            raise CommandError(message)
+        self.stdout.write(self.style.WARNING(message))
@@ -0,0 +1,60 @@
+import sys
+
+from django.core.management.base import BaseCommand, CommandError
+
+from posts.exporting import EXPORTS, FORMATS, ExportError, export, \
+    filter_queryset
+
+
+class Command(BaseCommand):
+    help = (
+        'Потоковая выгрузка постов, комментариев или подписок в JSONL '
+        'или CSV, с .gz - в gzip. Память не зависит от объёма: строки '
+        'читаются курсором порциями. "-" - вывод в stdout.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('kind', choices=EXPORTS)
+        parser.add_argument('output')
+        parser.add_argument(
+            '--format', choices=FORMATS,
+            help='По умолчанию - по расширению файла, иначе jsonl.'
+        )
+        parser.add_argument('--from', dest='date_from',
+                            help='Дата ISO 8601, включительно.')
+        parser.add_argument('--to', dest='date_to',
+                            help='Дата ISO 8601, включительно.')
+        parser.add_argument('--group', help='slug группы.')
+        parser.add_argument('--author', help='username автора.')
+
+    def handle(self, *args, **options):
+        output = options['output']
+        name = output[:-3] if output.endswith('.gz') else output
+        file_format = options['format'] or (
+            'csv' if name.endswith('.csv') else 'jsonl')
+        try:
+            queryset = filter_queryset(
+                options['kind'],
+                date_from=options['date_from'],
+                date_to=options['date_to'],
+                group=options['group'],
+                author=options['author'],
+            )
+        except ExportError as error:
+            raise CommandError(error)
+
+        chunks = export(
+            options['kind'], queryset, file_format,
+            compress=output.endswith('.gz')
+        )
+        if output == '-':
+            for chunk in chunks:
+                sys.stdout.buffer.write(chunk)
+            return
+        size = 0
+        with open(output, 'wb') as file:
+            for chunk in chunks:
+                size += file.write(chunk)
+        self.stdout.write(self.style.SUCCESS(
+            f'Выгружено в {output}: {size} байт.'
+        ))
@@ -0,0 +1,16 @@
+from django.core.management.base import BaseCommand
+
+from posts.thumbnails import generate_missing
+
+
+class Command(BaseCommand):
+    help = (
+        'Нарезает недостающие миниатюры картинок постов в пуле потоков '
+        '(THUMBNAIL_WORKERS).'
+    )
+
+    def handle(self, *args, **options):
+        count = generate_missing()
+        self.stdout.write(self.style.SUCCESS(
+            f'Создано миниатюр: {count}.'
+        ))
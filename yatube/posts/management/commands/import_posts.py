@@ -0,0 +1,61 @@
+import gzip
+import io
+import sys
+
+from django.core.management.base import BaseCommand, CommandError
+
+from posts.importing import BATCH_SIZE, FORMATS, READERS, Importer
+
+
+class Command(BaseCommand):
+    help = (
+        'Импорт постов с комментариями из JSONL или CSV (можно .gz, '
+        '"-" - stdin) пачками bulk_create. Строка JSONL: {"author", '
+        '"group", "text", "pub_date", "comments": [{"author", "text", '
+        '"created"}]}, CSV: author,group,text,pub_date.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('path')
+        parser.add_argument(
+            '--format', choices=FORMATS,
+            help='По умолчанию - по расширению файла.'
+        )
+        parser.add_argument('--batch-size', type=int, default=BATCH_SIZE)
+        parser.add_argument(
+            '--no-create', action='store_true',
+            help='Не создавать отсутствующих авторов и группы.'
+        )
+
+    def open(self, path):
+        if path == '-':
+            return io.TextIOWrapper(sys.stdin.buffer, encoding='utf-8')
+        if path.endswith('.gz'):
+            return gzip.open(path, 'rt', encoding='utf-8', newline='')
+        return open(path, encoding='utf-8', newline='')
+
+    def handle(self, *args, **options):
+        path = options['path']
+        file_format = options['format'] or path.replace(
+            '.gz', '').rpartition('.')[2]
+        if file_format not in FORMATS:
+            raise CommandError('Укажите --format: jsonl или csv.')
+        importer = Importer(
+            batch_size=options['batch_size'],
+            create_missing=not options['no_create'],
+            progress=self.stdout.write if options['verbosity'] > 1 else None,
+        )
+        try:
+            with self.open(path) as lines:
+                elapsed = importer.run(READERS[file_format](lines))
+        except OSError as error:
+            raise CommandError(error)
+
+        for error in importer.errors:
+            self.stderr.write(error)
+        self.stdout.write(self.style.SUCCESS(
+            f'Импортировано постов: {importer.posts}, комментариев: '
+            f'{importer.comments}, пропущено строк: {importer.skipped} '
+            f'за {elapsed:.1f} с ({importer.posts / max(elapsed, 1e-9):.0f} '
+            'постов/с).'
+        ))
@@ -0,0 +1,17 @@
+from django.core.management.base import BaseCommand
+
+from posts.trending import rank_posts
+
+
+class Command(BaseCommand):
+    help = (
+        'Пересчитывает рейтинг «Популярное»: свежие комментарии и '
+        'подписчики авторов с затуханием по возрасту поста. Запускается '
+        'по расписанию (cron, systemd timer).'
+    )
+
+    def handle(self, *args, **options):
+        count = rank_posts()
+        self.stdout.write(self.style.SUCCESS(
+            f'Постов в рейтинге: {count}.'
+        ))
@@ -0,0 +1,17 @@
+from django.core.management.base import BaseCommand
+
+from posts.models import Post
+from posts.search import get_backend
+
+
+class Command(BaseCommand):
+    help = (
+        'Строит поисковый индекс постов заново (SEARCH_BACKEND): после '
+        'загрузки данных в обход сигналов или смены бэкенда.'
+    )
+
+    def handle(self, *args, **options):
+        get_backend().rebuild()
+        self.stdout.write(self.style.SUCCESS(
+            f'Проиндексировано постов: {Post.objects.count()}.'
+        ))
@@ -0,0 +1,16 @@
+from django.core.management.base import BaseCommand
+
+from posts.counters import recount
+
+
+class Command(BaseCommand):
+    help = (
+        'Пересчитывает денормализованные счётчики: посты, подписчики '
+        'и подписки профилей, комментарии постов.'
+    )
+
+    def handle(self, *args, **options):
+        profiles, posts = recount()
+        self.stdout.write(self.style.SUCCESS(
+            f'Пересчитано профилей: {profiles}, постов: {posts}.'
+        ))
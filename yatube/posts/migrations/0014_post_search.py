@@ -0,0 +1,38 @@
+from django.db import migrations
+
+# Индекс FTS5 для posts.search.SQLiteFTSBackend. В других СУБД
+# таблица не создаётся - там SEARCH_BACKEND = LikeSearchBackend.
+CREATE = (
+    "CREATE VIRTUAL TABLE IF NOT EXISTS posts_post_fts USING fts5("
+    "text, group_title, tokenize = 'unicode61 remove_diacritics 2', "
+    "prefix = '2 3')"
+)
+FILL = (
+    "INSERT INTO posts_post_fts (rowid, text, group_title) "
+    "SELECT post.id, post.text, COALESCE(grp.title, '') "
+    "FROM posts_post post "
+    "LEFT JOIN posts_group grp ON grp.id = post.group_id"
+)
+DROP = 'DROP TABLE IF EXISTS posts_post_fts'
+
+
+def create_index(apps, schema_editor):
+    if schema_editor.connection.vendor == 'sqlite':
+        schema_editor.execute(CREATE)
+        schema_editor.execute(FILL)
+
+
+def drop_index(apps, schema_editor):
+    if schema_editor.connection.vendor == 'sqlite':
+        schema_editor.execute(DROP)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0013_post_thumbnail'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_index, drop_index),
+    ]
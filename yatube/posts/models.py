@@ -22,6 +22,7 @@ class Post(models.Model):
 
     text = models.TextField('Текст')
     pub_date = models.DateTimeField('Опубликовано', auto_now_add=True)
+    updated = models.DateTimeField('Обновлено', auto_now=True)
     author = models.ForeignKey(
         User,
         verbose_name='Автор',
@@ -41,11 +42,37 @@ class Post(models.Model):
         upload_to='posts/',
         blank=True
     )
+    thumbnail = models.CharField(
+        'Миниатюра',
+        max_length=255,
+        blank=True,
+        editable=False
+    )
+    comments_count = models.PositiveIntegerField(
+        'Комментариев',
+        default=0,
+        editable=False
+    )
 
     class Meta:
         ordering = ('-pub_date',)
         verbose_name = 'Пост'
         verbose_name_plural = 'Посты'
+        # Индексы под keyset-пагинацию лент по (pub_date, id).
+        indexes = (
+            models.Index(
+                fields=('-pub_date', '-id'),
+                name='post_pub_date_id'
+            ),
+            models.Index(
+                fields=('group', '-pub_date', '-id'),
+                name='post_group_pub_date_id'
+            ),
+            models.Index(
+                fields=('author', '-pub_date', '-id'),
+                name='post_author_pub_date_id'
+            ),
+        )
 
     def __str__(self):
         # return str(self.text)[:30] + '...'
@@ -72,6 +99,17 @@ class Comment(models.Model):
         ordering = ('-created',)
         verbose_name = 'Комментарий'
         verbose_name_plural = 'Комментарии'
+        indexes = (
+            models.Index(
+                fields=('post', '-created', '-id'),
+                name='comment_post_created_id'
+            ),
+            # Подсчёт свежих комментариев по постам для рейтинга.
+            models.Index(
+                fields=('created', 'post'),
+                name='comment_created_post'
+            ),
+        )
 
     def __str__(self):
         return str(self.text)[:15]
@@ -94,6 +132,13 @@ class Follow(models.Model):
     class Meta:
         verbose_name = 'Подписка'
         verbose_name_plural = 'Подписки'
+        # Подписчики автора: рассылка ленты и подсчёт подписчиков.
+        indexes = (
+            models.Index(
+                fields=('author', 'user'),
+                name='follow_author_user'
+            ),
+        )
         constraints = (
             models.UniqueConstraint(
                 fields=('user', 'author'),
@@ -107,3 +152,89 @@ class Follow(models.Model):
 
     def __str__(self):
         return str(f'{self.user.username}->{self.author.username}')
+
+
+class FeedItem(models.Model):
+    """
+    Материализованная лента подписок: пост, разосланный подписчику
+    при публикации (fan-out on write).
+    """
+    user = models.ForeignKey(
+        User,
+        verbose_name='Подписчик',
+        on_delete=models.CASCADE,
+        related_name='feed_items'
+    )
+    post = models.ForeignKey(
+        Post,
+        verbose_name='Пост',
+        on_delete=models.CASCADE,
+        related_name='feed_items'
+    )
+    pub_date = models.DateTimeField('Опубликовано')
+
+    class Meta:
+        ordering = ('-pub_date',)
+        verbose_name = 'Запись ленты'
+        verbose_name_plural = 'Записи ленты'
+        constraints = (
+            models.UniqueConstraint(
+                fields=('user', 'post'),
+                name='unique_feed_item'
+            ),
+        )
+        indexes = (
+            models.Index(
+                fields=('user', '-pub_date', '-post'),
+                name='feed_item_user_pub_date_post'
+            ),
+        )
+
+    def __str__(self):
+        return f'{self.user_id}<-{self.post_id}'
+
+
+class Profile(models.Model):
+    """
+    Счётчики пользователя. Обновляются F()-выражениями в сигналах,
+    расхождения чинит команда recount.
+    """
+    user = models.OneToOneField(
+        User,
+        verbose_name='Пользователь',
+        on_delete=models.CASCADE,
+        related_name='profile'
+    )
+    posts_count = models.PositiveIntegerField('Постов', default=0)
+    followers_count = models.PositiveIntegerField('Подписчиков', default=0)
+    following_count = models.PositiveIntegerField('Подписок', default=0)
+
+    class Meta:
+        verbose_name = 'Профиль'
+        verbose_name_plural = 'Профили'
+
+    def __str__(self):
+        return str(self.user_id)
+
+
+class TrendingPost(models.Model):
+    """
+    Рейтинг популярных постов: top-N, пересчитывается командой
+    rank_posts. Лента «Популярное» читает страницу по диапазону rank.
+    """
+    post = models.OneToOneField(
+        Post,
+        verbose_name='Пост',
+        on_delete=models.CASCADE,
+        related_name='trending'
+    )
+    rank = models.PositiveIntegerField('Место', unique=True)
+    score = models.FloatField('Рейтинг')
+
+    class Meta:
+        ordering = ('rank',)
+        verbose_name = 'Популярный пост'
+        verbose_name_plural = 'Популярные посты'
+
+    def __str__(self):
+        return f'{self.rank}: {self.post_id}'
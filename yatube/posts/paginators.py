@@ -0,0 +1,218 @@
+import base64
+import binascii
+
+from django.core.cache import cache
+from django.core.paginator import EmptyPage, PageNotAnInteger, Paginator
+from django.db.models import Q
+from django.utils.dateparse import parse_datetime
+from django.utils.functional import cached_property
+
+FORWARD = 'n'
+BACKWARD = 'p'
+SEPARATOR = '|'
+
+
+class CursorPaginator(Paginator):
+    """
+    Keyset-пагинация по (pub_date, id).
+    Страница выбирается не через OFFSET, а по курсору - ключу крайней
+    записи соседней страницы, поэтому стоимость запроса не зависит
+    от глубины страницы, а COUNT(*) не выполняется.
+    Страница остаётся обычным Page: number = 1 у первой страницы и 2
+    у любой другой, num_pages подстраивается под наличие следующей.
+    keys - поля ключа (дата, id), если сортировать нужно не по
+    самому посту, а, например, по аннотации из записи ленты.
+    """
+    keys = ('pub_date', 'pk')
+
+    def __init__(self, object_list, per_page, keys=None):
+        if keys is not None:
+            self.keys = keys
+        super().__init__(
+            object_list.order_by(*(f'-{key}' for key in self.keys)),
+            per_page
+        )
+
+    def __getstate__(self):
+        """
+        Страница кэшируется вместе с пагинатором: без этого pickle
+        выполнил бы весь исходный queryset целиком.
+        """
+        state = self.__dict__.copy()
+        state['object_list'] = []
+        return state
+
+    @staticmethod
+    def encode_cursor(direction, post=None, keys=keys):
+        """Непрозрачный токен курсора для ссылок ?cursor=."""
+        raw = direction
+        if post is not None:
+            date_key, pk_key = keys
+            raw = SEPARATOR.join((
+                direction,
+                getattr(post, date_key).isoformat(),
+                str(getattr(post, pk_key))
+            ))
+        return base64.urlsafe_b64encode(raw.encode()).decode().rstrip('=')
+
+    @staticmethod
+    def decode_cursor(cursor):
+        """
+        Разбор токена в (направление, pub_date, pk).
+        Для битого или пустого курсора возвращается None.
+        """
+        if not cursor:
+            return None
+        try:
+            raw = base64.urlsafe_b64decode(
+                cursor + '=' * (-len(cursor) % 4)
+            ).decode()
+        except (binascii.Error, UnicodeDecodeError, ValueError):
+            return None
+        parts = raw.split(SEPARATOR)
+        if parts[0] not in (FORWARD, BACKWARD):
+            return None
+        if len(parts) == 1:
+            return parts[0], None, None
+        if len(parts) != 3 or not parts[2].isdigit():
+            return None
+        pub_date = parse_datetime(parts[1])
+        if pub_date is None:
+            return None
+        return parts[0], pub_date, int(parts[2])
+
+    def get_page(self, cursor):
+        """
+        Страница по курсору. Запрашивается per_page + 1 запись:
+        лишняя запись говорит о том, что дальше есть ещё страница.
+        """
+        position = self.decode_cursor(cursor)
+        if position is None:
+            position = (FORWARD, None, None)
+        direction, pub_date, pk = position
+        date_key, pk_key = self.keys
+        posts = self.object_list
+
+        if direction == FORWARD:
+            if pub_date is not None:
+                posts = posts.filter(
+                    Q(**{f'{date_key}__lt': pub_date})
+                    | Q(**{date_key: pub_date, f'{pk_key}__lt': pk})
+                )
+            rows = list(posts[:self.per_page + 1])
+            has_next = len(rows) > self.per_page
+            rows = rows[:self.per_page]
+            has_previous = pub_date is not None
+        else:
+            if pub_date is not None:
+                posts = posts.filter(
+                    Q(**{f'{date_key}__gt': pub_date})
+                    | Q(**{date_key: pub_date, f'{pk_key}__gt': pk})
+                )
+            rows = list(posts.reverse()[:self.per_page + 1])
+            has_previous = len(rows) > self.per_page
+            rows = rows[:self.per_page][::-1]
+            has_next = pub_date is not None
+        return self._build_page(rows, has_previous, has_next)
+
+    def _build_page(self, rows, has_previous, has_next):
+        number = 2 if has_previous else 1
+        self.num_pages = number + 1 if has_next else number
+        page = self._get_page(rows, number, self)
+        page.next_cursor = (
+            self.encode_cursor(FORWARD, rows[-1], self.keys)
+            if has_next and rows else None
+        )
+        page.previous_cursor = (
+            self.encode_cursor(BACKWARD, rows[0], self.keys)
+            if has_previous and rows else None
+        )
+        page.last_cursor = self.encode_cursor(BACKWARD)
+        return page
+
+
+class CountPaginator(Paginator):
+    """
+    Нумерованная пагинация без COUNT(*) на каждую страницу.
+    С count_key число объектов кэшируется под этим ключом - ключ
+    версионный, и число пересчитывается вместе со сбросом данных.
+    Без count_key - приблизительный режим: читается per_page + 1
+    объект, и известно только, есть ли следующая страница
+    (num_pages - номер текущей или следующей). Честный COUNT в нём
+    нужен лишь для номера за концом списка - чтобы открыть последнюю.
+    """
+
+    def __init__(self, object_list, per_page, count_key=None):
+        super().__init__(object_list, per_page)
+        self.count_key = count_key
+        self.approximate = count_key is None
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        state['object_list'] = []
+        return state
+
+    @cached_property
+    def count(self):
+        if self.count_key is None:
+            return super().count
+        count = cache.get(self.count_key)
+        if count is None:
+            count = super().count
+            cache.set(self.count_key, count)
+        return count
+
+    def validate_number(self, number):
+        if not self.approximate:
+            return super().validate_number(number)
+        try:
+            number = int(number)
+        except (TypeError, ValueError):
+            raise PageNotAnInteger('Номер страницы - не целое число.')
+        if number < 1:
+            raise EmptyPage('Номер страницы меньше 1.')
+        return number
+
+    def get_page(self, number):
+        if self.approximate:
+            try:
+                return self.page(number)
+            except PageNotAnInteger:
+                number = 1
+            except EmptyPage:
+                self.approximate = False
+        return super().get_page(number)
+
+    def rows(self, bottom, limit):
+        """Объекты страницы: limit штук, начиная с bottom."""
+        return list(self.object_list[bottom:bottom + limit])
+
+    def page(self, number):
+        number = self.validate_number(number)
+        bottom = (number - 1) * self.per_page
+        if not self.approximate:
+            return self._get_page(
+                self.rows(bottom, self.per_page), number, self)
+        rows = self.rows(bottom, self.per_page + 1)
+        if not rows and number > 1:
+            raise EmptyPage('Страница пуста.')
+        if len(rows) > self.per_page:
+            self.num_pages = number + 1
+        else:
+            self.num_pages = number
+            self.count = bottom + len(rows)
+        return self._get_page(rows[:self.per_page], number, self)
+
+
+class RankPaginator(CountPaginator):
+    """
+    Нумерованная пагинация рейтинга: страница выбирается диапазоном
+    уникального rank, а не OFFSET, - по индексу и за O(страницы).
+    На странице - сами посты, а не записи рейтинга.
+    """
+
+    def rows(self, bottom, limit):
+        items = self.object_list.filter(
+            rank__gt=bottom, rank__lte=bottom + limit
+        ).select_related('post__author', 'post__group')
+        return [item.post for item in items]
@@ -0,0 +1,232 @@
+import re
+from functools import lru_cache
+
+from django.conf import settings
+from django.db import connection
+from django.db.models import Q
+from django.db.models.expressions import RawSQL
+from django.utils.module_loading import import_string
+
+from .batching import batches
+from .models import Group, Post
+
+TOKEN = re.compile(r'\w+')
+MAX_TOKENS = 8
+
+
+def get_backend():
+    """Поисковый бэкенд из SEARCH_BACKEND."""
+    return _load_backend(settings.SEARCH_BACKEND)
+
+
+@lru_cache(maxsize=None)
+def _load_backend(path):
+    return import_string(path)()
+
+
+def tokens(query):
+    return TOKEN.findall(query.lower())[:MAX_TOKENS]
+
+
+class SearchResults:
+    """
+    Результаты поиска для Paginator: count() и срезы.
+    Посты среза читаются одним запросом и идут в порядке
+    релевантности.
+    """
+
+    def __init__(self, backend, query):
+        self.backend = backend
+        self.query = query
+
+    def count(self):
+        return self.backend.count(self.query)
+
+    def __len__(self):
+        return self.count()
+
+    def __getitem__(self, index):
+        if not isinstance(index, slice):
+            return self[index:index + 1][0]
+        ids = self.backend.ranked_ids(
+            self.query, index.start or 0, index.stop - (index.start or 0)
+        )
+        posts = Post.objects.select_related('author', 'group').in_bulk(ids)
+        return [posts[pk] for pk in ids if pk in posts]
+
+
+class SearchBackend:
+    """
+    Интерфейс поиска по тексту постов и названию их группы.
+    Бэкенд без собственного индекса (LIKE) индексирование
+    пропускает.
+    """
+
+    def index(self, post_ids):
+        """Добавить или обновить посты в индексе."""
+
+    def index_group(self, group_id):
+        """Группу переименовали - переиндексировать её посты."""
+
+    def clear_group(self, group_id):
+        """Группу удаляют - убрать её название у постов."""
+
+    def remove(self, post_ids):
+        """Убрать посты из индекса."""
+
+    def rebuild(self):
+        """Построить индекс заново по всем постам."""
+
+    def search(self, query):
+        return SearchResults(self, query)
+
+    def count(self, query):
+        raise NotImplementedError
+
+    def ranked_ids(self, query, offset, limit):
+        raise NotImplementedError
+
+    def filter(self, queryset, query):
+        """Посты queryset, подходящие под запрос (поиск в админке)."""
+        raise NotImplementedError
+
+
+class LikeSearchBackend(SearchBackend):
+    """
+    Запасной бэкенд для СУБД без FTS5: icontains по каждому слову,
+    новые посты первыми. Полный просмотр таблицы.
+    """
+
+    def condition(self, query):
+        words = tokens(query)
+        if not words:
+            return None
+        condition = Q()
+        for word in words:
+            condition &= (
+                Q(text__icontains=word) | Q(group__title__icontains=word)
+            )
+        return condition
+
+    def filter(self, queryset, query):
+        condition = self.condition(query)
+        if condition is None:
+            return queryset.none()
+        return queryset.filter(condition)
+
+    def count(self, query):
+        return self.filter(Post.objects.all(), query).count()
+
+    def ranked_ids(self, query, offset, limit):
+        return list(
+            self.filter(Post.objects.all(), query).values_list(
+                'pk', flat=True
+            )[offset:offset + limit]
+        )
+
+
+class SQLiteFTSBackend(SearchBackend):
+    """
+    Индекс SQLite FTS5: rowid строки - id поста, колонки - текст
+    поста и название его группы. Слова запроса ищутся префиксами
+    (все сразу), ранжирование - bm25.
+    Чтобы частое слово на десятках миллионов постов не заставляло
+    ранжировать все совпадения, ранжируются только SEARCH_MAX_RESULTS
+    самых новых: FTS5 отдаёт их по rowid без полного прохода.
+    """
+    table = 'posts_post_fts'
+    # Веса колонок bm25: совпадение в тексте важнее, чем в группе.
+    weights = (1.0, 0.5)
+
+    def match(self, query):
+        words = tokens(query)
+        if not words:
+            return None
+        return ' '.join(f'"{word}"*' for word in words)
+
+    def execute(self, sql, params=()):
+        with connection.cursor() as cursor:
+            cursor.execute(sql, params)
+            return cursor.fetchall()
+
+    def select_posts(self, where):
+        return (
+            f'INSERT INTO {self.table} (rowid, text, group_title) '
+            f'SELECT post.id, post.text, COALESCE(grp.title, \'\') '
+            f'FROM {Post._meta.db_table} post '
+            f'LEFT JOIN {Group._meta.db_table} grp '
+            f'ON grp.id = post.group_id WHERE {where}'
+        )
+
+    def index(self, post_ids):
+        for chunk in batches(post_ids):
+            marks = ', '.join(['%s'] * len(chunk))
+            self.execute(
+                f'DELETE FROM {self.table} WHERE rowid IN ({marks})', chunk
+            )
+            self.execute(self.select_posts(f'post.id IN ({marks})'), chunk)
+
+    def index_group(self, group_id):
+        posts = (
+            f'SELECT id FROM {Post._meta.db_table} WHERE group_id = %s'
+        )
+        self.execute(
+            f'DELETE FROM {self.table} WHERE rowid IN ({posts})',
+            (group_id,)
+        )
+        self.execute(self.select_posts('post.group_id = %s'), (group_id,))
+
+    def clear_group(self, group_id):
+        self.execute(
+            f'UPDATE {self.table} SET group_title = \'\' WHERE rowid IN '
+            f'(SELECT id FROM {Post._meta.db_table} WHERE group_id = %s)',
+            (group_id,)
+        )
+
+    def remove(self, post_ids):
+        for chunk in batches(post_ids):
+            marks = ', '.join(['%s'] * len(chunk))
+            self.execute(
+                f'DELETE FROM {self.table} WHERE rowid IN ({marks})', chunk
+            )
+
+    def rebuild(self):
+        self.execute(f'DELETE FROM {self.table}')
+        self.execute(self.select_posts('1'))
+
+    def newest_matches(self):
+        return (
+            f'SELECT rowid, bm25({self.table}, %s, %s) AS score '
+            f'FROM {self.table} WHERE {self.table} MATCH %s '
+            f'ORDER BY rowid DESC LIMIT %s'
+        )
+
+    def count(self, query):
+        match = self.match(query)
+        if match is None:
+            return 0
+        return self.execute(
+            f'SELECT count(*) FROM ({self.newest_matches()})',
+            (*self.weights, match, settings.SEARCH_MAX_RESULTS)
+        )[0][0]
+
+    def ranked_ids(self, query, offset, limit):
+        match = self.match(query)
+        if match is None:
+            return []
+        rows = self.execute(
+            f'SELECT rowid FROM ({self.newest_matches()}) '
+            f'ORDER BY score, rowid DESC LIMIT %s OFFSET %s',
+            (*self.weights, match, settings.SEARCH_MAX_RESULTS,
+             limit, offset)
+        )
+        return [row[0] for row in rows]
+
+    def filter(self, queryset, query):
+        match = self.match(query)
+        if match is None:
+            return queryset.none()
+        return queryset.filter(pk__in=RawSQL(
+            f'SELECT rowid FROM {self.table} WHERE {self.table} MATCH %s',
+            (match,)
+        ))
@@ -0,0 +1,218 @@
+from django.db.models.signals import (
+    post_delete, post_init, post_save, pre_delete, pre_save
+)
+from django.dispatch import receiver
+
+from .caching import NAMESPACES, bump_versions
+from .counters import change_comments_count, change_counters
+from .feeds import fanout_followers, push_post
+from .follows import followed, unfollowed
+from .models import Comment, Follow, Group, Post, Profile, User
+from .search import get_backend
+from .thumbnails import schedule_thumbnail
+
+
+USER_NAMES = ('username', 'first_name', 'last_name')
+
+
+@receiver(post_save, sender=User)
+def create_profile(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        Profile.objects.get_or_create(user=instance)
+
+
+@receiver(post_init, sender=User)
+def remember_names(sender, instance, **kwargs):
+    """Имена на момент загрузки: их выводят фрагменты постов."""
+    instance._loaded_names = tuple(
+        instance.__dict__.get(name) for name in USER_NAMES)
+
+
+@receiver(post_save, sender=User)
+def invalidate_user_names(sender, instance, created, **kwargs):
+    """
+    Новое имя автора - во фрагментах его постов и на страницах с
+    ними: главной, автора и групп, где он писал.
+    """
+    names = tuple(getattr(instance, name) for name in USER_NAMES)
+    if not created and names != instance._loaded_names:
+        slugs = Group.objects.filter(
+            posts__author=instance
+        ).values_list('slug', flat=True).distinct()
+        bump_versions(
+            NAMESPACES['index'],
+            NAMESPACES['author'].format(author_id=instance.pk),
+            NAMESPACES['user'].format(user_id=instance.pk),
+            *(NAMESPACES['group'].format(slug=slug) for slug in slugs),
+        )
+    instance._loaded_names = names
+
+
+# Счётчики обновляются первыми: рассылка ленты читает followers_count.
+@receiver(post_save, sender=Post)
+def count_new_post(sender, instance, created, **kwargs):
+    if created:
+        change_counters(instance.author_id, posts_count=1)
+
+
+@receiver(post_delete, sender=Post)
+def count_deleted_post(sender, instance, **kwargs):
+    change_counters(instance.author_id, posts_count=-1)
+
+
+@receiver(post_save, sender=Comment)
+def count_new_comment(sender, instance, created, **kwargs):
+    if created:
+        change_comments_count(instance.post_id, 1)
+
+
+@receiver(post_delete, sender=Comment)
+def count_deleted_comment(sender, instance, **kwargs):
+    change_comments_count(instance.post_id, -1)
+
+
+@receiver(post_save, sender=Follow)
+def add_follow(sender, instance, created, **kwargs):
+    """Счётчики, лента и кэш подписок - как у follows.follow()."""
+    if created:
+        followed(instance.user_id, [instance.author_id])
+
+
+@receiver(post_delete, sender=Follow)
+def remove_follow(sender, instance, **kwargs):
+    unfollowed(instance.user_id, [instance.author_id])
+
+
+@receiver(post_init, sender=Post)
+def remember_group(sender, instance, **kwargs):
+    """Группа на момент загрузки - чтобы при смене сбросить и старую."""
+    instance._loaded_group_id = instance.__dict__.get('group_id')
+    image = instance.__dict__.get('image')
+    instance._loaded_image = getattr(image, 'name', image)
+
+
+@receiver(pre_save, sender=Post)
+def reset_thumbnail(sender, instance, **kwargs):
+    """Миниатюра старой картинки больше не годится."""
+    if 'image' not in instance.__dict__:
+        return
+    if instance.image != getattr(instance, '_loaded_image', None):
+        instance.thumbnail = ''
+
+
+@receiver(post_save, sender=Post)
+def make_thumbnail(sender, instance, raw=False, **kwargs):
+    """Новая картинка режется в фоне, страницы не ждут её."""
+    if 'image' not in instance.__dict__ or raw:
+        return
+    if instance.image and not instance.thumbnail:
+        schedule_thumbnail(instance)
+    instance._loaded_image = instance.image.name
+
+
+@receiver((post_save, post_delete), sender=Post)
+def invalidate_post_feeds(sender, instance, created=False, **kwargs):
+    """
+    Рассылка нового поста подписчикам и сброс главной, страниц групп
+    (старой и новой) и каталога групп, страниц автора и лент
+    подписчиков.
+    Ленты подписчиков «знаменитости» сбрасываются через её
+    пространство имён автора.
+    """
+    group_ids = {
+        instance.group_id, getattr(instance, '_loaded_group_id', None)
+    } - {None}
+    slugs = Group.objects.filter(
+        pk__in=group_ids
+    ).values_list('slug', flat=True) if group_ids else ()
+    follower_ids = fanout_followers(instance.author_id) or ()
+    if created and follower_ids:
+        push_post(instance, follower_ids)
+
+    bump_versions(
+        NAMESPACES['index'],
+        NAMESPACES['author'].format(author_id=instance.author_id),
+        NAMESPACES['post'].format(post_id=instance.pk),
+        *(NAMESPACES['group'].format(slug=slug) for slug in slugs),
+        *((NAMESPACES['groups'],) if slugs else ()),
+        *(NAMESPACES['follow'].format(user_id=user_id)
+          for user_id in follower_ids),
+    )
+    instance._loaded_group_id = instance.group_id
+
+
+@receiver((post_save, post_delete), sender=Comment)
+def invalidate_post_comments(sender, instance, **kwargs):
+    bump_versions(NAMESPACES['post'].format(post_id=instance.post_id))
+
+
+@receiver(post_save, sender=Post)
+def index_post(sender, instance, update_fields=None, **kwargs):
+    """Поисковый индекс: текст и группа поста."""
+    if update_fields is None or {'text', 'group'} & set(update_fields):
+        get_backend().index([instance.pk])
+
+
+@receiver(post_delete, sender=Post)
+def unindex_post(sender, instance, **kwargs):
+    get_backend().remove([instance.pk])
+
+
+def group_author_ids(group_id):
+    return list(Post.objects.filter(
+        group_id=group_id
+    ).order_by().values_list('author_id', flat=True).distinct())
+
+
+def group_namespaces(group, slugs):
+    """
+    Страницы и фрагменты постов со ссылками на группу: главная,
+    каталог, страницы групп slugs и авторов её постов. Посты при
+    смене slug или удалении группы (SET_NULL - простой UPDATE) своих
+    сигналов не шлют.
+    """
+    author_ids = getattr(group, '_author_ids', None)
+    if author_ids is None:
+        author_ids = group_author_ids(group.pk)
+    return (
+        NAMESPACES['index'],
+        NAMESPACES['groups'],
+        NAMESPACES['group_info'].format(group_id=group.pk),
+        *(NAMESPACES['group'].format(slug=slug) for slug in slugs),
+        *(NAMESPACES['author'].format(author_id=author_id)
+          for author_id in author_ids),
+    )
+
+
+@receiver(post_init, sender=Group)
+def remember_slug(sender, instance, **kwargs):
+    """slug на момент загрузки - чтобы при смене сбросить и старый."""
+    instance._loaded_slug = instance.__dict__.get('slug')
+
+
+@receiver(post_save, sender=Group)
+def index_group(sender, instance, created, **kwargs):
+    """
+    Название группы в индексе у всех её постов; поиск, страница
+    группы (и старого slug) и страницы со ссылками на неё
+    сбрасываются.
+    """
+    if created:
+        bump_versions(NAMESPACES['groups'])
+    else:
+        get_backend().index_group(instance.pk)
+        bump_versions(*group_namespaces(
+            instance, {instance.slug, instance._loaded_slug} - {None}))
+    instance._loaded_slug = instance.slug
+
+
+@receiver(pre_delete, sender=Group)
+def unindex_group(sender, instance, **kwargs):
+    """Авторы постов запоминаются до того, как SET_NULL отвяжет посты."""
+    get_backend().clear_group(instance.pk)
+    instance._author_ids = group_author_ids(instance.pk)
+
+
+@receiver(post_delete, sender=Group)
+def invalidate_groups(sender, instance, **kwargs):
+    bump_versions(*group_namespaces(instance, {instance.slug}))
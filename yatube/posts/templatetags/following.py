@@ -0,0 +1,24 @@
+from django import template
+
+from ..feeds import followed_authors
+
+register = template.Library()
+
+FOLLOWED = '_followed_authors'
+
+
+@register.simple_tag(takes_context=True)
+def is_followed(context, author_id):
+    """
+    Подписан ли текущий пользователь на автора. Множество его
+    подписок читается один раз на запрос, дальше проверка - O(1)
+    для любого числа постов на странице.
+    """
+    request = context['request']
+    followed = getattr(request, FOLLOWED, None)
+    if followed is None:
+        followed = frozenset()
+        if request.user.is_authenticated:
+            followed = followed_authors(request.user.pk)
+        setattr(request, FOLLOWED, followed)
+    return author_id in followed
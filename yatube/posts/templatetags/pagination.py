@@ -0,0 +1,24 @@
+from django import template
+from django.conf import settings
+
+register = template.Library()
+
+
+@register.simple_tag
+def page_window(page_obj):
+    """
+    Номера страниц для нумерованной пагинации: первая, последняя
+    и PAGE_WINDOW с каждой стороны от текущей; пропуски - None.
+    В приблизительном режиме последняя неизвестна, окно кончается
+    следующей страницей.
+    """
+    paginator = page_obj.paginator
+    last = paginator.num_pages
+    low = max(page_obj.number - settings.PAGE_WINDOW, 1)
+    high = min(page_obj.number + settings.PAGE_WINDOW, last)
+    numbers = list(range(low, high + 1))
+    if low > 1:
+        numbers[:0] = [1] if low == 2 else [1, None]
+    if high < last and not getattr(paginator, 'approximate', False):
+        numbers += [last] if high == last - 1 else [None, last]
+    return numbers
@@ -0,0 +1,71 @@
+from django import template
+from django.core.cache import cache
+from django.template.loader import render_to_string
+from django.utils.safestring import mark_safe
+
+from core.holes import PUNCH_HOLES, fill_holes
+
+from ..caching import fragment_key, fragment_keys
+from ..models import Post
+
+register = template.Library()
+
+SHOW_POST_TEMPLATE = 'posts/includes/show_post.html'
+FRAGMENTS = 'post_fragments'
+KEYS = 'post_fragments_keys'
+LOADED = 'post_fragments_loaded'
+
+
+@register.simple_tag(takes_context=True)
+def post_fragment(context, post):
+    """
+    Пост, отрендеренный show_post.html, из кэша фрагментов.
+    При первом вызове на странице версии авторов и групп и фрагменты
+    всех постов page_obj читаются двумя get_many, отсутствующие
+    рендерятся и кэшируются. Посты страницы из кэша (unpack_page) -
+    с отложенными полями: для промахов они загружаются целиком, одним
+    запросом на страницу.
+    Фрагмент общий для всех пользователей: куски, зависящие от
+    пользователя ({% hole %}), хранятся метками и заполняются здесь же
+    или, на страницах из общего кэша, вместе со всей страницей.
+    """
+    request = context['request']
+    view_name = request.resolver_match.view_name
+    fragments = context.render_context.get(FRAGMENTS)
+    if fragments is None:
+        page_posts = context.get('page_obj', (post,))
+        keys = fragment_keys(view_name, page_posts)
+        fragments = cache.get_many(list(keys.values()))
+        missing = [
+            page_post.pk for page_post in page_posts
+            if keys[page_post.pk] not in fragments
+            and page_post.get_deferred_fields()
+        ]
+        context.render_context[FRAGMENTS] = fragments
+        context.render_context[KEYS] = keys
+        context.render_context[LOADED] = Post.objects.select_related(
+            'author', 'group'
+        ).in_bulk(missing) if missing else {}
+
+    key = context.render_context[KEYS].get(post.pk)
+    if key is None:
+        key = fragment_key(view_name, post)
+    html = fragments.get(key)
+    punching = getattr(request, PUNCH_HOLES, False)
+    if html is None:
+        if post.get_deferred_fields():
+            post = context.render_context[LOADED].get(post.pk)
+            if post is None:
+                # Пост удалён, пока страница лежала в кэше.
+                return ''
+        setattr(request, PUNCH_HOLES, True)
+        try:
+            html = render_to_string(
+                SHOW_POST_TEMPLATE, {'post': post}, request=request
+            )
+        finally:
+            setattr(request, PUNCH_HOLES, punching)
+        cache.set(key, html)
+    if not punching:
+        html = fill_holes(html, request)
+    return mark_safe(html)
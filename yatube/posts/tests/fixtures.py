@@ -71,6 +71,18 @@ class FixturesData():
             'posts:add_comment': [
                 [], HTTPStatus.FOUND,
                 None, '/posts/{post_id}/comment/'
+            ],
+            'posts:search': [
+                [], HTTPStatus.OK,
+                'posts/search.html', '/search/'
+            ],
+            'posts:popular': [
+                [], HTTPStatus.OK,
+                'posts/popular.html', '/popular/'
+            ],
+            'posts:group_index': [
+                [], HTTPStatus.OK,
+                'posts/group_index.html', '/groups/'
             ]
         }
         self.URLS_AUTHORIZED = {
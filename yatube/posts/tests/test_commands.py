@@ -0,0 +1,273 @@
+import csv
+import gzip
+import json
+import os
+import shutil
+import tempfile
+from datetime import timedelta
+from io import StringIO
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.core.management import CommandError, call_command
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+from ..models import (
+    Comment, FeedItem, Follow, Group, Post, Profile, TrendingPost, User
+)
+from ..search import get_backend
+from .fixtures import FixturesData as FD
+
+TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
+
+
+class CommandsTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+
+        cls.author = User.objects.create_user(
+            username=FD.AUTHOR_USERNAME_1)
+        cls.user = User.objects.create_user(
+            username=FD.USER_USERNAME)
+        cls.group = Group.objects.create(
+            title=FD.TEST_GROUP_TITLE_1,
+            slug=FD.TEST_GROUP_SLUG_1,
+            description=FD.TEST_GROUP_DESCRIPTION_1
+        )
+        Follow.objects.create(user=cls.user, author=cls.author)
+        for i in range(FD.POST_NUM):
+            cls.post = Post.objects.create(
+                author=cls.author,
+                text=FD.POST_TEXT + str(i),
+                group=cls.group
+            )
+        Comment.objects.create(
+            post=cls.post,
+            author=cls.user,
+            text=FD.TEST_POST_TEXT_1
+        )
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def test_explain_feeds(self):
+        """Запросы лент используют индексы, без временных сортировок."""
+        out = StringIO()
+        call_command('explain_feeds', '--strict', stdout=out)
+        self.assertIn('post_pub_date_id', out.getvalue())
+        self.assertIn('feed_item_user_pub_date_post', out.getvalue())
+
+    def test_recount(self):
+        """recount чинит разошедшиеся счётчики."""
+        Profile.objects.filter(user=self.author).update(
+            posts_count=0, followers_count=5)
+        Profile.objects.filter(user=self.user).delete()
+        Post.objects.filter(pk=self.post.pk).update(comments_count=0)
+        call_command('recount', stdout=StringIO())
+
+        author_profile = Profile.objects.get(user=self.author)
+        self.assertEqual(author_profile.posts_count, FD.POST_NUM)
+        self.assertEqual(author_profile.followers_count, 1)
+        self.assertEqual(
+            Profile.objects.get(user=self.user).following_count, 1)
+        self.assertEqual(
+            Post.objects.get(pk=self.post.pk).comments_count, 1)
+
+    def test_rank_posts(self):
+        """
+        rank_posts: обсуждаемые посты выше, старые - только со свежими
+        комментариями, в рейтинге не больше TRENDING_SIZE постов.
+        """
+        old = Post.objects.create(author=self.user, text=FD.POST_TEXT)
+        forgotten = Post.objects.create(author=self.user, text=FD.POST_TEXT)
+        Post.objects.filter(pk__in=(old.pk, forgotten.pk)).update(
+            pub_date=timezone.now() - timedelta(days=30))
+        Comment.objects.create(
+            post=old, author=self.author, text=FD.TEST_POST_TEXT_1)
+
+        out = StringIO()
+        call_command('rank_posts', stdout=out)
+        self.assertIn(f'рейтинге: {FD.POST_NUM + 1}', out.getvalue())
+        ranked = list(TrendingPost.objects.values_list('post', flat=True))
+        self.assertEqual(ranked[0], self.post.pk)
+        self.assertIn(old.pk, ranked)
+        self.assertNotIn(forgotten.pk, ranked)
+
+        with override_settings(TRENDING_SIZE=2):
+            call_command('rank_posts', stdout=out)
+        self.assertEqual(
+            list(TrendingPost.objects.values_list('rank', flat=True)), [1, 2])
+
+    @override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT, THUMBNAIL_WORKERS=0)
+    def test_generate_thumbnails(self):
+        """generate_thumbnails дорезает миниатюры старых постов."""
+        image = default_storage.save(
+            'posts/small.gif', ContentFile(FD.TEST_IMAGE))
+        Post.objects.filter(pk=self.post.pk).update(image=image)
+        out = StringIO()
+        call_command('generate_thumbnails', stdout=out)
+        self.assertIn('1', out.getvalue())
+        self.assertTrue(Post.objects.get(pk=self.post.pk).thumbnail)
+
+    def write_import(self, name, content):
+        path = os.path.join(TEMP_MEDIA_ROOT, name)
+        with open(path, 'w', encoding='utf-8') as file:
+            file.write(content)
+        return path
+
+    def test_import_posts_jsonl(self):
+        """
+        Импорт JSONL: посты с комментариями, новые авторы и группы,
+        счётчики и ленты подписчиков; битые строки пропускаются.
+        """
+        records = [
+            {'author': self.author.username, 'group': self.group.slug,
+             'text': FD.TEST_POST_TEXT_2, 'pub_date': '2021-01-01T10:00:00',
+             'comments': [{'author': 'new-reader', 'text': 'comment'}]},
+            {'author': 'new-author', 'group': 'new-group',
+             'text': FD.TEST_POST_TEXT_2},
+            {'author': self.author.username},
+        ]
+        path = self.write_import('posts.jsonl', '\n'.join(
+            [json.dumps(record) for record in records] + ['{broken']
+        ))
+        # Каталог групп закэширован до импорта.
+        self.client.get(reverse('posts:group_index'))
+        out, err = StringIO(), StringIO()
+        call_command('import_posts', path, '--batch-size', '1',
+                     stdout=out, stderr=err)
+
+        self.assertIn('постов: 2', out.getvalue())
+        self.assertIn('пропущено строк: 2', out.getvalue())
+        self.assertIn('строка 4', err.getvalue())
+        post = Post.objects.get(
+            author=self.author, text=FD.TEST_POST_TEXT_2)
+        self.assertEqual(post.pub_date.year, 2021)
+        self.assertEqual(post.comments_count, 1)
+        self.assertEqual(post.comments.get().author.username, 'new-reader')
+        self.assertTrue(
+            FeedItem.objects.filter(user=self.user, post=post).exists())
+        self.assertEqual(
+            Profile.objects.get(user=self.author).posts_count,
+            FD.POST_NUM + 1
+        )
+        new_post = Post.objects.get(author__username='new-author')
+        self.assertEqual(new_post.group.slug, 'new-group')
+        self.assertEqual(new_post.author.profile.posts_count, 1)
+        self.assertEqual(
+            list(get_backend().search('new-group')), [new_post])
+        self.assertContains(
+            self.client.get(reverse('posts:group_index')), 'new-group')
+
+    def test_import_posts_bad_types(self):
+        """Поля не того типа, вложенные тоже, - пропущенная строка."""
+        author = self.author.username
+        records = [
+            {'author': author, 'text': 'x', 'comments': 'x'},
+            {'author': author, 'text': 'x', 'comments': ['x', 'y']},
+            {'author': author, 'text': 'x', 'comments': {'author': 'a'}},
+            {'author': author, 'text': 'x',
+             'comments': [{'author': ['a'], 'text': 'x'}]},
+            {'author': author, 'text': 'x',
+             'comments': [{'author': 'a', 'text': 'x', 'created': 1}]},
+            {'author': ['a'], 'text': 'x'},
+            {'author': {'a': 1}, 'text': 'x'},
+            {'author': author, 'text': 1},
+            {'author': author, 'text': 'x', 'group': ['g']},
+            {'author': author, 'text': 'x', 'pub_date': 20210101},
+            [author, 'x'],
+            {'author': author, 'text': FD.TEST_POST_TEXT_2},
+        ]
+        path = self.write_import('bad.jsonl', '\n'.join(
+            json.dumps(record) for record in records
+        ))
+        out = StringIO()
+        call_command('import_posts', path, stdout=out, stderr=StringIO())
+        self.assertIn('постов: 1', out.getvalue())
+        self.assertIn(
+            f'пропущено строк: {len(records) - 1}', out.getvalue())
+        self.assertEqual(
+            Post.objects.filter(text=FD.TEST_POST_TEXT_2).count(), 1)
+
+    def test_import_posts_write_lock(self):
+        """
+        Каждая пачка первым запросом берёт блокировку записи: id постов
+        читаются обратно по last_pk, и чужие вставки между чтением и
+        INSERT недопустимы.
+        """
+        path = self.write_import('lock.jsonl', '\n'.join(
+            json.dumps({'author': 'lock-author', 'text': str(number)})
+            for number in range(2)
+        ))
+        with CaptureQueriesContext(connection) as queries:
+            call_command('import_posts', path, '--batch-size', '1',
+                         stdout=StringIO(), stderr=StringIO())
+        statements = [query['sql'] for query in queries]
+        inserts = [
+            number for number, sql in enumerate(statements)
+            if sql.startswith('INSERT INTO "posts_post"')
+        ]
+        self.assertEqual(len(inserts), 2)
+        for number in inserts:
+            begin = max(
+                start for start, sql in enumerate(statements[:number])
+                if sql.startswith('SAVEPOINT')
+            )
+            self.assertTrue(
+                statements[begin + 1].startswith('UPDATE "posts_post"'))
+
+    def test_import_posts_csv(self):
+        """CSV без создания авторов: строки неизвестных пропускаются."""
+        path = self.write_import('posts.csv', (
+            'author,group,text,pub_date\n'
+            f'{self.author.username},,{FD.TEST_POST_TEXT_2},\n'
+            f'unknown,,{FD.TEST_POST_TEXT_2},\n'
+        ))
+        out = StringIO()
+        call_command('import_posts', path, '--no-create',
+                     stdout=out, stderr=StringIO())
+        self.assertIn('постов: 1', out.getvalue())
+        self.assertFalse(User.objects.filter(username='unknown').exists())
+        self.assertEqual(
+            Post.objects.filter(text=FD.TEST_POST_TEXT_2).count(), 1)
+
+    def test_export_data(self):
+        """
+        Выгрузка постов в JSONL.gz с фильтрами, читается import_posts;
+        комментарии - в CSV.
+        """
+        path = os.path.join(TEMP_MEDIA_ROOT, 'posts.jsonl.gz')
+        call_command('export_data', 'posts', path,
+                     '--author', self.author.username,
+                     '--group', self.group.slug,
+                     '--from', '2000-01-01', stdout=StringIO())
+        with gzip.open(path, 'rt', encoding='utf-8') as file:
+            rows = [json.loads(line) for line in file]
+        self.assertEqual(len(rows), FD.POST_NUM)
+        self.assertEqual(rows[-1]['id'], self.post.pk)
+        self.assertEqual(rows[-1]['group'], self.group.slug)
+        self.assertEqual(rows[-1]['comments_count'], 1)
+
+        call_command('export_data', 'posts', path, '--to', '2000-01-01',
+                     stdout=StringIO())
+        with gzip.open(path, 'rt', encoding='utf-8') as file:
+            self.assertEqual(file.read(), '')
+
+        path = os.path.join(TEMP_MEDIA_ROOT, 'comments.csv')
+        call_command('export_data', 'comments', path, stdout=StringIO())
+        with open(path, encoding='utf-8') as file:
+            rows = list(csv.DictReader(file))
+        self.assertEqual(rows[0]['post'], str(self.post.pk))
+        self.assertEqual(rows[0]['author'], self.user.username)
+
+        with self.assertRaises(CommandError):
+            call_command('export_data', 'follows', path,
+                         '--group', self.group.slug)
@@ -1,20 +1,48 @@
+import gzip
 import shutil
 import tempfile
+import warnings
+from datetime import timedelta
+from unittest import mock
 
 from django import forms
 from django.conf import settings
 from django.core.cache import cache
+from django.core.cache.backends.base import CacheKeyWarning
 from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.paginator import Paginator
+from django.db import connection, transaction
 from django.test import Client, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
+from django.utils import timezone
 
-from ..models import Group, Post, User
+from .. import thumbnails
+from ..caching import fragment_key
+from ..feeds import followed_authors
+from ..follows import follow, unfollow
+from ..models import Comment, FeedItem, Follow, Group, Post, User
+from ..paginators import CountPaginator
+from ..search import get_backend
+from ..templatetags.pagination import page_window
+from ..trending import rank_posts
 from .fixtures import FixturesData as FD
 
 POSTS_TO_SHOW = settings.POSTS_TO_SHOW
+COMMENTS_TO_SHOW = settings.COMMENTS_TO_SHOW
 TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
 
 
+def run_on_commit():
+    """
+    TestCase не коммитит транзакцию - колбэки on_commit (правка кэша
+    подписок) выполняются вручную.
+    """
+    callbacks, connection.run_on_commit = connection.run_on_commit, []
+    for _, callback in callbacks:
+        callback()
+
+
 class ViewsTests(TestCase):
     @classmethod
     def setUpClass(cls):
@@ -85,6 +113,8 @@ class ViewsTests(TestCase):
     def test_cache_index(self):
         """
         Тест кэширования.
+        Изменение в обход сигналов не видно до сброса кэша,
+        удаление поста сбрасывает кэш сигналом.
         """
         post = Post.objects.create(
             author=self.author_1,
@@ -93,12 +123,128 @@ class ViewsTests(TestCase):
         )
         response = self.guest_client.get(reverse('posts:home_page'))
         self.assertIn(FD.TEST_POST_CACHE, response.content.decode())
-        post.delete()
+        Post.objects.filter(pk=post.pk).update(text=FD.TEST_POST_EDIT)
         response = self.guest_client.get(reverse('posts:home_page'))
         self.assertIn(FD.TEST_POST_CACHE, response.content.decode())
-        cache.clear()
+        post.delete()
         response = self.guest_client.get(reverse('posts:home_page'))
         self.assertNotIn(FD.TEST_POST_CACHE, response.content.decode())
+        self.assertNotIn(FD.TEST_POST_EDIT, response.content.decode())
+
+    def test_cache_invalidation(self):
+        """
+        Новый пост сбрасывает кэш группы, автора и ленты подписчика,
+        смена группы - кэш старой группы.
+        """
+        self.authorized_client.get(
+            reverse('posts:profile_follow', args=(self.author_1.username,))
+        )
+        urls = (
+            (self.guest_client, reverse(
+                'posts:group_list', args=(FD.TEST_GROUP_SLUG_1,))),
+            (self.guest_client, reverse(
+                'posts:profile', args=(FD.AUTHOR_USERNAME_1,))),
+            (self.authorized_client, reverse('posts:follow_index')),
+        )
+        for client, url in urls:
+            client.get(url)
+        post = Post.objects.create(
+            author=self.author_1,
+            text=FD.TEST_POST_CACHE,
+            group=self.group_1
+        )
+        for client, url in urls:
+            with self.subTest(url=url):
+                response = client.get(url)
+                self.assertIn(post, response.context['page_obj'])
+
+        post.group = self.group_2
+        post.save()
+        response = self.guest_client.get(reverse(
+            'posts:group_list', args=(FD.TEST_GROUP_SLUG_1,)))
+        self.assertNotIn(post, response.context['page_obj'])
+
+    # Без общего кэша страниц - проверяется слой фрагментов под ним.
+    @override_settings(PAGE_CACHE_TIMEOUT=0)
+    def test_post_fragment_cache(self):
+        """
+        Посты страницы выводятся из кэша фрагментов,
+        после редактирования пост рендерится заново.
+        """
+        post = Post.objects.create(
+            author=self.author_1,
+            text=FD.TEST_POST_CACHE,
+        )
+        self.guest_client.get(reverse('posts:home_page'))
+        key = fragment_key('posts:home_page', post)
+        self.assertIn(FD.TEST_POST_CACHE, cache.get(key))
+        cache.set(key, FD.TEST_POST_EDIT)
+        response = self.guest_client.get(reverse('posts:home_page'))
+        self.assertIn(FD.TEST_POST_EDIT, response.content.decode())
+
+        post.text = FD.TEST_POST_TEXT_2
+        post.save()
+        response = self.guest_client.get(reverse('posts:home_page'))
+        self.assertNotIn(FD.TEST_POST_EDIT, response.content.decode())
+        self.assertIn(
+            FD.TEST_POST_TEXT_2,
+            cache.get(fragment_key('posts:home_page', post))
+        )
+
+    def test_post_fragment_names(self):
+        """
+        Фрагменты постов перерисовываются после смены slug группы,
+        её удаления и смены имени автора - Post.updated при этом
+        не меняется.
+        """
+        group = Group.objects.create(
+            title=FD.TEST_GROUP_TITLE_1,
+            slug='old-slug',
+            description=FD.TEST_GROUP_DESCRIPTION_1
+        )
+        Post.objects.create(
+            author=self.author_1, text=FD.TEST_POST_CACHE, group=group)
+        url = reverse('posts:home_page')
+        self.assertContains(self.guest_client.get(url), '/group/old-slug/')
+
+        group.slug = 'new-slug'
+        group.save()
+        response = self.guest_client.get(url)
+        self.assertNotContains(response, '/group/old-slug/')
+        self.assertContains(response, '/group/new-slug/')
+
+        group.delete()
+        self.assertNotContains(self.guest_client.get(url), '/group/new-slug/')
+
+        self.author_1.username = 'renamed-author'
+        self.author_1.save()
+        self.assertContains(
+            self.guest_client.get(url), '/profile/renamed-author/')
+
+    @override_settings(PAGE_CACHE_TIMEOUT=0)
+    def test_page_cache_post_ids(self):
+        """
+        В кэше страницы - id постов, а не сами посты: тёплая страница
+        собирается из фрагментов без запросов к постам, посты без
+        фрагментов догружаются одним запросом.
+        """
+        url = reverse('posts:home_page')
+        self.guest_client.get(url)
+        with CaptureQueriesContext(connection) as queries:
+            response = self.guest_client.get(url)
+        self.assertFalse(
+            [query for query in queries if 'posts_post' in query['sql']])
+
+        posts = response.context['page_obj'].object_list[:2]
+        cache.delete_many(
+            [fragment_key('posts:home_page', post) for post in posts])
+        with CaptureQueriesContext(connection) as queries:
+            response = self.guest_client.get(url)
+        self.assertEqual(
+            len([query for query in queries
+                 if 'posts_post' in query['sql']]), 1)
+        for post in Post.objects.filter(pk__in=[post.pk for post in posts]):
+            self.assertContains(response, post.text)
 
     def test_post_present(self):
         """
@@ -214,6 +360,66 @@ class ViewsTests(TestCase):
         self.assertIn(self.post_1, response_follow.context['page_obj'])
         self.assertNotIn(self.post_1, response_nofollow.context['page_obj'])
 
+    def test_counters(self):
+        """
+        Счётчики постов, подписок и комментариев меняются
+        вместе с данными, профиль и пост читают их без COUNT.
+        """
+        self.authorized_client.get(
+            reverse('posts:profile_follow', args=(self.author_1.username,))
+        )
+        self.authorized_client.post(
+            reverse('posts:add_comment', args=(self.post_1.pk,)),
+            {'text': FD.TEST_POST_TEXT_2}
+        )
+        self.author_1.profile.refresh_from_db()
+        self.assertEqual(self.author_1.profile.followers_count, 1)
+        self.assertEqual(self.author_1.profile.posts_count, 1)
+        self.user.profile.refresh_from_db()
+        self.assertEqual(self.user.profile.following_count, 1)
+        response = self.guest_client.get(
+            reverse('posts:post_detail', args=(self.post_1.pk,)))
+        self.assertEqual(response.context['post'].comments_count, 1)
+
+        self.authorized_client.get(
+            reverse('posts:profile_unfollow', args=(self.author_1.username,))
+        )
+        self.author_1.profile.refresh_from_db()
+        self.assertEqual(self.author_1.profile.followers_count, 0)
+        response = self.guest_client.get(
+            reverse('posts:profile', args=(self.author_1.username,)))
+        self.assertEqual(response.context['posts_count'], 1)
+
+    def test_comments_page(self):
+        """
+        Комментарии выводятся порциями с авторами одним запросом,
+        новый комментарий сбрасывает кэш порций.
+        """
+        for i in range(COMMENTS_TO_SHOW + 1):
+            Comment.objects.create(
+                post=self.post_3,
+                author=self.user,
+                text=FD.POST_TEXT + str(i)
+            )
+        url = reverse('posts:post_detail', args=(self.post_3.pk,))
+        # ETag, пост, порция комментариев.
+        with self.assertNumQueries(3):
+            response = self.guest_client.get(url)
+        comments = response.context['comments']
+        self.assertEqual(len(comments), COMMENTS_TO_SHOW)
+        self.assertTrue(comments.has_next())
+        response = self.guest_client.get(
+            url, {'cursor': comments.next_cursor})
+        self.assertEqual(len(response.context['comments']), 1)
+
+        self.authorized_client.post(
+            reverse('posts:add_comment', args=(self.post_3.pk,)),
+            {'text': FD.TEST_POST_EDIT}
+        )
+        response = self.guest_client.get(url)
+        self.assertEqual(
+            response.context['comments'][0].text, FD.TEST_POST_EDIT)
+
     def test_follows(self):
         """Тест что юзер подписался и отписался от автора"""
         self.assertFalse(
@@ -234,6 +440,139 @@ class ViewsTests(TestCase):
             self.author_1.following.filter(user=self.user).exists()
         )
 
+    def check_follows_idempotent(self):
+        cases = (
+            ('posts:profile_follow', self.user.username),
+            ('posts:profile_follow', FD.USER_USERNAME_1 + '-missing'),
+            ('posts:profile_follow', self.author_1.username),
+            ('posts:profile_follow', self.author_1.username),
+        )
+        for name, username in cases:
+            with self.subTest(name=name, username=username):
+                response = self.authorized_client.get(
+                    reverse(name, args=(username,)))
+                self.assertRedirects(
+                    response, reverse('posts:profile', args=(username,)),
+                    fetch_redirect_response=False
+                )
+        self.assertEqual(
+            list(Follow.objects.filter(user=self.user).values_list(
+                'author_id', flat=True)),
+            [self.author_1.pk]
+        )
+        self.user.profile.refresh_from_db()
+        self.assertEqual(self.user.profile.following_count, 1)
+
+        for _ in range(2):
+            self.authorized_client.get(reverse(
+                'posts:profile_unfollow', args=(self.author_1.username,)))
+        self.author_1.profile.refresh_from_db()
+        self.assertEqual(self.author_1.profile.followers_count, 0)
+        self.assertFalse(Follow.objects.filter(user=self.user).exists())
+
+    def test_follows_idempotent(self):
+        """
+        Повторные подписка и отписка, подписка на себя и на
+        несуществующего автора не дают ошибок и не трогают счётчики.
+        """
+        self.check_follows_idempotent()
+
+    @mock.patch('posts.follows.returning', return_value=False)
+    def test_follows_idempotent_without_returning(self, returning):
+        """То же на SQLite старше 3.35: без RETURNING, через ORM."""
+        self.check_follows_idempotent()
+        self.assertTrue(returning.called)
+
+
+class FollowFeedViewsTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(
+            username=FD.AUTHOR_USERNAME_1)
+        cls.user = User.objects.create_user(
+            username=FD.USER_USERNAME)
+        cls.old_post = Post.objects.create(
+            author=cls.author,
+            text=FD.TEST_POST_TEXT_1,
+        )
+
+    def setUp(self):
+        cache.clear()
+        self.authorized_client = Client()
+        self.authorized_client.force_login(self.user)
+
+    def follow(self):
+        self.authorized_client.get(
+            reverse('posts:profile_follow', args=(self.author.username,))
+        )
+
+    def test_fan_out_on_write(self):
+        """
+        Подписка переносит старые посты в ленту, новый пост
+        рассылается подписчику, отписка чистит ленту.
+        """
+        self.follow()
+        self.assertTrue(FeedItem.objects.filter(
+            user=self.user, post=self.old_post).exists())
+        post = Post.objects.create(
+            author=self.author,
+            text=FD.TEST_POST_TEXT_2,
+        )
+        self.assertTrue(
+            FeedItem.objects.filter(user=self.user, post=post).exists())
+        response = self.authorized_client.get(reverse('posts:follow_index'))
+        self.assertEqual(
+            list(response.context['page_obj']), [post, self.old_post])
+
+        self.authorized_client.get(
+            reverse('posts:profile_unfollow', args=(self.author.username,))
+        )
+        self.assertFalse(FeedItem.objects.filter(user=self.user).exists())
+
+    @override_settings(FEED_FANOUT_LIMIT=0)
+    def test_fan_out_on_read(self):
+        """Посты «знаменитости» не рассылаются, а читаются лентой."""
+        self.follow()
+        self.authorized_client.get(reverse('posts:follow_index'))
+        post = Post.objects.create(
+            author=self.author,
+            text=FD.TEST_POST_TEXT_2,
+        )
+        self.assertFalse(FeedItem.objects.exists())
+        response = self.authorized_client.get(reverse('posts:follow_index'))
+        self.assertEqual(
+            list(response.context['page_obj']), [post, self.old_post])
+
+    @override_settings(FEED_FANOUT_LIMIT=1)
+    def test_fanout_limit_crossed(self):
+        """
+        Автор, ставший «знаменитостью», читается лентой напрямую сразу,
+        несмотря на кэш; переставший - дописывается в ленты
+        подписчиков постами, которые не рассылал.
+        """
+        other = User.objects.create_user(username=FD.AUTHOR_USERNAME_2)
+        self.follow()
+        url = reverse('posts:follow_index')
+        self.authorized_client.get(url)
+        follow(other.pk, [self.author.username])
+        post = Post.objects.create(
+            author=self.author,
+            text=FD.TEST_POST_TEXT_2,
+        )
+        self.assertFalse(FeedItem.objects.filter(post=post).exists())
+        response = self.authorized_client.get(url)
+        self.assertEqual(
+            list(response.context['page_obj']), [post, self.old_post])
+
+        unfollow(other.pk, [self.author.username])
+        self.assertTrue(
+            FeedItem.objects.filter(user=self.user, post=post).exists())
+        self.assertFalse(FeedItem.objects.filter(user=other).exists())
+        response = self.authorized_client.get(url)
+        self.assertEqual(
+            list(response.context['page_obj']), [post, self.old_post])
+
 
 class TemplateViewsTest(TestCase):
     @classmethod
@@ -344,13 +683,111 @@ class PaginatorViewsTest(TestCase):
                     url, args=FD.URLS_PAGINATOR[url]))
                 self.assertEqual(len(response.context['page_obj']),
                                  POSTS_TO_SHOW)
+                next_cursor = response.context['page_obj'].next_cursor
                 response = self.client.get(reverse(
-                    url, args=FD.URLS_PAGINATOR[url]) + '?page=2')
+                    url, args=FD.URLS_PAGINATOR[url]),
+                    {'cursor': next_cursor})
                 self.assertEqual(len(response.context['page_obj']),
                                  FD.POST_NUM - POSTS_TO_SHOW)
+                self.assertFalse(response.context['page_obj'].has_next())
+
+    def test_paginator_cursor_navigation(self):
+        """
+        Курсор назад возвращает ту же первую страницу,
+        курсор последней страницы - самые старые посты.
+        """
+        url = reverse('posts:home_page')
+        first_page = self.client.get(url).context['page_obj']
+        second_page = self.client.get(
+            url, {'cursor': first_page.next_cursor}
+        ).context['page_obj']
+        self.assertTrue(second_page.has_previous())
+        previous_page = self.client.get(
+            url, {'cursor': second_page.previous_cursor}
+        ).context['page_obj']
+        self.assertEqual(
+            list(previous_page.object_list), list(first_page.object_list)
+        )
+        self.assertFalse(previous_page.has_previous())
+        last_page = self.client.get(
+            url, {'cursor': first_page.last_cursor}
+        ).context['page_obj']
+        self.assertEqual(last_page[len(last_page) - 1], second_page[2])
+        self.assertFalse(last_page.has_next())
+
+    def test_paginator_bad_cursor(self):
+        """Битый курсор отдаёт первую страницу."""
+        response = self.client.get(
+            reverse('posts:home_page'), {'cursor': '%%%'}
+        )
+        self.assertEqual(len(response.context['page_obj']), POSTS_TO_SHOW)
+        self.assertFalse(response.context['page_obj'].has_previous())
+
+    def test_paginator_cursor_cache_key(self):
+        """
+        Курсор и номер страницы попадают в ключ кэша md5: ключ
+        годится для memcached при любом значении параметра.
+        """
+        self.client.force_login(self.author)
+        urls = [
+            reverse(url, args=args)
+            for url, args in FD.URLS_PAGINATOR.items()
+        ] + [
+            reverse('posts:post_detail', args=(self.post_1.pk,)),
+            reverse('posts:follow_index'),
+            reverse('posts:popular'),
+            reverse('posts:search') + '?q=post',
+        ]
+        bad = 'bad cursor ' + 'x' * 300
+        with warnings.catch_warnings():
+            warnings.simplefilter('error', CacheKeyWarning)
+            for url in urls:
+                with self.subTest(url=url):
+                    response = self.client.get(
+                        url, {'cursor': bad, 'page': bad}
+                    )
+                    self.assertEqual(response.status_code, 200)
+
+    def test_paginator_query_count(self):
+        """Страница выбирается одним запросом, без COUNT и OFFSET."""
+        first_page = self.client.get(
+            reverse('posts:home_page')).context['page_obj']
+        cache.clear()
+        with self.assertNumQueries(1):
+            self.client.get(
+                reverse('posts:home_page'),
+                {'cursor': first_page.next_cursor}
+            )
+
+    def test_page_window(self):
+        """
+        Окно номеров страниц; в приблизительном режиме оно кончается
+        следующей страницей, число постов кэшируется по ключу.
+        """
+        cases = (
+            (Paginator(range(100), 10), 1, [1, 2, 3, None, 10]),
+            (Paginator(range(100), 10), 5, [1, None, 3, 4, 5, 6, 7, None, 10]),
+            (Paginator(range(100), 10), 9, [1, None, 7, 8, 9, 10]),
+            (CountPaginator(range(100), 10), 5, [1, None, 3, 4, 5, 6]),
+            (CountPaginator(range(100), 10), 10, [1, None, 8, 9, 10]),
+        )
+        for paginator, number, numbers in cases:
+            with self.subTest(paginator=paginator, number=number):
+                self.assertEqual(
+                    page_window(paginator.get_page(number)), numbers)
+
+        self.assertEqual(
+            CountPaginator(Post.objects.all(), 10, 'count-test').count,
+            FD.POST_NUM
+        )
+        with self.assertNumQueries(0):
+            self.assertEqual(
+                CountPaginator(Post.objects.all(), 10, 'count-test').count,
+                FD.POST_NUM
+            )
 
 
-@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT)
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT, THUMBNAIL_WORKERS=0)
 class ImageViewsTest(TestCase):
     @classmethod
     def setUpClass(cls):
@@ -433,3 +870,592 @@ class ImageViewsTest(TestCase):
             response.context['post'].image,
             self.post.image,
         )
+
+    def test_thumbnail_precomputed(self):
+        """
+        Миниатюра нарезается при сохранении поста, страницы только
+        выводят её адрес.
+        """
+        post = Post.objects.get(pk=self.post_id)
+        self.assertTrue(post.thumbnail.startswith(settings.MEDIA_URL))
+        # ETag, пост с автором и группой, комментарии - без обращений
+        # к хранилищу миниатюр sorl.
+        with self.assertNumQueries(3):
+            response = self.guest_client.get(
+                reverse('posts:post_detail', args=(self.post_id,))
+            )
+        self.assertContains(response, f'src="{post.thumbnail}"')
+        response = self.guest_client.get(reverse('posts:home_page'))
+        self.assertContains(response, f'src="{post.thumbnail}"')
+
+    def test_thumbnail_reset(self):
+        """Новая картинка получает свою миниатюру, без картинки - нет."""
+        post = Post.objects.get(pk=self.post_id)
+        old_thumbnail = post.thumbnail
+        post.image = SimpleUploadedFile(
+            name='other.gif',
+            content=FD.TEST_IMAGE,
+            content_type='image/gif'
+        )
+        post.save()
+        post.refresh_from_db()
+        self.assertTrue(post.thumbnail)
+        self.assertNotEqual(post.thumbnail, old_thumbnail)
+
+        post.image = ''
+        post.save()
+        post.refresh_from_db()
+        self.assertEqual(post.thumbnail, '')
+
+    @override_settings(THUMBNAIL_WORKERS=1)
+    def test_thumbnail_pool(self):
+        """
+        Поток пула закрывает свои соединения после задачи, пул
+        останавливается shutdown_executor и создаётся заново.
+        """
+        executor = thumbnails.get_executor()
+        with mock.patch.object(
+            thumbnails, 'generate_thumbnail', return_value='thumbnail'
+        ), mock.patch.object(thumbnails, 'connections') as connections:
+            result = executor.submit(
+                thumbnails.run_in_worker, self.post_id, 'image').result()
+        self.assertEqual(result, 'thumbnail')
+        connections.close_all.assert_called_once_with()
+        thumbnails.shutdown_executor()
+        with self.assertRaises(RuntimeError):
+            executor.submit(print)
+        self.assertIsNot(thumbnails.get_executor(), executor)
+        thumbnails.shutdown_executor()
+
+
+class ExportAdminTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.admin = User.objects.create_superuser(
+            username=FD.USER_USERNAME, email='', password=FD.USER_USERNAME)
+        cls.posts = [
+            Post.objects.create(author=cls.admin, text=FD.POST_TEXT + str(i))
+            for i in range(3)
+        ]
+
+    def test_export_action(self):
+        """Действие админки отдаёт выбранные посты потоком в CSV.gz."""
+        client = Client()
+        client.force_login(self.admin)
+        response = client.post(reverse('admin:posts_post_changelist'), {
+            'action': 'export_csv',
+            '_selected_action': [post.pk for post in self.posts[:2]],
+        })
+        self.assertTrue(response.streaming)
+        self.assertEqual(
+            response['Content-Disposition'],
+            'attachment; filename="posts.csv.gz"'
+        )
+        lines = gzip.decompress(
+            b''.join(response.streaming_content)
+        ).decode().splitlines()
+        self.assertEqual(lines[0].split(',')[:3], ['id', 'author', 'group'])
+        self.assertEqual(
+            [line.split(',')[0] for line in lines[1:]],
+            [str(post.pk) for post in self.posts[:2]]
+        )
+
+
+class SearchViewsTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username=FD.AUTHOR_USERNAME_1)
+        cls.group = Group.objects.create(
+            title='Котики',
+            slug=FD.TEST_GROUP_SLUG_1,
+            description=FD.TEST_GROUP_DESCRIPTION_1
+        )
+        cls.once = Post.objects.create(
+            author=cls.author, text='Пишу про кота и собак')
+        cls.twice = Post.objects.create(
+            author=cls.author, text='Кот, кот и ещё раз кот')
+        cls.in_group = Post.objects.create(
+            author=cls.author, group=cls.group, text='Без зверей')
+        cls.other = Post.objects.create(
+            author=cls.author, text='Совсем другое')
+
+    def setUp(self):
+        cache.clear()
+        self.client = Client()
+
+    def search(self, query, **params):
+        return self.client.get(
+            reverse('posts:search'), {'q': query, **params})
+
+    def test_search_ranking(self):
+        """Подходящие посты по релевантности, слова - префиксами."""
+        response = self.search('кот')
+        self.assertEqual(
+            list(response.context['page_obj']),
+            [self.twice, self.once, self.in_group]
+        )
+        self.assertEqual(
+            list(self.search('КОТИ').context['page_obj']), [self.in_group])
+        self.assertEqual(
+            list(self.search('кот собак').context['page_obj']), [self.once])
+        self.assertIsNone(self.search('  ').context['page_obj'])
+        self.assertFalse(self.search('"*)').context['page_obj'])
+
+    def test_search_pagination(self):
+        """
+        Страницы результатов без подсчёта совпадений: известно только,
+        есть ли следующая; номер за концом - последняя страница.
+        """
+        Post.objects.bulk_create(
+            Post(author=self.author, text=f'слон {number}')
+            for number in range(POSTS_TO_SHOW + 2)
+        )
+        get_backend().rebuild()
+        page_obj = self.search('слон').context['page_obj']
+        self.assertTrue(page_obj.paginator.approximate)
+        self.assertTrue(page_obj.has_next())
+        self.assertEqual(len(page_obj), POSTS_TO_SHOW)
+        for page in (2, 5):
+            with self.subTest(page=page):
+                page_obj = self.search(
+                    'слон', page=page).context['page_obj']
+                self.assertEqual(page_obj.number, 2)
+                self.assertEqual(len(page_obj), 2)
+                self.assertEqual(
+                    page_obj.paginator.count, POSTS_TO_SHOW + 2)
+
+    def test_search_index_sync(self):
+        """Правка, удаление поста и переименование группы видны в поиске."""
+        other = Post.objects.get(pk=self.other.pk)
+        other.text = 'Теперь про кота'
+        other.save()
+        self.assertIn(other, self.search('кот').context['page_obj'])
+        Post.objects.get(pk=self.twice.pk).delete()
+        self.assertNotIn(self.twice, self.search('кот').context['page_obj'])
+        group = Group.objects.get(pk=self.group.pk)
+        group.title = 'Попугаи'
+        group.save()
+        self.assertFalse(self.search('котики').context['page_obj'])
+        self.assertEqual(
+            list(self.search('попугаи').context['page_obj']),
+            [self.in_group]
+        )
+
+    def test_admin_search(self):
+        """Поиск в админке идёт через тот же индекс."""
+        admin = User.objects.create_superuser(
+            username=FD.USER_USERNAME, email='', password=FD.USER_USERNAME)
+        self.client.force_login(admin)
+        response = self.client.get(
+            reverse('admin:posts_post_changelist'), {'q': 'собак'})
+        self.assertEqual(
+            list(response.context['cl'].result_list), [self.once])
+
+
+class PopularViewsTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username=FD.AUTHOR_USERNAME_1)
+        cls.posts = Post.objects.bulk_create(
+            Post(author=cls.author, text=f'{FD.POST_TEXT} {number}')
+            for number in range(POSTS_TO_SHOW + 3)
+        )
+        for post in Post.objects.all()[:2]:
+            Comment.objects.create(
+                post=post, author=cls.author, text=FD.TEST_POST_TEXT_1)
+
+    def setUp(self):
+        cache.clear()
+        self.client = Client()
+
+    def test_popular(self):
+        """Лента читает рейтинг страницами по rank."""
+        response = self.client.get(reverse('posts:popular'))
+        self.assertFalse(response.context['page_obj'])
+        rank_posts()
+        commented = set(Post.objects.filter(comments_count=1))
+
+        page_obj = self.client.get(
+            reverse('posts:popular')).context['page_obj']
+        self.assertEqual(page_obj.paginator.num_pages, 2)
+        self.assertEqual(set(page_obj[:2]), commented)
+        self.assertEqual(len(page_obj), POSTS_TO_SHOW)
+        # Только страница рейтинга: число постов уже в кэше.
+        with self.assertNumQueries(1):
+            page_obj = self.client.get(
+                reverse('posts:popular'), {'page': 2}).context['page_obj']
+        self.assertEqual(len(page_obj), 3)
+
+    def test_popular_cache(self):
+        """Новый рейтинг сбрасывает закэшированные страницы."""
+        rank_posts()
+        self.client.get(reverse('posts:popular'))
+        post = Post.objects.create(author=self.author, text=FD.POST_TEXT)
+        Comment.objects.create(
+            post=post, author=self.author, text=FD.TEST_POST_TEXT_1)
+        Comment.objects.create(
+            post=post, author=self.author, text=FD.TEST_POST_TEXT_2)
+        rank_posts()
+        page_obj = self.client.get(
+            reverse('posts:popular')).context['page_obj']
+        self.assertEqual(page_obj[0], post)
+
+
+class ConditionalViewsTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username=FD.AUTHOR_USERNAME_1)
+        cls.user = User.objects.create_user(username=FD.USER_USERNAME)
+        cls.group = Group.objects.create(
+            title=FD.TEST_GROUP_TITLE_1,
+            slug=FD.TEST_GROUP_SLUG_1,
+            description=FD.TEST_GROUP_DESCRIPTION_1
+        )
+        cls.post = Post.objects.create(
+            author=cls.author, group=cls.group, text=FD.POST_TEXT)
+
+    def setUp(self):
+        cache.clear()
+        self.guest_client = Client()
+        self.authorized_client = Client()
+        self.authorized_client.force_login(self.user)
+
+    def revalidate(self, client, url, response):
+        return client.get(
+            url,
+            HTTP_IF_NONE_MATCH=response['ETag'],
+            HTTP_IF_MODIFIED_SINCE=response.get('Last-Modified', '')
+        )
+
+    def test_not_modified(self):
+        """Неизменившиеся страницы отвечают 304 без рендера."""
+        urls = (
+            reverse('posts:home_page'),
+            reverse('posts:group_list', args=(self.group.slug,)),
+            reverse('posts:profile', args=(self.author.username,)),
+            reverse('posts:post_detail', args=(self.post.pk,)),
+        )
+        for url in urls:
+            with self.subTest(url=url):
+                response = self.guest_client.get(url)
+                self.assertIn('Last-Modified', response)
+                response = self.revalidate(self.guest_client, url, response)
+                self.assertEqual(response.status_code, 304)
+                self.assertFalse(response.content)
+        response = self.guest_client.get(urls[0])
+        with self.assertNumQueries(0):
+            self.assertEqual(self.revalidate(
+                self.guest_client, urls[0], response).status_code, 304)
+        response = self.guest_client.get(
+            urls[0], HTTP_IF_MODIFIED_SINCE=response['Last-Modified'])
+        self.assertEqual(response.status_code, 304)
+
+    def test_modified(self):
+        """Изменения постов, комментариев и подписок меняют ETag."""
+        changes = (
+            (reverse('posts:home_page'), lambda: Post.objects.create(
+                author=self.user, text=FD.POST_TEXT)),
+            (reverse('posts:group_list', args=(self.group.slug,)),
+             lambda: Group.objects.filter(pk=self.group.pk).first().save()),
+            (reverse('posts:profile', args=(self.author.username,)),
+             lambda: Follow.objects.create(
+                 user=self.user, author=self.author)),
+            (reverse('posts:post_detail', args=(self.post.pk,)),
+             lambda: Comment.objects.create(
+                 post=self.post, author=self.user, text=FD.POST_TEXT)),
+        )
+        for url, change in changes:
+            with self.subTest(url=url):
+                response = self.guest_client.get(url)
+                change()
+                response = self.revalidate(self.guest_client, url, response)
+                self.assertEqual(response.status_code, 200)
+
+    def test_authorized_etag(self):
+        """
+        Страница вошедшего пользователя - свой ETag и без
+        Last-Modified; его подписки тоже меняют ETag.
+        """
+        other = User.objects.create_user(username=FD.AUTHOR_USERNAME_2)
+        url = reverse('posts:profile', args=(self.user.username,))
+        guest = self.guest_client.get(url)
+        response = self.authorized_client.get(url)
+        self.assertNotEqual(response['ETag'], guest['ETag'])
+        self.assertNotIn('Last-Modified', response)
+        Follow.objects.create(user=self.author, author=other)
+        self.assertEqual(
+            self.revalidate(self.authorized_client, url, response)
+            .status_code, 304
+        )
+        Follow.objects.create(user=self.user, author=other).delete()
+        self.assertEqual(
+            self.revalidate(self.authorized_client, url, response)
+            .status_code, 200
+        )
+
+
+class PageCacheViewsTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username=FD.AUTHOR_USERNAME_1)
+        cls.user = User.objects.create_user(username=FD.USER_USERNAME)
+        cls.post = Post.objects.create(author=cls.author, text=FD.POST_TEXT)
+
+    def setUp(self):
+        cache.clear()
+        self.guest_client = Client()
+        self.authorized_client = Client()
+        self.authorized_client.force_login(self.user)
+        self.author_client = Client()
+        self.author_client.force_login(self.author)
+
+    def test_anonymous_page_cache(self):
+        """Аноним получает страницу из кэша без запросов и рендера."""
+        url = reverse('posts:home_page')
+        first = self.guest_client.get(url)
+        with self.assertNumQueries(0):
+            response = self.guest_client.get(url)
+        self.assertIsNone(response.context)
+        self.assertEqual(response.content, first.content)
+        self.assertNotIn(b'<!--hole:', response.content)
+
+        Post.objects.create(author=self.author, text=FD.TEST_POST_EDIT)
+        self.assertContains(self.guest_client.get(url), FD.TEST_POST_EDIT)
+
+    def test_holes(self):
+        """
+        Вошедшие пользователи получают ту же страницу из кэша со своими
+        шапкой, кнопкой подписки, формой комментария и ссылкой правки.
+        """
+        profile_url = reverse('posts:profile', args=(self.author.username,))
+        self.authorized_client.get(profile_url)
+        response = self.guest_client.get(profile_url)
+        self.assertContains(response, 'Войти')
+        self.assertNotContains(response, 'Подписаться')
+
+        Follow.objects.create(user=self.user, author=self.author)
+        run_on_commit()
+        self.guest_client.get(profile_url)
+        response = self.authorized_client.get(profile_url)
+        self.assertTemplateNotUsed(response, 'posts/profile.html')
+        self.assertContains(response, f'Пользователь: {self.user.username}')
+        self.assertContains(response, 'Отписаться')
+        self.assertNotContains(
+            self.author_client.get(profile_url), 'Подписаться')
+
+        post_url = reverse('posts:post_detail', args=(self.post.pk,))
+        self.guest_client.get(post_url)
+        response = self.authorized_client.get(post_url)
+        self.assertTemplateNotUsed(response, 'posts/post_detail.html')
+        self.assertContains(response, 'csrfmiddlewaretoken')
+        self.assertNotContains(response, 'Редактировать')
+        self.assertContains(self.author_client.get(post_url), 'Редактировать')
+        self.assertNotContains(
+            self.guest_client.get(post_url), 'csrfmiddlewaretoken')
+
+    def test_deleted_group(self):
+        """
+        Удалённой группы нет ни в кэше страниц, ни в ответе 304;
+        страницы со ссылками на неё сбрасываются.
+        """
+        group = Group.objects.create(
+            title=FD.TEST_GROUP_TITLE_1,
+            slug=FD.TEST_GROUP_SLUG_1,
+            description=FD.TEST_GROUP_DESCRIPTION_1
+        )
+        Post.objects.create(author=self.author, text=FD.POST_TEXT, group=group)
+        url = reverse('posts:group_list', args=(group.slug,))
+        pages = [
+            reverse('posts:home_page'),
+            reverse('posts:profile', args=(self.author.username,)),
+        ]
+        etag = self.guest_client.get(url)['ETag']
+        modified = {page: self.guest_client.get(page)['ETag']
+                    for page in pages}
+
+        group.delete()
+        self.assertEqual(self.guest_client.get(url).status_code, 404)
+        self.assertEqual(
+            self.guest_client.get(url, HTTP_IF_NONE_MATCH=etag).status_code,
+            404
+        )
+        for page in pages:
+            with self.subTest(page=page):
+                self.assertNotEqual(
+                    self.guest_client.get(page)['ETag'], modified[page])
+
+    def test_group_slug_changed(self):
+        """Страница старого slug не отдаётся из кэша после переименования."""
+        group = Group.objects.create(
+            title=FD.TEST_GROUP_TITLE_1,
+            slug=FD.TEST_GROUP_SLUG_1,
+            description=FD.TEST_GROUP_DESCRIPTION_1
+        )
+        Post.objects.create(author=self.author, text=FD.POST_TEXT, group=group)
+        old_url = reverse('posts:group_list', args=(group.slug,))
+        profile_url = reverse('posts:profile', args=(self.author.username,))
+        self.guest_client.get(old_url)
+        etag = self.guest_client.get(profile_url)['ETag']
+
+        group.slug = FD.TEST_GROUP_SLUG_2
+        group.save()
+        self.assertEqual(self.guest_client.get(old_url).status_code, 404)
+        self.assertNotEqual(self.guest_client.get(profile_url)['ETag'], etag)
+        self.assertContains(self.guest_client.get(
+            reverse('posts:group_list', args=(group.slug,))), FD.POST_TEXT)
+
+
+class GroupIndexViewsTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.authors = [
+            User.objects.create_user(username=username)
+            for username in (FD.AUTHOR_USERNAME_1, FD.USER_USERNAME,
+                             FD.USER_USERNAME_1)
+        ]
+        cls.group = Group.objects.create(
+            title=FD.TEST_GROUP_TITLE_1,
+            slug=FD.TEST_GROUP_SLUG_1,
+            description=FD.TEST_GROUP_DESCRIPTION_1
+        )
+        cls.empty_group = Group.objects.create(
+            title=FD.TEST_GROUP_TITLE_2,
+            slug=FD.TEST_GROUP_SLUG_2,
+            description=FD.TEST_GROUP_DESCRIPTION_2
+        )
+        for author in cls.authors:
+            Post.objects.create(
+                author=author, group=cls.group, text=FD.POST_TEXT)
+        # Старый пост: автор не считается активным.
+        Post.objects.filter(author=cls.authors[2]).update(
+            pub_date=timezone.now() - timedelta(
+                days=settings.GROUP_ACTIVE_DAYS + 1)
+        )
+
+    def setUp(self):
+        cache.clear()
+        self.client = Client()
+
+    @override_settings(PAGE_CACHE_TIMEOUT=0)
+    def test_group_stats(self):
+        """Статистика групп - одним запросом на все группы."""
+        with self.assertNumQueries(1):
+            response = self.client.get(reverse('posts:group_index'))
+        stats = {
+            group['slug']: (
+                group['posts_count'], group['active_authors'],
+                group['last_post'] is not None
+            )
+            for group in response.context['page_obj']
+        }
+        self.assertEqual(stats, {
+            self.group.slug: (3, 2, True),
+            self.empty_group.slug: (0, 0, False),
+        })
+        with self.assertNumQueries(0):
+            self.client.get(reverse('posts:group_index'))
+
+    def test_group_stats_cache(self):
+        """Новый пост в группе и новая группа сбрасывают каталог."""
+        url = reverse('posts:group_index')
+        self.assertContains(self.client.get(url), 'Записей: 3')
+        Post.objects.create(
+            author=self.authors[0], group=self.group, text=FD.POST_TEXT)
+        self.assertContains(self.client.get(url), 'Записей: 4')
+        Group.objects.create(
+            title=FD.TEST_GROUP_TITLE_2 + '-new',
+            slug=FD.TEST_GROUP_SLUG_2 + '-new'
+        )
+        self.assertContains(
+            self.client.get(url), FD.TEST_GROUP_TITLE_2 + '-new')
+
+
+class FollowButtonsViewsTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username=FD.AUTHOR_USERNAME_1)
+        cls.other = User.objects.create_user(username=FD.USER_USERNAME_1)
+        cls.user = User.objects.create_user(username=FD.USER_USERNAME)
+        cls.group = Group.objects.create(
+            title=FD.TEST_GROUP_TITLE_1,
+            slug=FD.TEST_GROUP_SLUG_1,
+            description=FD.TEST_GROUP_DESCRIPTION_1
+        )
+        for author in (cls.author, cls.other) * 3:
+            Post.objects.create(
+                author=author, group=cls.group, text=FD.POST_TEXT)
+        Follow.objects.create(user=cls.user, author=cls.author)
+
+    def setUp(self):
+        cache.clear()
+        self.client = Client()
+        self.client.force_login(self.user)
+
+    def follow_queries(self, url, params=None):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url, params)
+        return response, [
+            query for query in queries.captured_queries
+            if 'posts_follow' in query['sql']
+        ]
+
+    def test_follow_buttons(self):
+        """
+        Кнопки подписки у каждого поста лент и поиска: подписки
+        читаются одним запросом на страницу, потом - из кэша.
+        """
+        pages = (
+            (reverse('posts:home_page'), None),
+            (reverse('posts:group_list', args=(self.group.slug,)), None),
+            (reverse('posts:search'), {'q': FD.POST_TEXT}),
+        )
+        for url, params in pages:
+            with self.subTest(url=url):
+                cache.clear()
+                response, queries = self.follow_queries(url, params)
+                self.assertEqual(len(queries), 1)
+                self.assertContains(response, 'Отписаться', count=3)
+                self.assertContains(response, 'Подписаться', count=3)
+                self.assertEqual(self.follow_queries(url, params)[1], [])
+
+    def test_followed_set_rollback(self):
+        """Откат транзакции с подпиской не трогает кэш подписок."""
+        self.assertEqual(
+            followed_authors(self.user.pk), frozenset([self.author.pk]))
+        with self.assertRaises(ValueError):
+            with transaction.atomic():
+                follow(self.user.pk, [self.other.username])
+                raise ValueError
+        run_on_commit()
+        with self.assertNumQueries(0):
+            self.assertEqual(
+                followed_authors(self.user.pk),
+                frozenset([self.author.pk])
+            )
+
+    def test_follow_buttons_invalidation(self):
+        """
+        Подписка обновляет кнопки, множество подписок правится
+        в кэше без нового запроса; во фрагментах постов - метки.
+        """
+        url = reverse('posts:home_page')
+        self.client.get(url)
+        self.client.get(
+            reverse('posts:profile_follow', args=(self.other.username,)))
+        run_on_commit()
+        response, queries = self.follow_queries(url)
+        self.assertEqual(queries, [])
+        self.assertContains(response, 'Отписаться', count=6)
+        self.assertNotContains(response, 'Подписаться')
+        self.assertNotContains(Client().get(url), 'Отписаться')
+
+        post = Post.objects.filter(author=self.author).first()
+        fragment = cache.get(fragment_key('posts:home_page', post))
+        self.assertIn('<!--hole:follow_button:', fragment)
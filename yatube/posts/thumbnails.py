@@ -0,0 +1,100 @@
+import atexit
+import logging
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.db import connections, transaction
+from sorl.thumbnail import get_thumbnail
+
+from .models import Post
+
+logger = logging.getLogger(__name__)
+
+_executor = None
+_executor_pid = None
+
+
+def get_executor():
+    """Пул создаётся лениво и заново после fork (gunicorn --preload)."""
+    global _executor, _executor_pid
+    if _executor is None or _executor_pid != os.getpid():
+        _executor = ThreadPoolExecutor(
+            max_workers=settings.THUMBNAIL_WORKERS,
+            thread_name_prefix='thumbnails'
+        )
+        _executor_pid = os.getpid()
+    return _executor
+
+
+@atexit.register
+def shutdown_executor():
+    """
+    Остановка пула процесса: задачи из очереди дорезаются, потоки
+    завершаются до выхода. Пул, унаследованный через fork, не трогается -
+    его потоки остались в родителе.
+    """
+    global _executor
+    if _executor is not None and _executor_pid == os.getpid():
+        _executor.shutdown(wait=True)
+    _executor = None
+
+
+def generate_thumbnail(post_id, image_name):
+    """
+    Нарезка миниатюры и запись её адреса в пост.
+    Если картинку успели сменить, результат отбрасывается:
+    новую картинку режет своя задача.
+    """
+    post = Post.objects.filter(pk=post_id, image=image_name).first()
+    if post is None:
+        return None
+    thumbnail = get_thumbnail(
+        post.image, settings.THUMBNAIL_SIZE, **settings.THUMBNAIL_OPTIONS
+    )
+    post.thumbnail = thumbnail.url
+    # save(), а не update(): сигналы сбросят кэш страниц с постом.
+    post.save(update_fields=('thumbnail', 'updated'))
+    return post.thumbnail
+
+
+def run_in_worker(post_id, image_name):
+    """
+    Соединения с БД у каждого потока свои; close_old_connections
+    закрыло бы их только по CONN_MAX_AGE, и потоки пула держали бы
+    соединения бессрочно - они закрываются после каждой задачи.
+    """
+    try:
+        return generate_thumbnail(post_id, image_name)
+    except Exception:
+        logger.exception('Миниатюра поста %s не создана.', post_id)
+    finally:
+        connections.close_all()
+
+
+def schedule_thumbnail(post):
+    """
+    Миниатюра режется в пуле потоков после коммита транзакции,
+    при THUMBNAIL_WORKERS = 0 - сразу, в текущем потоке.
+    """
+    args = (post.pk, post.image.name)
+    if not settings.THUMBNAIL_WORKERS:
+        generate_thumbnail(*args)
+        return
+    transaction.on_commit(
+        lambda: get_executor().submit(run_in_worker, *args)
+    )
+
+
+def generate_missing():
+    """Миниатюры постов, загруженных до пула или потерянных при рестарте."""
+    tasks = list(
+        Post.objects.exclude(image='').filter(
+            thumbnail=''
+        ).values_list('pk', 'image')
+    )
+    if not settings.THUMBNAIL_WORKERS:
+        results = (generate_thumbnail(*task) for task in tasks)
+    else:
+        results = get_executor().map(lambda task: run_in_worker(*task), tasks)
+    return sum(result is not None for result in results)
@@ -0,0 +1,82 @@
+import heapq
+import math
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Count
+from django.utils import timezone
+
+from .batching import batches
+from .caching import NAMESPACES, bump_versions
+from .models import Comment, Post, TrendingPost
+
+# Сдвиг возраста в часах: свежий пост не получает деления на ноль.
+AGE_OFFSET = 2
+
+
+def score(comments, followers, age_hours):
+    """
+    Рейтинг поста: свежие комментарии плюс логарифм числа
+    подписчиков автора, затухающие со временем с показателем
+    TRENDING_GRAVITY.
+    """
+    return (comments + math.log2(1 + followers)) / (
+        age_hours + AGE_OFFSET
+    ) ** settings.TRENDING_GRAVITY
+
+
+def recent_comments(since):
+    """Число комментариев после since по постам - один GROUP BY."""
+    return dict(
+        Comment.objects.filter(created__gte=since).order_by().values(
+            'post'
+        ).annotate(count=Count('pk')).values_list('post', 'count')
+    )
+
+
+def candidates(since, commented_ids):
+    """
+    (id, pub_date, подписчики автора) постов окна и старых постов
+    со свежими комментариями; строки читаются потоком.
+    """
+    fields = ('pk', 'pub_date', 'author__profile__followers_count')
+    yield from Post.objects.filter(pub_date__gte=since).order_by(
+    ).values_list(*fields).iterator()
+    for chunk in batches(commented_ids):
+        yield from Post.objects.filter(
+            pk__in=chunk, pub_date__lt=since
+        ).order_by().values_list(*fields)
+
+
+def rank_posts(now=None):
+    """
+    Пересчёт рейтинга: агрегаты читаются двумя-тремя запросами,
+    оценки считаются в памяти, в таблицу пишутся лучшие
+    TRENDING_SIZE постов. Возвращает число постов в рейтинге.
+    """
+    now = now or timezone.now()
+    since = now - timedelta(hours=settings.TRENDING_WINDOW_HOURS)
+    comments = recent_comments(since)
+    top = heapq.nlargest(
+        settings.TRENDING_SIZE,
+        (
+            (
+                score(
+                    comments.get(pk, 0),
+                    followers or 0,
+                    max((now - pub_date).total_seconds(), 0) / 3600
+                ),
+                pk
+            )
+            for pk, pub_date, followers in candidates(since, comments)
+        )
+    )
+    with transaction.atomic():
+        TrendingPost.objects.all().delete()
+        TrendingPost.objects.bulk_create(
+            TrendingPost(post_id=pk, rank=rank, score=post_score)
+            for rank, (post_score, pk) in enumerate(top, 1)
+        )
+    bump_versions(NAMESPACES['trending'])
+    return len(top)
@@ -1,61 +1,117 @@
+from hashlib import md5
+
 from django.conf import settings
 from django.contrib.auth import get_user_model
 from django.contrib.auth.decorators import login_required
 from django.core.cache import cache
 from django.core.paginator import Paginator
-from django.db.utils import IntegrityError
-from django.http import Http404
 from django.shortcuts import get_object_or_404, redirect, render
 from django.urls import reverse
-# from django.views.decorators.cache import cache_page
-
+from django.utils import timezone
+
+from .caching import NAMESPACES, pack_page, unpack_page, versioned_key
+from .conditional import (
+    cached_page, conditional_page, group_state, groups_state, index_state,
+    post_state, profile_state
+)
+from .counters import get_profile, group_stats
+from .feeds import follow_feed, followed_celebrities
+from .follows import follow, unfollow
 from .forms import CommentForm, PostForm
-from .models import Follow, Group, Post
+from .models import Group, Post, TrendingPost
+from .paginators import CountPaginator, CursorPaginator, RankPaginator
+from .search import get_backend
 
 POSTS_TO_SHOW = settings.POSTS_TO_SHOW
+COMMENTS_TO_SHOW = settings.COMMENTS_TO_SHOW
+GROUPS_TO_SHOW = settings.GROUPS_TO_SHOW
+COMMENT_KEYS = ('created', 'pk')
 User = get_user_model()
 
 TEMPLATES = {
     'index': 'posts/index.html',
     'group_list': 'posts/group_list.html',
+    'group_index': 'posts/group_index.html',
     'profile': 'posts/profile.html',
     'post_detail': 'posts/post_detail.html',
     'create_post': 'posts/create_post.html',
-    'follow': 'posts/follow.html'
+    'follow': 'posts/follow.html',
+    'popular': 'posts/popular.html',
+    'search': 'posts/search.html',
 }
 
 CACHE_KEYS = {
-    'index': 'index-{page}',
-    'follow': 'follow-{user}',
-    'group_posts': '{slug}-posts-{page}',
-    'author_posts': '{author}-posts-{page}',
+    'index': 'index-{cursor}',
+    'follow': 'follow-{user}-{cursor}',
+    'celebrities': 'celebrities-{user}',
+    'comments': 'comments-{post}-{cursor}',
+    'group_posts': '{slug}-posts-{cursor}',
+    'author_posts': '{author}-posts-{cursor}',
+    'search': 'search-{query}-{page}',
+    'popular': 'popular-{page}',
+    'popular_count': 'count-popular',
+    'groups': 'groups-{day}',
 }
+MAX_QUERY_LENGTH = 200
+
+
+def key_part(value):
+    """
+    Параметр запроса для ключа кэша - md5, как у запроса поиска:
+    ключи memcached не длиннее 250 символов и без пробелов.
+    """
+    if value is None:
+        return None
+    return md5(value.encode()).hexdigest()
+
+
+def cursor_part(cursor):
+    """Курсор для ключа кэша: у битого курсора ключ первой страницы."""
+    if CursorPaginator.decode_cursor(cursor) is None:
+        return None
+    return key_part(cursor)
+
+
+def paginator(posts, cursor, keys=None):
+    pag = CursorPaginator(posts, POSTS_TO_SHOW, keys)
+    page_obj = pag.get_page(cursor)
+    return page_obj
 
 
-def paginator(posts, page_number):
-    pag = Paginator(posts, POSTS_TO_SHOW)
-    page_obj = pag.get_page(page_number)
+def cached_posts_page(cache_key, build):
+    """
+    Страница постов из кэша или build(). В кэше - id и время
+    изменения постов (pack_page), а не сами посты: разметку постов
+    шаблон берёт из кэша фрагментов одним get_many.
+    """
+    packed = cache.get(cache_key)
+    if packed is not None:
+        return unpack_page(packed)
+    page_obj = build()
+    cache.set(cache_key, pack_page(page_obj))
     return page_obj
 
 
+@conditional_page(index_state)
+@cached_page(index_state)
 def index(request):
     """
     Вывод постов на главной странице.
     Кэш работает по страницам пагинации.
     """
-    page_number = request.GET.get('page')
-    page_obj = cache.get(CACHE_KEYS['index'].format(page=page_number))
-
-    if not page_obj:
-        page_obj = paginator(
-            Post.objects.all()
-            .select_related(
-                'author',
-                'group'
-            ),
-            page_number
-        )
-        cache.set(CACHE_KEYS['index'].format(page=page_number), page_obj)
+    cursor = request.GET.get('cursor')
+    cache_key = versioned_key(
+        NAMESPACES['index'],
+        CACHE_KEYS['index'].format(cursor=cursor_part(cursor))
+    )
+    page_obj = cached_posts_page(cache_key, lambda: paginator(
+        Post.objects.all()
+        .select_related(
+            'author',
+            'group'
+        ),
+        cursor
+    ))
 
     context = {
         'page_obj': page_obj,
@@ -63,39 +119,26 @@ def index(request):
     return render(request, TEMPLATES['index'], context)
 
 
+@conditional_page(group_state)
+@cached_page(group_state)
 def group_posts(request, slug):
     """
     Вывод постов одной группы.
     Кэш работает по страницам пагинации.
     """
-    page_number = request.GET.get('page')
-    page_obj = cache.get(
+    cursor = request.GET.get('cursor')
+    cache_key = versioned_key(
+        NAMESPACES['group'].format(slug=slug),
         CACHE_KEYS['group_posts'].format(
             slug=slug,
-            page=page_number
+            cursor=cursor_part(cursor)
         )
     )
-    if not page_obj:
-        page_obj = paginator(
-            get_object_or_404(
-                Group,
-                slug=slug
-            ).posts.all().prefetch_related('author'),
-            page_number
-        )
-        cache.set(
-            CACHE_KEYS['group_posts'].format(
-                slug=slug,
-                page=page_number
-            ),
-            page_obj
-        )
-    group = None
-
-    if page_obj.object_list.count() > 1:
-        group = page_obj.object_list[0].group
-    else:
-        group = get_object_or_404(Group, slug=slug)
+    group = get_object_or_404(Group, slug=slug)
+    page_obj = cached_posts_page(cache_key, lambda: paginator(
+        group.posts.all().select_related('author', 'group'),
+        cursor
+    ))
 
     context = {
         'group': group,
@@ -104,55 +147,100 @@ def group_posts(request, slug):
     return render(request, TEMPLATES['group_list'], context)
 
 
-# cache author and author_posts
-def profile(request, username):
-    page_number = request.GET.get('page')
-    author = get_object_or_404(User, username=username)
-    posts = author.posts.all().prefetch_related('group')
-    posts_count = posts.count
+@conditional_page(groups_state)
+@cached_page(groups_state)
+def group_index(request):
+    """
+    Каталог групп со статистикой. Статистика всех групп - один
+    запрос с агрегатами, кэшируется до нового поста в группе или
+    изменения групп; страницы каталога режутся из неё без запросов.
+    """
+    day = timezone.localdate()
+    cache_key = versioned_key(
+        NAMESPACES['groups'], CACHE_KEYS['groups'].format(day=day)
+    )
+    groups = cache.get(cache_key)
+    if groups is None:
+        groups = group_stats(day)
+        cache.set(cache_key, groups)
 
-    page_obj = paginator(
-        posts,
-        page_number
+    context = {
+        'page_obj': Paginator(groups, GROUPS_TO_SHOW).get_page(
+            request.GET.get('page')),
+    }
+    return render(request, TEMPLATES['group_index'], context)
+
+
+@conditional_page(profile_state)
+@cached_page(profile_state)
+def profile(request, username):
+    """
+    Вывод постов автора.
+    Кэш работает по страницам пагинации.
+    """
+    cursor = request.GET.get('cursor')
+    author = get_object_or_404(
+        User.objects.select_related('profile'),
+        username=username
     )
+    posts = author.posts.all().select_related('group')
+    profile = get_profile(author)
 
-    following = True if (
-        request.user.is_authenticated
-        and author.following.filter(user=request.user).exists()
-    ) else False
+    cache_key = versioned_key(
+        NAMESPACES['author'].format(author_id=author.pk),
+        CACHE_KEYS['author_posts'].format(
+            author=author.pk, cursor=cursor_part(cursor)
+        )
+    )
+    page_obj = cached_posts_page(
+        cache_key, lambda: paginator(posts, cursor))
 
     context = {
         'page_obj': page_obj,
         'author': author,
-        'following': following,
-        'posts_count': posts_count
+        'posts_count': profile.posts_count,
+        'profile': profile,
     }
     return render(request, TEMPLATES['profile'], context)
 
 
-# cache post, comments
+@conditional_page(post_state)
+@cached_page(post_state)
 def post_detail(request, post_id):
+    """
+    Пост с комментариями. Комментарии выводятся порциями
+    по курсору, каждая порция кэшируется до нового комментария.
+    """
+    cursor = request.GET.get('cursor')
     post = get_object_or_404(
         Post.objects.select_related(
-            'author',
+            'author__profile',
             'group',
         ),
         pk=post_id
     )
-    is_edit_allowed = True if (
-        request.user == post.author
-    ) else False
+    cache_key = versioned_key(
+        NAMESPACES['post'].format(post_id=post_id),
+        CACHE_KEYS['comments'].format(
+            post=post_id, cursor=cursor_part(cursor)
+        )
+    )
+    comments = cache.get(cache_key)
+    if comments is None:
+        comments = CursorPaginator(
+            post.comments.select_related('author'),
+            COMMENTS_TO_SHOW,
+            COMMENT_KEYS
+        ).get_page(cursor)
+        cache.set(cache_key, comments)
+
     context = {
         'post': post,
-        'form': CommentForm(
-            request.POST or None
-        ),
-        'is_edit_allowed': is_edit_allowed,
+        'comments': comments,
     }
     return render(request, TEMPLATES['post_detail'], context)
 
 
-# clear cache of group author
 @login_required
 def post_create(request):
     form = PostForm(
@@ -173,7 +261,6 @@ def post_create(request):
     return render(request, TEMPLATES['create_post'], context)
 
 
-# clear cache of group if required
 @login_required
 def post_edit(request, post_id):
     post = get_object_or_404(Post, pk=post_id)
@@ -198,7 +285,6 @@ def post_edit(request, post_id):
     return render(request, TEMPLATES['create_post'], context)
 
 
-# clear cache comment post
 @login_required
 def add_comment(request, post_id):
     post = get_object_or_404(Post, pk=post_id)
@@ -211,21 +297,66 @@ def add_comment(request, post_id):
     return redirect('posts:post_detail', post_id=post_id)
 
 
+def popular(request):
+    """
+    Популярные посты из рейтинга, посчитанного rank_posts.
+    Кэш страниц и числа постов рейтинга сбрасывается новым
+    рейтингом и изменениями постов.
+    """
+    page_number = request.GET.get('page')
+    cache_key, count_key = (
+        versioned_key(NAMESPACES['trending'], key, NAMESPACES['index'])
+        for key in (
+            CACHE_KEYS['popular'].format(page=key_part(page_number)),
+            CACHE_KEYS['popular_count'],
+        )
+    )
+    page_obj = cached_posts_page(cache_key, lambda: RankPaginator(
+        TrendingPost.objects.all(), POSTS_TO_SHOW, count_key
+    ).get_page(page_number))
+
+    context = {
+        'page_obj': page_obj,
+    }
+    return render(request, TEMPLATES['popular'], context)
+
+
 @login_required
 def follow_index(request):
     """
     Вывод постов всех авторов, на которых подписан текущий пользователь.
-    Добавлены: пагинация, кэш.
+    Посты берутся из материализованной ленты, посты «знаменитостей» -
+    напрямую. Добавлены: пагинация, кэш.
     """
-    page_number = request.GET.get('page')
-    posts = cache.get(CACHE_KEYS['follow'].format(user=request.user))
-    if not posts:
-        posts = Post.objects.filter(
-            author__following__user=request.user
-        ).select_related('author', 'group',)
-        cache.set(CACHE_KEYS['follow'].format(user=request.user), posts)
+    cursor = request.GET.get('cursor')
+    follow_namespace = NAMESPACES['follow'].format(user_id=request.user.pk)
+    celebrities_key = versioned_key(
+        follow_namespace,
+        CACHE_KEYS['celebrities'].format(user=request.user.pk)
+    )
+    celebrity_ids = cache.get(celebrities_key)
+    if celebrity_ids is None:
+        celebrity_ids = followed_celebrities(request.user)
+        cache.set(celebrities_key, celebrity_ids)
+
+    cache_key = versioned_key(
+        follow_namespace,
+        CACHE_KEYS['follow'].format(
+            user=request.user.pk, cursor=cursor_part(cursor)
+        ),
+        *(NAMESPACES['author'].format(author_id=author_id)
+          for author_id in celebrity_ids)
+    )
 
-    page_obj = paginator(posts, page_number)
+    def build():
+        posts, keys = follow_feed(request.user, celebrity_ids)
+        return paginator(
+            posts.select_related('author', 'group',),
+            cursor,
+            keys
+        )
+
+    page_obj = cached_posts_page(cache_key, build)
 
     context = {
         'page_obj': page_obj,
@@ -236,30 +367,44 @@ def follow_index(request):
 @login_required
 def profile_follow(request, username):
     """
-    Подписка на автора.
-    Добавлены: кэш.
+    Подписка на автора одним INSERT ... ON CONFLICT DO NOTHING:
+    повторная подписка и подписка на себя ничего не меняют.
     """
-    try:
-        Follow.objects.create(
-            author=get_object_or_404(User, username=username),
-            user=request.user,
-        )
-        cache.delete(CACHE_KEYS['follow'].format(user=request.user))
-    except IntegrityError as e:
-        raise Http404(e.__cause__)
+    follow(request.user.pk, [username])
     return redirect('posts:profile', username)
 
 
 @login_required
 def profile_unfollow(request, username):
+    """Отписка от автора одним DELETE; без подписки - ничего."""
+    unfollow(request.user.pk, [username])
+    return redirect('posts:profile', username)
+
+
+def search(request):
     """
-    Отписка от автора.
-    Добавлены: кэш.
+    Поиск по тексту постов и названиям групп, результаты по
+    релевантности. Кэш страниц - в пространстве имён главной:
+    любой новый или изменённый пост его сбрасывает. Совпадения
+    не считаются: страница знает только, есть ли следующая.
     """
-    get_object_or_404(
-        Follow,
-        user=request.user,
-        author=User.objects.get(username=username)
-    ).delete()
-    cache.delete(CACHE_KEYS['follow'].format(user=request.user))
-    return redirect('posts:profile', username)
+    query = request.GET.get('q', '').strip()[:MAX_QUERY_LENGTH]
+    page_number = request.GET.get('page')
+    page_obj = None
+    if query:
+        cache_key = versioned_key(
+            NAMESPACES['index'],
+            CACHE_KEYS['search'].format(
+                query=md5(query.encode()).hexdigest(),
+                page=key_part(page_number)
+            )
+        )
+        page_obj = cached_posts_page(cache_key, lambda: CountPaginator(
+            get_backend().search(query), POSTS_TO_SHOW
+        ).get_page(page_number))
+
+    context = {
+        'query': query,
+        'page_obj': page_obj,
+    }
+    return render(request, TEMPLATES['search'], context)
@@ -20,6 +20,8 @@ INSTALLED_APPS = [
     'users.apps.UsersConfig',
     'core.apps.CoreConfig',
     'about.apps.AboutConfig',
+    'benchmarks.apps.BenchmarksConfig',
+    'api.apps.ApiConfig',
     'django.contrib.admin',
     'django.contrib.auth',
     'django.contrib.contenttypes',
@@ -33,6 +35,8 @@ INSTALLED_APPS = [
 
 MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
+    'core.middleware.RequestMetricsMiddleware',
+    'core.middleware.ReplicaPinMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
@@ -47,7 +51,7 @@ TEMPLATES_DIR = os.path.join(BASE_DIR, 'templates')
 
 TEMPLATES = [
     {
-        'BACKEND': 'django.template.backends.django.DjangoTemplates',
+        'BACKEND': 'core.templates_backend.TimedDjangoTemplates',
         'DIRS': [TEMPLATES_DIR],
         'APP_DIRS': True,
         'OPTIONS': {
@@ -63,14 +67,43 @@ TEMPLATES = [
 ]
 
 WSGI_APPLICATION = 'yatube.wsgi.application'
+# manage.py test: настройки на время тестов - core.runner.TEST_SETTINGS.
+TEST_RUNNER = 'core.runner.TestRunner'
 
+# core.db.sqlite3 - SQLite с WAL, busy_timeout и другими PRAGMA
+# (core/db/sqlite3/base.py, переопределяются в OPTIONS['pragmas']).
+# CONN_MAX_AGE - сколько секунд соединение переживает запросы.
+DATABASE_ENGINE = 'core.db.sqlite3'
+CONN_MAX_AGE = int(os.getenv('DB_CONN_MAX_AGE', 60))
 DATABASES = {
     'default': {
-        'ENGINE': 'django.db.backends.sqlite3',
+        'ENGINE': DATABASE_ENGINE,
         'NAME': os.path.join(BASE_DIR, 'db.sqlite3'),
+        'CONN_MAX_AGE': CONN_MAX_AGE,
     }
 }
 
+# Реплики для чтения: DB_REPLICAS - пути к копиям базы SQLite через
+# запятую (локально их заполняет команда sync_replicas). Без реплик
+# всё идёт в default.
+DATABASE_REPLICAS = []
+for number, path in enumerate(
+    filter(None, os.getenv('DB_REPLICAS', '').split(',')), 1
+):
+    DATABASES[f'replica{number}'] = {
+        'ENGINE': DATABASE_ENGINE,
+        'NAME': path,
+        'CONN_MAX_AGE': CONN_MAX_AGE,
+        'TEST': {'MIRROR': 'default'},
+    }
+    DATABASE_REPLICAS.append(f'replica{number}')
+DATABASE_ROUTERS = ['core.routers.ReplicaRouter']
+# Сколько секунд после записи клиент (cookie) или страница с только что
+# изменёнными данными читают с основной базы - должно перекрывать
+# отставание реплик.
+REPLICA_PIN_SECONDS = int(os.getenv('REPLICA_PIN_SECONDS', 10))
+REPLICA_PIN_COOKIE = 'pin_primary'
+
 AUTH_PASSWORD_VALIDATORS = [
     {
         'NAME': 'django.contrib.auth.password_validation.UserAttributeSimilarityValidator',
@@ -86,12 +119,46 @@ AUTH_PASSWORD_VALIDATORS = [
     },
 ]
 
+# Кэш выбирается окружением: CACHE_BACKEND - один из CACHE_BACKENDS,
+# CACHE_LOCATION - адрес сервера или каталог. CACHE_TIERED=1 ставит
+# перед общим кэшем LRU в памяти процесса.
+CACHE_BACKENDS = {
+    'locmem': 'django.core.cache.backends.locmem.LocMemCache',
+    'file': 'django.core.cache.backends.filebased.FileBasedCache',
+    'memcached': 'django.core.cache.backends.memcached.MemcachedCache',
+    'redis': 'core.cache.redis.RedisCache',
+}
+CACHE_TIMEOUT = 60 * 60 * 6
+CACHE_SHARED = {
+    'BACKEND': CACHE_BACKENDS[os.getenv('CACHE_BACKEND', 'locmem')],
+    'LOCATION': os.getenv('CACHE_LOCATION', ''),
+    'TIMEOUT': CACHE_TIMEOUT,
+}
+
+# default - прослойка, считающая попадания и промахи для метрик.
 CACHES = {
     'default': {
-        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
-        'TIMEOUT': 60 * 5,
-    }
+        'BACKEND': 'core.cache.metered.MeteredCache',
+        'LOCATION': 'backend',
+    },
 }
+if os.getenv('CACHE_TIERED') == '1':
+    CACHES.update({
+        'backend': {
+            'BACKEND': 'core.cache.tiered.TieredCache',
+            'LOCATION': 'shared',
+            'TIMEOUT': CACHE_TIMEOUT,
+            'OPTIONS': {
+                'LOCAL_MAX_ENTRIES': int(
+                    os.getenv('CACHE_LOCAL_MAX_ENTRIES', 1000)
+                ),
+                'LOCAL_TIMEOUT': int(os.getenv('CACHE_LOCAL_TIMEOUT', 5)),
+            },
+        },
+        'shared': CACHE_SHARED,
+    })
+else:
+    CACHES['backend'] = CACHE_SHARED
 
 CSRF_FAILURE_VIEW = 'core.views.csrf_failure'
 
@@ -116,3 +183,92 @@ EMAIL_BACKEND = 'django.core.mail.backends.filebased.EmailBackend'
 EMAIL_FILE_PATH = os.path.join(BASE_DIR, 'sent_emails')
 
 POSTS_TO_SHOW = 10
+COMMENTS_TO_SHOW = 20
+GROUPS_TO_SHOW = 20
+# Номеров страниц по обе стороны от текущей в нумерованной пагинации.
+PAGE_WINDOW = 2
+# Активные авторы в каталоге групп - писавшие за столько дней.
+GROUP_ACTIVE_DAYS = 30
+
+# Лента подписок: авторы с большим числом подписчиков не рассылают
+# посты в ленты, их посты лента читает напрямую.
+FEED_FANOUT_LIMIT = 1000
+FEED_BACKFILL_SIZE = 200
+FEED_BATCH_SIZE = 500
+
+# Общий кэш страниц лент и постов (posts.conditional.cached_page):
+# куски, зависящие от пользователя, заполняются на каждый запрос.
+PAGE_CACHE_TIMEOUT = 300
+
+# JSON API: размер страницы списков по умолчанию и предел ?limit=.
+API_PAGE_SIZE = 20
+API_MAX_PAGE_SIZE = 100
+# Авторов в одном запросе массовой подписки/отписки API.
+API_FOLLOW_BULK_LIMIT = 100
+
+# Поиск постов: SQLiteFTSBackend - индекс FTS5 (только SQLite),
+# LikeSearchBackend - icontains для других СУБД. Ранжируются не больше
+# SEARCH_MAX_RESULTS самых новых совпадений.
+SEARCH_BACKEND = 'posts.search.SQLiteFTSBackend'
+SEARCH_MAX_RESULTS = 1000
+
+# Рейтинг «Популярное» (команда rank_posts, запускается по расписанию):
+# свежие комментарии за TRENDING_WINDOW_HOURS и подписчики автора,
+# затухание с возрастом поста; хранятся TRENDING_SIZE лучших постов.
+TRENDING_SIZE = 1000
+TRENDING_WINDOW_HOURS = 72
+TRENDING_GRAVITY = 1.5
+
+# Миниатюры картинок постов режутся в фоновом пуле потоков после
+# сохранения поста; 0 - режутся сразу, в потоке запроса.
+THUMBNAIL_WORKERS = int(os.getenv('THUMBNAIL_WORKERS', 2))
+THUMBNAIL_SIZE = '960x339'
+THUMBNAIL_OPTIONS = {'crop': 'center', 'upscale': True}
+
+# Метрики запросов: /metrics (Prometheus) доступен адресам METRICS_IPS,
+# строки JSON по каждому запросу - в журнал core.requests (INFO).
+# За обратным прокси адрес клиента - адрес прокси: запросы с его
+# заголовками отклоняются, нужен METRICS_TOKEN (Bearer-токен), который
+# заменяет проверку адреса.
+METRICS_IPS = os.getenv('METRICS_IPS', '127.0.0.1').split(',')
+METRICS_TOKEN = os.getenv('METRICS_TOKEN', '')
+# Бюджеты SQL-запросов на view (с учётом сессии и пользователя):
+# превышение пишется в журнал ошибкой, при QUERY_BUDGET_STRICT -
+# исключение. В тестах строгий режим включает core.runner.
+# У профиля, поста и группы - ещё запрос на ETag (posts.conditional).
+# Лентам с кнопками подписки у постов - запрос множества подписок
+# пользователя (пока оно не в кэше).
+QUERY_BUDGETS = {
+    'posts:home_page': 4,
+    'posts:group_list': 6,
+    'posts:profile': 6,
+    'posts:post_detail': 5,
+    'posts:follow_index': 5,
+    'posts:search': 6,
+    'posts:popular': 5,
+    'posts:group_index': 3,
+    'api:group_list': 2,
+    'api:feed': 4,
+}
+QUERY_BUDGET_STRICT = os.getenv('QUERY_BUDGET_STRICT', '0') == '1'
+
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'formatters': {
+        'message': {'format': '%(message)s'},
+    },
+    'handlers': {
+        'console': {
+            'class': 'logging.StreamHandler',
+            'formatter': 'message',
+        },
+    },
+    'loggers': {
+        'core.requests': {
+            'handlers': ['console'],
+            'level': os.getenv('REQUEST_LOG_LEVEL', 'WARNING'),
+            'propagate': False,
+        },
+    },
+}